@@ -1,5 +1,6 @@
 """Registry of Agents."""
 
+import logging
 import os
 
 from apiary import buyer, seller, shared
@@ -34,3 +35,38 @@ def get_agent():
         raise ValueError(f"Unknown agent: {agent_name}")
 
     return agent_class()
+
+
+# Long-lived Agents, keyed by (AGENT_NAME, CONFIG_PATH), reused across inferences.
+_agents_cache = {}
+
+
+def _agent_key():
+    return (os.getenv("AGENT_NAME"), os.getenv("CONFIG_PATH"))
+
+
+def get_cached_agent():
+    """Get agent and its states, building and starting the agent only on first use.
+
+    Building an Agent parses its configuration and creates its storage client,
+    which is too costly to repeat on every incoming message.
+    """
+    key = _agent_key()
+
+    cached = _agents_cache.get(key)
+    if cached is None:
+        agent = get_agent()
+        agent.start_agent_daemon()
+        states = agent.load_states()
+        cached = (agent, states)
+        _agents_cache[key] = cached
+        logging.info(f"Agent {key[0]} cached.")
+
+    return cached
+
+
+def clear_agents_cache():
+    """Stop the daemons of all cached agents and empty the cache."""
+    for agent, _ in _agents_cache.values():
+        agent.stop_agent_daemon()
+    _agents_cache.clear()
@@ -0,0 +1,254 @@
+"""Offline analysis of negotiation logs.
+
+Negotiation events are streamed partition by partition (in record batches) and reduced to one row
+per negotiation with vectorized group-bys, so that memory usage depends on the number of
+negotiations rather than on the number of rounds. Partial reductions have the same columns as
+prepared events, so that the partial reductions of all batches are reduced again, once.
+"""
+
+import glob
+import os
+from typing import Iterator
+
+import numpy as np
+
+from apiary import negotiation_log
+
+BATCH_SIZE = 1_000_000
+
+# Reductions of per-negotiation columns: maxima, minima,
+# and values at the earliest timestamp of the corresponding "_at" column.
+MAX_COLUMNS = ("rounds", "end")
+MIN_COLUMNS = ("start",)
+FIRST_COLUMNS = {
+    "accepted_at": "agreed_amount",
+    "buyer_opening_at": "buyer_opening",
+    "seller_opening_at": "seller_opening",
+    "buyer_agent_at": "buyer_agent",
+    "seller_agent_at": "seller_agent",
+}
+
+
+def read_batches(log_dir: str, batch_size: int = BATCH_SIZE) -> Iterator:
+    """Stream the negotiation events of the partitions of log_dir as Arrow record batches."""
+    import pyarrow.json as pj
+    import pyarrow.parquet as pq
+
+    schema = negotiation_log.get_schema()
+
+    for path in sorted(glob.glob(os.path.join(log_dir, "part-*.parquet"))):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+
+    for path in sorted(glob.glob(os.path.join(log_dir, "part-*.jsonl"))):
+        table = pj.read_json(
+            path, parse_options=pj.ParseOptions(explicit_schema=schema)
+        )
+        yield from table.to_batches(max_chunksize=batch_size)
+
+
+def _float(column) -> np.ndarray:
+    return column.to_numpy(zero_copy_only=False).astype(float)
+
+
+def _object(column) -> np.ndarray:
+    return column.to_numpy(zero_copy_only=False).astype(object)
+
+
+def prepare(batch) -> dict[str, np.ndarray]:
+    """Map negotiation events to per-negotiation columns, to be reduced by offerId."""
+    timestamp = _float(batch.column("timestamp"))
+    amount = _float(batch.column("amount"))
+    role = _object(batch.column("role"))
+    kind = _object(batch.column("kind"))
+    agent = _object(batch.column("agent"))
+
+    # Offers are made by the counterpart, counteroffers by the agent itself.
+    by_buyer = ((kind == "offer") & (role == "seller")) | (
+        (kind == "counteroffer") & (role == "buyer")
+    )
+    by_seller = ((kind == "offer") & (role == "buyer")) | (
+        (kind == "counteroffer") & (role == "seller")
+    )
+
+    return {
+        "offer_id": _object(batch.column("offer_id")),
+        "rounds": _float(batch.column("round")),
+        "start": timestamp,
+        "end": timestamp,
+        "accepted_at": np.where(kind == "accept", timestamp, np.nan),
+        "agreed_amount": amount,
+        "buyer_opening_at": np.where(by_buyer, timestamp, np.nan),
+        "buyer_opening": amount,
+        "seller_opening_at": np.where(by_seller, timestamp, np.nan),
+        "seller_opening": amount,
+        "buyer_agent_at": np.where(role == "buyer", timestamp, np.nan),
+        "buyer_agent": agent,
+        "seller_agent_at": np.where(role == "seller", timestamp, np.nan),
+        "seller_agent": agent,
+    }
+
+
+def reduce(columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Reduce prepared (or already reduced) columns to one row per offerId."""
+    offer_ids, codes = np.unique(columns["offer_id"], return_inverse=True)
+    reduced = {"offer_id": offer_ids}
+
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+
+    for name in MAX_COLUMNS:
+        reduced[name] = np.fmax.reduceat(columns[name][order], starts)
+    for name in MIN_COLUMNS:
+        reduced[name] = np.fmin.reduceat(columns[name][order], starts)
+
+    for at_name, name in FIRST_COLUMNS.items():
+        at = columns[at_name]
+        # Earliest row of each group, missing timestamps last.
+        first = np.lexsort((np.where(np.isnan(at), np.inf, at), codes))[starts]
+        reduced[at_name] = at[first]
+        reduced[name] = columns[name][first].copy()
+        missing = np.isnan(reduced[at_name])
+        reduced[name][missing] = None if reduced[name].dtype == object else np.nan
+
+    return reduced
+
+
+def _concatenate(partials: list[dict]) -> dict:
+    return {
+        name: np.concatenate([partial[name] for partial in partials])
+        for name in partials[0]
+    }
+
+
+def negotiations(log_dir: str, batch_size: int = BATCH_SIZE) -> dict[str, np.ndarray]:
+    """Reduce the events of log_dir to one row per negotiation, with its outcome.
+
+    Besides the reduced columns, rows have:
+        accepted: Whether an offer was accepted.
+        time_to_agreement: Seconds from the first event to the acceptance.
+        seller_share: Share of the surplus between opening offers obtained by the seller.
+    """
+    partials = [reduce(prepare(batch)) for batch in read_batches(log_dir, batch_size)]
+    if not partials:
+        return {}
+    # Negotiations spanning several batches are merged once all of them are read.
+    reduced = partials[0] if len(partials) == 1 else reduce(_concatenate(partials))
+
+    reduced["accepted"] = ~np.isnan(reduced["accepted_at"])
+    reduced["time_to_agreement"] = reduced["accepted_at"] - reduced["start"]
+
+    spread = reduced["seller_opening"] - reduced["buyer_opening"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        seller_share = (reduced["agreed_amount"] - reduced["buyer_opening"]) / spread
+    reduced["seller_share"] = np.where(spread != 0, np.clip(seller_share, 0, 1), np.nan)
+
+    return reduced
+
+
+def _nanmean_by(codes: np.ndarray, n: int, values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=n)
+    counts = np.bincount(codes[valid], minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def strategies(negotiations: dict[str, np.ndarray]) -> list[dict]:
+    """Summarize negotiations per strategy (agent) and role.
+
+    Convergence rounds and time to agreement are averaged over accepted negotiations,
+    surplus share is the one obtained by the role of the strategy.
+    """
+    if not negotiations:
+        return []
+
+    accepted = negotiations["accepted"]
+    summary = []
+    for role in ("buyer", "seller"):
+        agents = negotiations[f"{role}_agent"]
+        known = np.array([agent is not None for agent in agents], dtype=bool)
+        if not known.any():
+            continue
+
+        names, codes = np.unique(agents[known].astype(str), return_inverse=True)
+        n = len(names)
+
+        def accepted_only(values):
+            return np.where(accepted, values, np.nan)[known]
+
+        share = negotiations["seller_share"]
+        if role == "buyer":
+            share = 1 - share
+
+        count = np.bincount(codes, minlength=n)
+        acceptance_rate = (
+            np.bincount(codes, weights=accepted[known], minlength=n) / count
+        )
+        rounds = _nanmean_by(codes, n, accepted_only(negotiations["rounds"]))
+        time_to_agreement = _nanmean_by(
+            codes, n, accepted_only(negotiations["time_to_agreement"])
+        )
+        surplus_share = _nanmean_by(codes, n, accepted_only(share))
+
+        for i, name in enumerate(names):
+            summary.append(
+                {
+                    "agent": name,
+                    "role": role,
+                    "negotiations": int(count[i]),
+                    "acceptance_rate": float(acceptance_rate[i]),
+                    "convergence_rounds": float(rounds[i]),
+                    "time_to_agreement": float(time_to_agreement[i]),
+                    "surplus_share": float(surplus_share[i]),
+                }
+            )
+
+    return summary
+
+
+def plot_negotiation(log_dir: str, offer_id: str, file_path: str):
+    """Plot the offers of both parties of a negotiation, round by round."""
+    import matplotlib.pyplot as plt
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    events = []
+    for batch in read_batches(log_dir):
+        events.append(batch.filter(pc.equal(batch.column("offer_id"), offer_id)))
+    events = pa.Table.from_batches(events, schema=negotiation_log.get_schema())
+    events = events.sort_by("timestamp")
+
+    columns = prepare(events)
+    round = columns["rounds"]
+    amount = events.column("amount").to_numpy(zero_copy_only=False).astype(float)
+    by_buyer = ~np.isnan(columns["buyer_opening_at"])
+    by_seller = ~np.isnan(columns["seller_opening_at"])
+
+    unit_price = 1e-6  # TODO: hardcoded, may change for != USDC.
+    plt.figure(figsize=(13, 5))
+    plt.plot(
+        round[by_seller],
+        amount[by_seller] * unit_price,
+        color="g",
+        linewidth=1.5,
+        label="Seller Offers",
+    )
+    plt.plot(
+        round[by_buyer],
+        amount[by_buyer] * unit_price,
+        color="m",
+        linewidth=1.5,
+        label="Buyer Offers",
+    )
+
+    plt.title("Negotiation Rounds vs Offers", fontsize=16, fontweight="bold")
+    plt.xlabel("Negotiation Round []", fontsize=12)
+    plt.ylabel("Offer [USDC]", fontsize=12)  # TODO: remove hardcoded.
+    plt.grid(True, linestyle="--", linewidth=0.5)
+
+    plt.legend()
+
+    plt.tight_layout()
+
+    plt.savefig(file_path)
+    plt.close()
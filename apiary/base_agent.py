@@ -2,14 +2,27 @@
 
 import logging
 import os
+import shutil
 import subprocess
+import threading
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from datetime import datetime
 
 from dotenv import load_dotenv
-from lighthouseweb3 import Lighthouse
 
-from apiary import apiars
+from apiary import (
+    apiars,
+    external_services,
+    image_cache,
+    job_scheduler,
+    metrics,
+    negotiation_log,
+    profiling,
+    state_store,
+    storage,
+    strategy_params,
+)
 
 load_dotenv(override=True)
 
@@ -27,15 +40,33 @@ class Agent(ABC):
 
     The Agent inferences are designed to be stateless, meaning that their states are loaded at inference time rather than being stored in memory.
     The history of these states is managed externally via storage mechanisms like databases or flatfiles (e.g., PostgreSQL, .parquet).
+    Negotiation states are loaded from a state store keyed by offerId, so that concurrent negotiations do not interfere.
 
     The responsibility for managing the history and updates of states (including feature definitions, pipelines, model parametrizations),
     if necessary, is separate.
     """
 
+    # Typed parameters of the strategy, read from the configuration once per (re)load.
+    params_class = strategy_params.StrategyParams
+
     def __init__(self) -> None:
         """Initialize the Agent."""
+        self.params = self.params_class.from_env()
+        self.config_watcher = None
         self.private_key = os.getenv("PRIVATE_KEY")
-        self.lh = Lighthouse(os.getenv("LIGHTHOUSE_TOKEN"))
+        self.name = os.getenv("AGENT_NAME")
+        self.role = os.getenv("ROLE")
+        self.negotiation_log = negotiation_log.get_negotiation_log()
+        self.storage = storage.get_storage()
+        self.job_scheduler = None
+        self.image_cache = image_cache.ImageCache(
+            index_path=os.getenv("IMAGE_CACHE.INDEX_PATH") or "tmp/image_cache.json",
+            max_images=int(os.getenv("IMAGE_CACHE.MAX_IMAGES") or 16),
+            max_bytes=int(os.getenv("IMAGE_CACHE.MAX_BYTES") or 0) or None,
+        )
+        # Sell attestations handled, either from the chain or from sellAttest messages.
+        self._sell_attestations = set()
+        self._sell_attestations_lock = threading.Lock()
 
     def start_agent_daemon(self):
         """Module responsible for launching daemons to make states accessible at inference time.
@@ -43,8 +74,51 @@ class Agent(ABC):
         e.g. launching postgrass. This won't perform heavy retraining operations nor
         trigger datapipelines to bring states up-to-date,
         but can take care of and updates cached states.
+
+        If JOB_SCHEDULER.WORKERS is set, accepted jobs are run by a job scheduler
+        instead of within the handling of buy attestations, which requires redis to
+        publish their sell attestations.
+
+        The strategy parameters are reloaded whenever the CONFIG_PATH file changes, checked
+        every CONFIG.RELOAD_INTERVAL seconds (1 by default, 0 to disable).
         """
-        pass
+        config_path = os.getenv("CONFIG_PATH")
+        reload_interval = float(os.getenv("CONFIG.RELOAD_INTERVAL") or 1)
+        if config_path and reload_interval > 0 and os.path.exists(config_path):
+            self.config_watcher = strategy_params.ConfigWatcher(
+                config_path, self._reload_params, interval=reload_interval
+            )
+            self.config_watcher.start()
+
+        workers = os.getenv("JOB_SCHEDULER.WORKERS")
+        if workers:
+            try:
+                import redis  # noqa: F401
+            except ImportError as e:
+                # Otherwise payments would be collected for sell attestations never sent.
+                raise RuntimeError(
+                    "JOB_SCHEDULER.WORKERS is set but redis is not installed, "
+                    "install the redis extra to schedule jobs."
+                ) from e
+            resource_limits = {
+                resource: int(
+                    os.getenv(f"JOB_SCHEDULER.{resource.upper()}_CONCURRENCY")
+                )
+                for resource in ("build", "run")
+                if os.getenv(f"JOB_SCHEDULER.{resource.upper()}_CONCURRENCY")
+            }
+            self.job_scheduler = job_scheduler.JobScheduler(
+                run_job=self._run_job,
+                on_complete=self._complete_job,
+                workers=int(workers),
+                queue_path=os.getenv("JOB_SCHEDULER.QUEUE_PATH")
+                or "apiary_output/job_queue.db",
+                resource_limits=resource_limits,
+                retention=float(os.getenv("JOB_SCHEDULER.RETENTION") or 7 * 24 * 3600),
+                max_attempts=int(os.getenv("JOB_SCHEDULER.MAX_ATTEMPTS") or 8),
+                backoff=float(os.getenv("JOB_SCHEDULER.BACKOFF") or 30),
+            )
+            self.job_scheduler.start()
 
     def stop_agent_daemon(self):
         """Check if we own the daemon process and stop it if so.
@@ -52,7 +126,16 @@ class Agent(ABC):
         In the presence of a parallel training process running it might not be the case.
         Daemon ownership is communicated via lock files.
         """
-        pass
+        if self.job_scheduler is not None:
+            self.job_scheduler.stop()
+            self.job_scheduler = None
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+            self.config_watcher = None
+
+    def _reload_params(self, env):
+        """Replace the strategy parameters with the ones of env, raising ConfigError if invalid."""
+        self.params = self.params_class.from_env(env)
 
     def load_states(self):
         """Load necessary states in order to be able to perform an inference against incoming messages.
@@ -69,30 +152,52 @@ class Agent(ABC):
         #     model = jax.from_pickle(model_pickle) # This is why we do this in python, even if the training is happening in a completely separate process.
         #     return {'X': , ''}
         #    NOTE: in the case messaging is server-push-based, deal negotiations and job runs are necessarily sequential.
-        pass
+        return state_store.get_state_store()
 
     def infer(self, states, input):
         """Infer scheme-compliant message following the (message, context) => message structure and populate negotiation thread."""
+        metrics.MESSAGES.inc(tag=input["data"].get("_tag"))
+        with metrics.timer("infer"), profiling.message(input):
+            return self._infer(states, input)
+
+    def _infer(self, states, input):
         output = self._preprocess_infer(input)
         if output == "noop":
             return output
 
+        offer_id = input["offerId"]
+        state = states.load(offer_id)
+
         if input["initial"]:
             # Initial Offer UNIX time (Seller Measurement): negotiation thread t0.
-            utc_time = datetime.utcnow().timestamp()
-            os.environ["T0"] = str(utc_time)
+            state["t0"] = self._now()
+        elif "t0" not in state and os.getenv("T0"):
+            # Initial Offer UNIX time (Buyer Measurement), set when parsing the initial offer.
+            state["t0"] = float(os.getenv("T0"))
 
         match input["data"].get("_tag"):
             case "offer":
-                return self._handle_offer(input, output)
+                state["round"] = state.get("round", 0) + 1
+                # Input and output share their data, copy the offer before handling it.
+                offer_token = dict(input["data"]["tokens"][0])
+                self._log_event(state, offer_id, "offer", offer_token)
+                output = self._handle_offer(state, input, output)
+                self._log_response(state, offer_id, offer_token, output)
             case "buyAttest":
+                states.delete(offer_id)
                 return self._buy_attestation_to_sell_attestation(input, output)
             case "sellAttest":
+                states.delete(offer_id)
                 self._handle_sell_attestation(input)
                 return "noop"
 
+        states.save(offer_id, state)
         return output
 
+    def _now(self) -> float:
+        """Current UNIX time, as measured by the Agent."""
+        return datetime.utcnow().timestamp()
+
     def _preprocess_infer(self, input):
         """Shared preprocessing logic for infer."""
         pubkey = os.getenv("PUBLIC_KEY")
@@ -107,15 +212,58 @@ class Agent(ABC):
 
         return output
 
+    def _log_event(self, state, offer_id, kind, token):
+        """Record a negotiation event about a token of an offer."""
+        self.negotiation_log.record(
+            offer_id=offer_id,
+            round=state.get("round", 0),
+            role=self.role,
+            agent=self.name,
+            kind=kind,
+            amount=token.get("amt"),
+            token=token.get("address"),
+        )
+        metrics.NEGOTIATION_EVENTS.inc(kind=kind)
+        if kind in ("accept", "reject"):
+            metrics.NEGOTIATION_ROUNDS.observe(state.get("round", 0), role=self.role)
+
+    def _log_response(self, state, offer_id, offer_token, output):
+        """Record whether an offer was rejected, accepted or countered."""
+        if output == "noop":
+            self._log_event(state, offer_id, "reject", offer_token)
+        elif output["data"].get("_tag") == "buyAttest":
+            self._log_event(state, offer_id, "accept", offer_token)
+        elif output["data"]["tokens"][0].get("amt") == offer_token.get("amt"):
+            # Identity counteroffer.
+            self._log_event(state, offer_id, "accept", offer_token)
+        else:
+            self._log_event(
+                state, offer_id, "counteroffer", output["data"]["tokens"][0]
+            )
+
     @abstractmethod
-    def _handle_offer(self, input, output):
-        """Handle offer messages."""
+    def _handle_offer(self, state, input, output):
+        """Handle offer messages, reading and updating the negotiation state."""
         ...
 
     def _buy_attestation_to_sell_attestation(self, input, output):
-        statement_uid = input["data"]["attestation"]
+        """Run the job paid by a buy attestation and return the sell attestation.
 
-        buy_statement = apiars.erc.get_buy_statement(statement_uid)
+        With a job scheduler, the job is queued and "noop" is returned right away:
+        the sell attestation is published once the job completes.
+        """
+        if self.job_scheduler is not None:
+            self.job_scheduler.submit(input["data"]["attestation"], output)
+            return "noop"
+
+        return self._complete_job(output, self._run_job(output))
+
+    def _run_job(self, output):
+        """Run the job of the buy attestation in output, returning its result_cid and token standard."""
+        statement_uid = output["data"]["attestation"]
+
+        with metrics.timer("get_buy_statement"):
+            buy_statement = apiars.erc.get_buy_statement(statement_uid)
 
         if isinstance(buy_statement, apiars.erc.BuyStatement.ERC20):
             (_, _, _, job_cid) = buy_statement
@@ -128,29 +276,58 @@ class Agent(ABC):
             token_standard = "Bundle"
 
         result_cid = self._job_cid_to_result_cid(statement_uid, job_cid)
+        return {"result_cid": result_cid, "token_standard": token_standard}
 
-        match token_standard:
-            case "ERC20":
-                sell_uid = apiars.erc20.submit_and_collect(
-                    statement_uid, result_cid, self.private_key
-                )
-            case "ERC721":
-                sell_uid = apiars.erc721.submit_and_collect(
-                    statement_uid, result_cid, self.private_key
-                )
-            case "Bundle":
-                sell_uid = apiars.bundle.submit_and_collect(
-                    statement_uid, result_cid, self.private_key
-                )
+    def _complete_job(self, output, job_result, checkpoint=None):
+        """Submit the job result, collect the payment and return the sell attestation message.
 
-        output["data"]["_tag"] = "sellAttest"
-        output["data"]["attestation"] = sell_uid
+        Called by the job scheduler, the message is published directly: messaging clients stop
+        listening to the offer once they receive it (see dcnScheme.onMessage). The sell uid is
+        checkpointed once collected, so that a retried completion only publishes the message.
+        """
+        statement_uid = output["data"]["attestation"]
+        result_cid = job_result["result_cid"]
+
+        sell_uid = job_result.get("sell_uid")
+        if sell_uid is None:
+            with metrics.timer("submit_and_collect"):
+                match job_result["token_standard"]:
+                    case "ERC20":
+                        sell_uid = apiars.erc20.submit_and_collect(
+                            statement_uid, result_cid, self.private_key
+                        )
+                    case "ERC721":
+                        sell_uid = apiars.erc721.submit_and_collect(
+                            statement_uid, result_cid, self.private_key
+                        )
+                    case "Bundle":
+                        sell_uid = apiars.bundle.submit_and_collect(
+                            statement_uid, result_cid, self.private_key
+                        )
+            job_result["sell_uid"] = sell_uid
+            if checkpoint is not None:
+                checkpoint(job_result)
+
+        # The job payload is left as is, for retries.
+        output = {
+            **output,
+            "data": {**output["data"], "_tag": "sellAttest", "attestation": sell_uid},
+        }
+
+        if self.job_scheduler is not None:
+            external_services.publish_message(output)
 
         return output
 
     def _handle_sell_attestation(self, input):
         sell_uid = input["data"]["attestation"]
-        result_cid = apiars.erc.get_sell_statement(sell_uid)
+        with self._sell_attestations_lock:
+            if sell_uid in self._sell_attestations:
+                return
+            self._sell_attestations.add(sell_uid)
+
+        with metrics.timer("get_sell_statement"):
+            result_cid = apiars.erc.get_sell_statement(sell_uid)
         self._get_result_from_result_cid(result_cid)
 
     def _get_query(self, input):
@@ -161,10 +338,10 @@ class Agent(ABC):
             file.write(input["data"]["query"])
 
         try:
-            response = self.lh.upload(file_path)
-            query = response["data"]["Hash"]
+            with metrics.timer("storage_upload"):
+                query = self.storage.upload(file_path)
         except Exception:
-            logging.error("Lighthouse Error occurred.", exc_info=True)
+            logging.error("Storage Error occurred.", exc_info=True)
             raise
         finally:
             # Remove the temporary file
@@ -176,7 +353,42 @@ class Agent(ABC):
 
     def _offer_to_buy_attestation(self, input, output):
         query = self._get_query(input)
+        with metrics.timer("make_buy_statement"):
+            statement_uid = self._make_buy_statement(input, query)
+
+        output["data"]["_tag"] = "buyAttest"
+        output["data"]["attestation"] = statement_uid
+        output["data"].pop("query", None)
+        output["data"].pop("tokens", None)
+
+        timeout = os.getenv("CHAIN_WATCHER.SELL_TIMEOUT")
+        if timeout:
+            threading.Thread(
+                target=self._watch_sell_attestation,
+                args=(statement_uid, float(timeout)),
+                daemon=True,
+            ).start()
 
+        return output
+
+    def _watch_sell_attestation(self, statement_uid, timeout):
+        """Handle the sell attestation of a buy statement as soon as it is attested on-chain.
+
+        The sellAttest message of the seller is then ignored: whichever comes first is handled.
+        """
+        try:
+            sell_uid = apiars.erc.wait_for_sell_statement(statement_uid, timeout)
+        except TimeoutError:
+            logging.warning(f"No sell attestation of {statement_uid} after {timeout}s.")
+            return
+        except Exception:
+            logging.error("Chain watching error occurred.", exc_info=True)
+            return
+
+        self._handle_sell_attestation({"data": {"attestation": sell_uid}})
+
+    def _make_buy_statement(self, input, query):
+        """Pay for the query with the tokens of the offer, returning the buy statement uid."""
         if len(input["data"]["tokens"]) == 1:
             input_token = input["data"]["tokens"][0]
 
@@ -224,74 +436,80 @@ class Agent(ABC):
                 self.private_key,
             )
 
-        output["data"]["_tag"] = "buyAttest"
-        output["data"]["attestation"] = statement_uid
-        output["data"].pop("query", None)
-        output["data"].pop("tokens", None)
-
-        return output
+        return statement_uid
 
     def _job_cid_to_result_cid(self, statement_uid: str, job_cid: str):
         """Download Dockerfile from job_cid, run the job, upload the results to IPFS and return the result_cid."""
-        try:
-            dockerFile = self.lh.download(job_cid)
-        except Exception:
-            logging.error("Lighthouse Error occurred.", exc_info=True)
-            raise
-
-        if not os.path.exists("tmp"):
-            os.makedirs("tmp")
-
-        # Write Dockerfile
-        with open("tmp/Dockerfile", "w") as f:
-            f.write(dockerFile[0].decode("utf-8"))
-
-        # Build the image
-        build_command = f"podman build -t job-image-{statement_uid} tmp"
-        subprocess.run(build_command, shell=True, check=True)
-
-        # Run the container and capture the output
-        run_command = f"podman run --name job-container-{
-            statement_uid} job-image-{statement_uid}"
-        result = subprocess.run(
-            run_command,
-            shell=True,
-            check=True,
-            capture_output=True,
-            text=True,
-        )
-
-        # TODO: make result generic to volume.
-        result = result.stdout
-
-        # Remove the container
-        remove_command = f"podman rm job-container-{statement_uid}"
-        subprocess.run(remove_command, shell=True, check=True)
-
-        result_file = "tmp/output.txt"
-        with open(result_file, "w") as file:
-            # Write the variable to the file
-            file.write(result)
+        # Per-job build directory, as jobs may run concurrently.
+        job_dir = f"tmp/{statement_uid}"
+        os.makedirs(job_dir, exist_ok=True)
 
+        # Removed once the result is uploaded: it holds the full output of the job.
         try:
-            response = self.lh.upload(result_file)
-        except Exception:
-            logging.error("Lighthouse Error occurred.", exc_info=True)
-            raise
+            try:
+                with metrics.timer("storage_download"):
+                    job_file = self.storage.download(
+                        job_cid, f"{job_dir}/job.Dockerfile"
+                    )
+            except Exception:
+                logging.error("Storage Error occurred.", exc_info=True)
+                raise
+
+            with open(job_file, "r") as f:
+                dockerfile = f.read()
+
+            # Build the image, unless a job with the same Dockerfile was already built
+            with self._limit("build"), metrics.timer("podman_build"):
+                image = self.image_cache.acquire(dockerfile, job_dir)
+
+            # The image is not evicted until its container is removed.
+            try:
+                # Run the container, streaming its output to disk
+                result_file = f"{job_dir}/output.txt"
+                # A resumed job replaces the container left by its interrupted run, if any.
+                run_command = (
+                    f"podman run --replace --name job-container-{statement_uid} {image}"
+                )
+                with (
+                    self._limit("run"),
+                    metrics.timer("podman_run"),
+                    open(result_file, "wb") as file,
+                ):
+                    subprocess.run(run_command, shell=True, check=True, stdout=file)
+
+                # TODO: make result generic to volume.
+
+                # Remove the container
+                remove_command = f"podman rm job-container-{statement_uid}"
+                subprocess.run(remove_command, shell=True, check=True)
+            finally:
+                self.image_cache.release(image)
+
+            try:
+                with metrics.timer("storage_upload"):
+                    result_cid = self.storage.upload(result_file)
+            except Exception:
+                logging.error("Storage Error occurred.", exc_info=True)
+                raise
+
+            return result_cid
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
 
-        result_cid = response["data"]["Hash"]
-        return result_cid
+    def _limit(self, resource: str):
+        """Hold a slot of a job scheduler resource (build, run), if jobs are scheduled."""
+        if self.job_scheduler is None:
+            return nullcontext()
+        return self.job_scheduler.limit(resource)
 
     def _get_result_from_result_cid(self, result_cid):
-        try:
-            results = self.lh.download(result_cid)
-        except Exception:
-            logging.error("Lighthouse Error occurred.", exc_info=True)
-            raise
-
         if not os.path.exists("results/"):
             os.makedirs("results")
 
-        # Write Dockerfile
-        with open(f"results/{result_cid}.txt", "w") as f:
-            f.write(results[0].decode("utf-8"))
+        try:
+            with metrics.timer("storage_download"):
+                # Each result is read once, caching it would only duplicate it on disk.
+                self.storage.uncached.download(result_cid, f"results/{result_cid}.txt")
+        except Exception:
+            logging.error("Storage Error occurred.", exc_info=True)
+            raise
@@ -0,0 +1,347 @@
+"""Batched strategies, advancing many concurrent negotiations in one vectorized step.
+
+Array counterparts of the strategies of apiary.shared: an engine holds the states of n
+negotiations as arrays and responds to a vector of incoming offers at once. Parameters are
+scalars or arrays broadcastable to (n,), so that negotiations with different parameters
+(e.g. in a parameter sweep) can be stepped together.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Literal
+
+import numpy as np
+
+
+def poly(t, t_max, beta, k):
+    """Polynomial time concession curve."""
+    return k + (1 - k) * (t / t_max) ** (1 / beta)
+
+
+def exp(t, t_max, beta, k):
+    """Exponential time concession curve."""
+    return k ** ((1 - t / t_max) ** beta)
+
+
+def _param(value, n: int) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value, dtype=float), (n,))
+
+
+class BatchStrategy(ABC):
+    """Strategy of n concurrent negotiations."""
+
+    def __init__(self, n: int, is_buyer, abs_tol=0.0) -> None:
+        """Initialize the engine."""
+        self.n = n
+        self.is_buyer = np.broadcast_to(np.asarray(is_buyer, dtype=bool), (n,))
+        self.abs_tol = _param(abs_tol, n)
+
+    def step(self, x_in, t=0.0, active=None) -> tuple[np.ndarray, np.ndarray]:
+        """Respond to the incoming offers x_in of the active negotiations.
+
+        Args:
+            x_in: Incoming offers.
+            t: Seconds since the start of the negotiations.
+            active: Mask of the negotiations to step, all if None.
+
+        Returns:
+            Outgoing offers, NaN for abandoned or inactive negotiations (incoming offer if accepted),
+            and mask of accepted offers.
+        """
+        x_in = _param(x_in, self.n)
+        t = _param(t, self.n)
+        idx = np.arange(self.n) if active is None else np.flatnonzero(active)
+
+        x_out = np.full(self.n, np.nan)
+        accepted = np.zeros(self.n, dtype=bool)
+        x_out[idx], accepted[idx] = self._step(idx, x_in[idx], t[idx])
+        return x_out, accepted
+
+    @abstractmethod
+    def _step(self, idx, x_in, t):
+        """Respond to the incoming offers of the negotiations idx, returning (x_out, accepted)."""
+        ...
+
+    def _accepts(self, idx, x_in, x_out):
+        """Beneficial incoming offers, no further negotiation needed."""
+        return np.where(
+            self.is_buyer[idx], x_in <= x_out + self.abs_tol[idx], x_in >= x_out
+        )
+
+
+class NaiveBatch(BatchStrategy):
+    """Naive Agents, accepting any offer."""
+
+    def _step(self, idx, x_in, t):
+        return x_in, np.ones(len(idx), dtype=bool)
+
+
+class KalmanBatch(BatchStrategy):
+    """Kalman filter-based Agents."""
+
+    def __init__(
+        self,
+        n: int,
+        is_buyer,
+        valuation_estimation,
+        valuation_variance,
+        valuation_measurement_variance,
+        abs_tol=0.0,
+    ) -> None:
+        """Initialize the engine, each negotiation starting from the configured valuation."""
+        super().__init__(n, is_buyer, abs_tol)
+        self.estimation = _param(valuation_estimation, n).copy()
+        self.variance = _param(valuation_variance, n).copy()
+        self.measurement_variance = _param(valuation_measurement_variance, n)
+
+    def _step(self, idx, x_in, t):
+        estimation = self.estimation[idx]
+        variance = self.variance[idx]
+
+        accepted = self._accepts(idx, x_in, estimation)
+        update = ~accepted
+
+        kalman_gain = variance / (variance + self.measurement_variance[idx])
+        # Covariance and State Updates
+        self.variance[idx] = np.where(update, variance * (1 - kalman_gain), variance)
+        estimation = np.where(
+            update, estimation * (1 - kalman_gain) + kalman_gain * x_in, estimation
+        )
+        self.estimation[idx] = estimation
+
+        return np.where(accepted, x_in, estimation), accepted
+
+
+class TimeBatch(BatchStrategy):
+    """Time Dependent Agents."""
+
+    def __init__(
+        self,
+        n: int,
+        is_buyer,
+        alpha: Literal["poly", "exp"],
+        t_max,
+        beta,
+        k,
+        x_min,
+        x_max,
+        abs_tol=0.0,
+    ) -> None:
+        """Initialize the engine."""
+        super().__init__(n, is_buyer, abs_tol)
+        self.alpha = {"poly": poly, "exp": exp}[alpha]
+        self.t_max = _param(t_max, n)
+        self.beta = _param(beta, n)
+        self.k = _param(k, n)
+        self.x_min = _param(x_min, n)
+        self.x_max = _param(x_max, n)
+
+    def _step(self, idx, x_in, t):
+        t_max = self.t_max[idx]
+        x_min = self.x_min[idx]
+        x_max = self.x_max[idx]
+
+        expired = t > t_max
+        with np.errstate(invalid="ignore"):
+            alpha_t = self.alpha(
+                np.minimum(t, t_max), t_max, self.beta[idx], self.k[idx]
+            )
+        x_out = np.where(
+            self.is_buyer[idx],
+            x_min + alpha_t * (x_max - x_min),
+            x_min + (1 - alpha_t) * (x_max - x_min),
+        )
+
+        accepted = ~expired & self._accepts(idx, x_in, x_out)
+        x_out = np.where(accepted, x_in, x_out)
+        return np.where(expired, np.nan, x_out), accepted
+
+
+class TitForTatBatch(BatchStrategy):
+    """TitForTat Agents, keeping the last delta + 1 incoming offers of each negotiation."""
+
+    def __init__(
+        self,
+        n: int,
+        is_buyer,
+        imitation_type: Literal["relative", "random_absolute", "averaged"],
+        delta: int,
+        x_min,
+        x_max,
+        m=1.0,
+        abs_tol=0.0,
+    ) -> None:
+        """Initialize the engine."""
+        super().__init__(n, is_buyer, abs_tol)
+        self.imitation_type = imitation_type
+        self.delta = delta
+        self.x_min = _param(x_min, n)
+        self.x_max = _param(x_max, n)
+        self.m = _param(m, n)
+
+        # Ring buffers of incoming offers.
+        self.history = np.zeros((n, delta + 1))
+        self.lengths = np.zeros(n, dtype=int)
+        self.x_out = np.zeros(n)
+
+    def _step(self, idx, x_in, t):
+        capacity = self.delta + 1
+        lengths = self.lengths[idx]
+        self.history[idx, lengths % capacity] = x_in
+        lengths += 1
+        self.lengths[idx] = lengths
+
+        def x_in_t(j):
+            # j-th last incoming offer.
+            return self.history[idx, (lengths - j) % capacity]
+
+        x_min = self.x_min[idx]
+        x_max = self.x_max[idx]
+        last_x_out = self.x_out[idx]
+        delta = np.maximum(np.minimum(lengths - 1, self.delta), 1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            match self.imitation_type:
+                case "relative":
+                    x_out = x_in_t(delta + 1) / x_in_t(delta) * last_x_out
+                case "random_absolute":
+                    variation = x_in_t(delta + 1) - x_in_t(delta)
+                    perturbation = self.m[idx] * np.random.randn(len(idx)) ** 2
+                    x_out = last_x_out + variation + perturbation
+                case "averaged":
+                    x_out = x_in_t(delta + 1) / x_in_t(1) * last_x_out
+                case _:
+                    raise ValueError(f"Unknown imitation type: {self.imitation_type}")
+        x_out = np.minimum(np.maximum(x_out, x_min), x_max)
+
+        first = lengths < 2
+        x_out = np.where(first, np.where(self.is_buyer[idx], x_min, x_max), x_out)
+        self.x_out[idx] = x_out
+
+        accepted = self._accepts(idx, x_in, x_out)
+        return np.where(accepted, x_in, x_out), accepted
+
+
+# Configuration parameters read by each strategy (see build).
+PARAMS = {
+    "naive": (),
+    "kalman": (
+        "valuation_estimation",
+        "valuation_variance",
+        "valuation_measurement_variance",
+        "absolute_tolerance",
+    ),
+    "poly_time": ("t_max", "beta", "k", "min_usdc", "max_usdc", "absolute_tolerance"),
+    "exp_time": ("t_max", "beta", "k", "min_usdc", "max_usdc", "absolute_tolerance"),
+    "tit_for_tat": (
+        "imitation_type",
+        "delta",
+        "min_usdc",
+        "max_usdc",
+        "M",
+        "absolute_tolerance",
+    ),
+}
+
+# Parameters of buyers replaced by their initial offer (see negotiate).
+BUYER_INITIAL_OFFER_PARAMS = {
+    "kalman": ("valuation_estimation",),
+}
+
+
+def build(agent_name: str, config: dict, n: int) -> BatchStrategy:
+    """Build the batched strategy of an agent of the registry from its configuration.
+
+    Configuration values may be arrays of n values, one per negotiation.
+    """
+    role, _, strategy = agent_name.partition("_")
+    is_buyer = role == "buyer"
+    abs_tol = config.get("absolute_tolerance", 0.0)
+
+    match strategy:
+        case "naive":
+            return NaiveBatch(n, is_buyer)
+        case "kalman":
+            return KalmanBatch(
+                n,
+                is_buyer,
+                config["valuation_estimation"],
+                config["valuation_variance"],
+                config["valuation_measurement_variance"],
+                abs_tol,
+            )
+        case "poly_time" | "exp_time":
+            return TimeBatch(
+                n,
+                is_buyer,
+                strategy.removesuffix("_time"),
+                config["t_max"],
+                config["beta"],
+                config["k"],
+                config["min_usdc"],
+                config["max_usdc"],
+                abs_tol,
+            )
+        case "tit_for_tat":
+            return TitForTatBatch(
+                n,
+                is_buyer,
+                config["imitation_type"],
+                int(config["delta"]),
+                config["min_usdc"],
+                config["max_usdc"],
+                config.get("M", 1.0),
+                abs_tol,
+            )
+
+    raise ValueError(f"Unknown agent: {agent_name}")
+
+
+def negotiate(
+    buyer: BatchStrategy,
+    seller: BatchStrategy,
+    x0,
+    max_rounds: int = 1000,
+    round_duration: float = 1.0,
+) -> dict[str, np.ndarray]:
+    """Run negotiations between buyers and sellers, from initial offers x0 to their outcomes.
+
+    Rounds follow apiary.simulator.negotiate: the seller responds to the offer of the buyer,
+    then, round_duration seconds later, the buyer responds to the seller.
+
+    Returns:
+        Outcomes (agreement, rejection, timeout), rounds and agreed amounts (NaN if none).
+    """
+    n = buyer.n
+    x = _param(x0, n).copy()
+    if isinstance(buyer, KalmanBatch):
+        # As when parsing the initial offer, the buyer valuation is its initial offer.
+        buyer.estimation[:] = x
+
+    active = np.ones(n, dtype=bool)
+    rejected = np.zeros(n, dtype=bool)
+    agreed = np.full(n, np.nan)
+    rounds = np.zeros(n, dtype=int)
+
+    t = 0.0
+    for _ in range(max_rounds):
+        if not active.any():
+            break
+        rounds += active
+
+        x_seller, _ = seller.step(x, t, active)
+        t += round_duration
+        abandoned = active & np.isnan(x_seller)
+        rejected |= abandoned
+        active &= ~abandoned
+
+        x, accepted = buyer.step(x_seller, t, active)
+        abandoned = active & np.isnan(x)
+        rejected |= abandoned
+        agreement = active & accepted
+        agreed[agreement] = x_seller[agreement]
+        active &= ~(abandoned | agreement)
+
+    outcome = np.where(
+        ~np.isnan(agreed), "agreement", np.where(rejected, "rejection", "timeout")
+    )
+    return {"outcome": outcome, "rounds": rounds, "agreed": agreed}
@@ -16,6 +16,6 @@ class Naive(Agent):
         super().__init__()
         logging.info("Naive Buyer initialized.")
 
-    def _handle_offer(self, input, output):
+    def _handle_offer(self, state, input, output):
         """Confirm seller counteroffer."""
         return self._offer_to_buy_attestation(input, output)
@@ -6,7 +6,7 @@ from datetime import datetime
 
 import click
 
-from apiary import constants, external_services, inference, utils
+from apiary import constants, utils
 
 current_time = datetime.now().replace(second=0, microsecond=0)
 CLI_TIME = current_time.strftime("%Y-%m-%d_%H-%M")
@@ -20,15 +20,23 @@ CLI_TIME = current_time.strftime("%Y-%m-%d_%H-%M")
     "--output-path",
     default="./apiary_output/",
 )
+@click.option(
+    "--profile",
+    type=click.Choice(["message", "sample"]),
+    default=None,
+    help="Profile each message with cProfile, or sample stacks over time windows, to {output-path}/profiles.",
+)
 def cli(
     verbose: bool,
     no_color: bool,
     logs_filename: str,
     output_path: str,
+    profile: str,
 ):
     """Management CLI for Apiary."""
     constants.VERBOSE = verbose
     constants.NO_COLOR = no_color
+    constants.OUTPUT_PATH = output_path
 
     logs_filename = utils.template(logs_filename, dict(time=CLI_TIME))
 
@@ -39,6 +47,14 @@ def cli(
 
     utils.setup_logger(logs_path=logs_path, verbose=verbose, no_color=no_color)
 
+    if profile is not None:
+        from apiary import profiling
+
+        # Inherited by the inference endpoint.
+        os.environ["PROFILE.MODE"] = profile
+        os.environ["PROFILE.DIR"] = os.path.join(output_dir, "profiles")
+        profiling.start()
+
 
 @cli.command()
 @click.option(
@@ -50,7 +66,13 @@ def cli(
     required=True,
 )
 @click.option("--tokens-data", required=True)
-def start_buy(config_path: str, job_path: str, tokens_data: str):
+@click.option(
+    "--messaging-client",
+    type=click.Choice(["bun", "python"]),
+    default=lambda: os.getenv("MESSAGING_CLIENT", "bun"),
+    help="bun: client/runner.ts calling the inference endpoint, python: in-process scheme client.",
+)
+def start_buy(config_path: str, job_path: str, tokens_data: str, messaging_client: str):
     """Start Buyer."""
     logging.info("Starting Buyer.")
     os.environ["ROLE"] = "buyer"
@@ -60,9 +82,7 @@ def start_buy(config_path: str, job_path: str, tokens_data: str):
     initial_offer = utils.parse_initial_offer(job_path, tokens_data)
     logging.info(f"Initial Offer: {initial_offer}")
 
-    inference.start_inference_endpoint()
-
-    external_services.start_messaging_client(initial_offer)
+    start_messaging(messaging_client, initial_offer)
 
 
 @cli.command()
@@ -70,7 +90,13 @@ def start_buy(config_path: str, job_path: str, tokens_data: str):
     "--config-path",
     required=True,
 )
-def start_sell(config_path: str):
+@click.option(
+    "--messaging-client",
+    type=click.Choice(["bun", "python"]),
+    default=lambda: os.getenv("MESSAGING_CLIENT", "bun"),
+    help="bun: client/runner.ts calling the inference endpoint, python: in-process scheme client.",
+)
+def start_sell(config_path: str, messaging_client: str):
     """Start Seller."""
     logging.info("Starting Seller.")
     os.environ["ROLE"] = "seller"
@@ -79,21 +105,227 @@ def start_sell(config_path: str):
 
     # external_services.start_job_daemon()
 
-    inference.start_inference_endpoint()
+    start_messaging(messaging_client)
+
+
+def start_messaging(messaging_client: str, initial_offer=None):
+    """Start the messaging of the Agent with the chosen messaging client."""
+    match messaging_client:
+        case "bun":
+            from apiary import external_services, inference
+
+            inference.start_inference_endpoint()
+            external_services.start_messaging_client(initial_offer)
+        case "python":
+            # In-process: no inference endpoint, runs in the foreground.
+            import asyncio
 
-    external_services.start_messaging_client()
+            from apiary import scheme_client
+
+            asyncio.run(scheme_client.run_messaging_client(initial_offer))
 
 
 @cli.command()
 @click.option(
-    "--filename",
-    required=True,
+    "--log-dir",
+    default="./apiary_output/negotiations/",
+)
+@click.option(
+    "--plot-offer-id",
+    default=None,
+    help="Also plot the offers of the negotiation with this offerId.",
 )
-def analysis(filename: str):
+def analysis(log_dir: str, plot_offer_id: str):
     """Offline Analysis."""
-    from apiary.utils import plot_negotiation
+    import csv
 
-    plot_negotiation(filename)
+    from apiary import analysis
+
+    output_dir = os.path.dirname(constants.OUTPUT_PATH)
+
+    negotiations = analysis.negotiations(log_dir)
+    logging.info(f"Analyzed {len(negotiations.get('offer_id', []))} negotiations.")
+
+    summary = analysis.strategies(negotiations)
+    if summary:
+        summary_path = os.path.join(output_dir, "strategies.csv")
+        with open(summary_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+            writer.writeheader()
+            writer.writerows(summary)
+        logging.info(f"Strategies summary written to {summary_path}.")
+
+    for row in summary:
+        logging.info(
+            f"{row['agent']} ({row['role']}): {row['negotiations']} negotiations, "
+            f"acceptance rate {row['acceptance_rate']:.2f}, "
+            f"convergence rounds {row['convergence_rounds']:.1f}, "
+            f"time to agreement {row['time_to_agreement']:.2f}s, "
+            f"surplus share {row['surplus_share']:.2f}."
+        )
+
+    if plot_offer_id is not None:
+        plot_path = os.path.join(output_dir, f"{plot_offer_id}.png")
+        analysis.plot_negotiation(log_dir, plot_offer_id, plot_path)
+        logging.info(f"Negotiation plotted to {plot_path}.")
+
+
+@cli.command()
+@click.option("--buyer", required=True, help="Buyer name in the agents registry.")
+@click.option("--seller", required=True, help="Seller name in the agents registry.")
+@click.option("--buyer-config-path", default=None)
+@click.option("--seller-config-path", default=None)
+@click.option(
+    "--tokens-data",
+    default='["ERC20", "0x036CbD53842c5426634e7929541eC2318f3dCF7e", 100]',
+)
+@click.option("--n-negotiations", default=100)
+@click.option("--max-rounds", default=1000)
+@click.option("--round-duration", default=1.0, help="Simulated seconds per round.")
+@click.option("--seed", default=None, type=int)
+def simulate(
+    buyer: str,
+    seller: str,
+    buyer_config_path: str,
+    seller_config_path: str,
+    tokens_data: str,
+    n_negotiations: int,
+    max_rounds: int,
+    round_duration: float,
+    seed: int,
+):
+    """Simulate Negotiations In-Process."""
+    import json
+
+    from apiary import simulator
+
+    buyer_agent = simulator.SimulatedAgent(
+        buyer, buyer_config_path or f"config/{buyer}.json", "buyer"
+    )
+    seller_agent = simulator.SimulatedAgent(
+        seller, seller_config_path or f"config/{seller}.json", "seller"
+    )
+    tokens = utils.create_offer_tokens(json.loads(tokens_data))
+
+    report = simulator.simulate(
+        buyer_agent,
+        seller_agent,
+        tokens,
+        n_negotiations,
+        max_rounds=max_rounds,
+        round_duration=round_duration,
+        seed=seed,
+    )
+    logging.info(
+        f"{buyer} vs {seller}: {report['agreements']}/{n_negotiations} agreements, "
+        f"{report['mean_rounds']:.1f} rounds, {report['rounds_per_second']:,.0f} rounds/s, "
+        f"{report['mean_seconds'] * 1e3:.2f}ms per negotiation "
+        f"(p95 {report['p95_seconds'] * 1e3:.2f}ms)."
+    )
+
+
+@cli.command()
+@click.option(
+    "--agent", required=True, help="Name of the agent to tune in the agents registry."
+)
+@click.option("--config-path", default=None)
+@click.option(
+    "--param",
+    "params",
+    multiple=True,
+    required=True,
+    help="Range of a parameter to tune, as NAME=LOW:HIGH (e.g. beta=0.5:10).",
+)
+@click.option("--method", type=click.Choice(["grid", "random"]), default="random")
+@click.option("--n-candidates", default=256, help="Number of random candidates.")
+@click.option("--grid-size", default=8, help="Number of grid points per parameter.")
+@click.option(
+    "--opponents",
+    default=None,
+    help="Comma separated opponents from the agents registry, all of the other role by default.",
+)
+@click.option("--amount", default=100.0, help="Amount of the initial offers.")
+@click.option(
+    "--valuation", required=True, type=float, help="Valuation of the tuned agent."
+)
+@click.option(
+    "--n-negotiations", default=100, help="Negotiations per candidate and opponent."
+)
+@click.option("--max-rounds", default=1000)
+@click.option("--round-duration", default=1.0, help="Simulated seconds per round.")
+@click.option(
+    "--workers", default=None, type=int, help="Worker processes, all cores by default."
+)
+@click.option("--checkpoint-path", default=None)
+@click.option("--seed", default=0)
+def tune(
+    agent: str,
+    config_path: str,
+    params: tuple,
+    method: str,
+    n_candidates: int,
+    grid_size: int,
+    opponents: str,
+    amount: float,
+    valuation: float,
+    n_negotiations: int,
+    max_rounds: int,
+    round_duration: float,
+    workers: int,
+    checkpoint_path: str,
+    seed: int,
+):
+    """Tune Strategy Parameters."""
+    import json
+
+    import readwrite as rw
+
+    from apiary import tuner
+
+    config_path = config_path or f"config/{agent}.json"
+    config = rw.read(config_path)
+    output_dir = os.path.dirname(constants.OUTPUT_PATH)
+
+    space = {}
+    for spec in params:
+        name, low, high = tuner.parse_param(spec)
+        space[name] = (low, high)
+    try:
+        tuner.check_params(agent, config, space)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    integers = {name for name in space if isinstance(config[name], int)}
+
+    candidates = tuner.sample_candidates(
+        space, method, n_candidates, grid_size, integers, seed
+    )
+    opponent_names = (
+        opponents.split(",") if opponents else tuner.default_opponents(agent)
+    )
+
+    results = tuner.tune(
+        agent,
+        config,
+        candidates,
+        tuner.load_opponents(opponent_names),
+        amount,
+        valuation,
+        checkpoint_path or os.path.join(output_dir, f"tune_{agent}.jsonl"),
+        n_negotiations=n_negotiations,
+        max_rounds=max_rounds,
+        round_duration=round_duration,
+        workers=workers,
+        seed=seed,
+    )
+
+    best = results[0]
+    best_config_path = os.path.join(output_dir, f"{agent}_tuned.json")
+    with open(best_config_path, "w") as f:
+        json.dump({**config, **best["params"]}, f, indent=4)
+    logging.info(
+        f"Best parameters {best['params']} (score {best['score']:.2f}) "
+        f"written to {best_config_path}."
+    )
 
 
 @cli.command()
@@ -114,14 +346,69 @@ def cancel_sell():
 
 
 @cli.command()
-def buy_status():
-    """Parse log output and show metrics relevant for the Buyer."""
-    # TODO
-    pass
+@click.option(
+    "--config-path",
+    required=True,
+)
+def buy_status(config_path: str):
+    """Show the metrics of the Buyer inference endpoint."""
+    os.environ["ROLE"] = "buyer"
+    show_status(config_path)
 
 
 @cli.command()
-def sell_status():
-    """Parse log output and show metrics relevant for the Seller."""
-    # TODO
-    pass
+@click.option(
+    "--config-path",
+    required=True,
+)
+def sell_status(config_path: str):
+    """Show the metrics of the Seller inference endpoint."""
+    os.environ["ROLE"] = "seller"
+    show_status(config_path)
+
+
+def show_status(config_path: str):
+    """Read the metrics of the inference endpoint of a configuration and log a summary."""
+    import urllib.request
+
+    from apiary import metrics
+
+    utils.load_configuration(config_path)
+
+    host = os.getenv("INFERENCE_ENDPOINT.HOST")
+    if host == "0.0.0.0":
+        host = "127.0.0.1"
+    url = f"http://{host}:{os.getenv('INFERENCE_ENDPOINT.PORT')}/metrics"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            samples = metrics.parse(response.read().decode())
+    except OSError as e:
+        logging.error(f"Could not read metrics from {url}: {e}")
+        return
+
+    for name, labels, value in samples:
+        match name:
+            case "apiary_messages_total":
+                logging.info(f"Messages {labels['tag']}: {value:.0f}")
+            case "apiary_negotiation_events_total":
+                logging.info(f"Negotiation events {labels['kind']}: {value:.0f}")
+            case "apiary_stage_errors_total":
+                logging.warning(f"Stage {labels['stage']} errors: {value:.0f}")
+            case "apiary_chain_errors_total":
+                logging.warning(f"Chain call {labels['call']} errors: {value:.0f}")
+
+    for histogram, label in (
+        ("apiary_stage_seconds", "stage"),
+        ("apiary_chain_seconds", "call"),
+    ):
+        for row in metrics.summarize(samples, histogram, label):
+            logging.info(
+                f"{row[label]}: {row['count']} calls, mean {row['mean']:.3f}s, "
+                f"p50 {row['p50']:.3f}s, p95 {row['p95']:.3f}s."
+            )
+
+    for row in metrics.summarize(samples, "apiary_negotiation_rounds", "role"):
+        logging.info(
+            f"Concluded negotiations: {row['count']}, mean {row['mean']:.1f} rounds, "
+            f"p95 {row['p95']:.0f} rounds."
+        )
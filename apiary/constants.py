@@ -2,3 +2,4 @@
 
 VERBOSE = False
 NO_COLOR = False
+OUTPUT_PATH = "./apiary_output/"
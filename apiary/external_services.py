@@ -4,7 +4,8 @@ import json
 import logging
 import os
 import subprocess
-import time
+
+from apiary import utils
 
 
 def start_job_daemon():
@@ -14,13 +15,12 @@ def start_job_daemon():
 
 
 def start_messaging_client(initial_offer=None):
-    """Start Messaging Client."""
+    """Start Messaging Client, returning once it is subscribed to its channel."""
     lock_file = f"messaging_client_{os.getenv('AGENT_NAME')}.lock"
-    if os.path.exists(lock_file):
-        with open(lock_file, "r") as file:
-            lock_content = file.read()
+    pid = utils.read_lock_file(lock_file)
+    if pid is not None:
         logging.warning(
-            f"{lock_file} already exists, assuming messaging client already running at PID {lock_content}"
+            f"{lock_file} already exists, assuming messaging client already running at PID {pid}"
         )
         return
 
@@ -34,9 +34,14 @@ def start_messaging_client(initial_offer=None):
         os.getenv("REDIS_URL"),
     ]
 
-    process = subprocess.Popen(command)
-
-    time.sleep(3)
+    # Buyers subscribe to their offer, sellers to initial offers (see client/runner.ts).
+    channel = initial_offer["offerId"] if initial_offer else "initial_offers"
+    is_subscribed, close_probe = _subscription_probe(channel)
+    try:
+        process = subprocess.Popen(command)
+        utils.wait_until_ready(process, is_subscribed, "Messaging client")
+    finally:
+        close_probe()
 
     with open(lock_file, "w") as f:
         f.write(str(process.pid))
@@ -44,6 +49,45 @@ def start_messaging_client(initial_offer=None):
     logging.info(f"Messaging Client started with PID {process.pid}")
 
 
+def _subscription_probe(channel: str):
+    """Readiness check of a new subscriber to channel, based on its Redis subscribers count.
+
+    Returns:
+        The readiness check, and a function closing its Redis connection.
+    """
+    try:
+        import redis
+    except ImportError:
+        logging.warning(
+            "redis is not installed, not waiting for the messaging client subscription."
+        )
+        return (lambda: True), (lambda: None)
+
+    client = redis.Redis.from_url(os.getenv("REDIS_URL"))
+    try:
+        [(_, subscribers)] = client.pubsub_numsub(channel)
+    except Exception:
+        client.close()
+        raise
+
+    def is_subscribed():
+        [(_, count)] = client.pubsub_numsub(channel)
+        return count > subscribers
+
+    return is_subscribed, client.close
+
+
+def publish_message(message: dict):
+    """Publish a message on its offer channel, as the messaging client does for agent responses."""
+    import redis
+
+    client = redis.Redis.from_url(os.getenv("REDIS_URL"))
+    try:
+        client.publish(message["offerId"], json.dumps(message))
+    finally:
+        client.close()
+
+
 def kill_job_daemon():
     """Kill Job Daemon."""
     pass
@@ -0,0 +1,168 @@
+"""Content-addressed cache of job images.
+
+Images are tagged by the hash of their Dockerfile, so that a job submitted again is not rebuilt.
+Least recently used images are removed once the cache exceeds its number of images or total size,
+unless a job is still running from them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """Cache of images built from job Dockerfiles, keyed by content hash."""
+
+    def __init__(
+        self,
+        index_path: str,
+        max_images: int,
+        max_bytes: int | None = None,
+        run=subprocess.run,
+    ) -> None:
+        """Initialize the cache, loading its index if present.
+
+        Args:
+            index_path: Path of the JSON index of cached images, in least recently used order.
+            max_images: Maximum number of cached images.
+            max_bytes: Maximum total size of cached images, unbounded if None.
+            run: Command runner, with the signature of subprocess.run.
+        """
+        self.index_path = index_path
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self._run = run
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # content hash -> image size, in least recently used order.
+        self._images = OrderedDict()
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                self._images.update(json.load(f))
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # tag -> number of jobs using the image, which is not evicted meanwhile.
+        self._in_use = {}
+
+    @staticmethod
+    def tag(key: str) -> str:
+        """Image tag of a content hash."""
+        return f"job-image-{key[:32]}"
+
+    def acquire(self, dockerfile: str, build_dir: str) -> str:
+        """Return the tag of the image of dockerfile, building it in build_dir if not cached.
+
+        The image is in use, and not evicted, until released.
+        """
+        key = hashlib.sha256(dockerfile.encode("utf-8")).hexdigest()
+        tag = self.tag(key)
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Concurrent jobs with the same Dockerfile wait for a single build.
+        with key_lock:
+            with self._lock:
+                cached = key in self._images
+                if cached:
+                    self._in_use[tag] = self._in_use.get(tag, 0) + 1
+            if cached and self._exists(tag):
+                with self._lock:
+                    self.hits += 1
+                    self._images.move_to_end(key)
+                    self._save_index()
+                logging.info(f"Image cache hit: {tag}.")
+                return tag
+            if cached:
+                self.release(tag)
+
+            os.makedirs(build_dir, exist_ok=True)
+            with open(os.path.join(build_dir, "Dockerfile"), "w") as f:
+                f.write(dockerfile)
+
+            self._run(f"podman build -t {tag} {build_dir}", shell=True, check=True)
+            size = self._size(tag)
+
+            with self._lock:
+                self.misses += 1
+                self._images[key] = size
+                self._images.move_to_end(key)
+                self._in_use[tag] = self._in_use.get(tag, 0) + 1
+                evicted = self._evict()
+                self._save_index()
+            logging.info(f"Image cache miss: {tag} built.")
+
+        for evicted_key in evicted:
+            self._remove(evicted_key)
+
+        return tag
+
+    def release(self, tag: str):
+        """Release an image acquired by a job, which can be evicted once no job uses it."""
+        with self._lock:
+            self._in_use[tag] -= 1
+            if not self._in_use[tag]:
+                del self._in_use[tag]
+
+    def _remove(self, key: str):
+        # Jobs with the same Dockerfile wait for the removal, then build the image again.
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._images:
+                    # Built again since evicted.
+                    return
+            tag = self.tag(key)
+            result = self._run(f"podman rmi {tag}", shell=True, check=False)
+            if result.returncode != 0:
+                logging.warning(f"Evicted image {tag} not removed.")
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def _exists(self, tag: str) -> bool:
+        return self._run(f"podman image exists {tag}", shell=True).returncode == 0
+
+    def _size(self, tag: str) -> int:
+        result = self._run(
+            f"podman image inspect --format '{{{{.Size}}}}' {tag}",
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+        try:
+            return int(result.stdout.strip())
+        except ValueError:
+            return 0
+
+    def _evict(self) -> list[str]:
+        # Least recently used images first, skipping the ones in use.
+        evicted = []
+        total_bytes = sum(self._images.values())
+        for key, size in list(self._images.items()):
+            if len(self._images) <= self.max_images and (
+                self.max_bytes is None or total_bytes <= self.max_bytes
+            ):
+                break
+            if self.tag(key) in self._in_use:
+                continue
+            del self._images[key]
+            total_bytes -= size
+            evicted.append(key)
+
+        self.evictions += len(evicted)
+        return evicted
+
+    def _save_index(self):
+        if os.path.dirname(self.index_path):
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path, "w") as f:
+            json.dump(list(self._images.items()), f)
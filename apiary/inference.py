@@ -2,56 +2,89 @@
 
 import logging
 import os
+import socket
 import subprocess
-import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from apiary import agent_registry, metrics, profiling, utils
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the Agent once at startup and stop its daemons at shutdown."""
+    profiling.start()
+    agent_registry.get_cached_agent()
+    yield
+    agent_registry.clear_agents_cache()
+    profiling.stop()
 
-from apiary import agent_registry
 
 # FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/")
-async def inference_endpoint(message: dict):
+def inference_endpoint(message: dict):
     """Process a message and return the inference result.
 
+    The endpoint runs in the FastAPI threadpool: blocking chain calls release the GIL,
+    so that in-flight attestations overlap without stalling the event loop.
+
     The inference function defines the behavior of Agents based on predefined Policies within the CoopHive simulator.
 
     Policies dictate how an Agent interacts with the Schema-compliant messaging scheme (action space), determining its mode of behavior.
     Each policy operates in a stateless manner, meaning that the Agent's actions (inferences) are computed in real-time
     using the current state, without persisting any state in memory.
     """
-    agent = agent_registry.get_agent()
-    states = agent.load_states()
+    agent, states = agent_registry.get_cached_agent()
     return agent.infer(states, message)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Expose the metrics of the worker in the Prometheus text format."""
+    return metrics.render()
+
+
+def _port_open(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+
 def start_inference_endpoint():
-    """Start Inference Endpoint."""
+    """Start Inference Endpoint, returning once it accepts connections."""
     lock_file = f"inference_endpoint_{os.getenv('AGENT_NAME')}.lock"
-    if os.path.exists(lock_file):
-        with open(lock_file, "r") as file:
-            lock_content = file.read()
+    pid = utils.read_lock_file(lock_file)
+    if pid is not None:
         logging.warning(
-            f"{lock_file} already exists, assuming job_daemon already running at PID {lock_content}"
+            f"{lock_file} already exists, assuming inference endpoint already running at PID {pid}"
         )
         return
 
+    host = os.getenv("INFERENCE_ENDPOINT.HOST")
+    port = int(os.getenv("INFERENCE_ENDPOINT.PORT"))
     command = [
         "uvicorn",
         "apiary.inference:app",
         "--host",
-        os.getenv("INFERENCE_ENDPOINT.HOST"),
+        host,
         "--port",
-        str(os.getenv("INFERENCE_ENDPOINT.PORT")),
+        str(port),
     ]
 
     # Start the Uvicorn app and dump the PID to the lock file
     process = subprocess.Popen(command)
 
-    time.sleep(3)
+    # Uvicorn binds its port once the Agent is built (lifespan startup).
+    utils.wait_until_ready(
+        process, lambda: _port_open(host, port), "Inference endpoint"
+    )
 
     with open(lock_file, "w") as f:
         f.write(str(process.pid))
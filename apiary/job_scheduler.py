@@ -0,0 +1,300 @@
+"""Job scheduler, running accepted deals' jobs outside of message handling.
+
+Accepted buy attestations are persisted to a sqlite queue before being acknowledged,
+run by a bounded pool of workers and, once their job is done, handed to a completion callback.
+Failed runs and failed completions are retried with exponential backoff, the result of a job
+being persisted once it ran so that its completion is retried without running it again.
+Jobs still pending when the scheduler stops are resumed at the next start, completed ones are
+kept for a retention period (so that a buy attestation delivered twice is not run twice).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable
+
+
+class JobQueue:
+    """Persistent queue of jobs, keyed by job id (e.g. the buy attestation uid)."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the queue, creating its sqlite database if needed."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "updated_at REAL, result TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt REAL)"
+            )
+            columns = [
+                column[1]
+                for column in self._connection.execute("PRAGMA table_info(jobs)")
+            ]
+            if "updated_at" not in columns:
+                # Queue created before completed jobs were pruned.
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN updated_at REAL")
+                self._connection.execute(
+                    "UPDATE jobs SET updated_at = ?", (time.time(),)
+                )
+            if "result" not in columns:
+                # Queue created before failed jobs were retried.
+                self._connection.execute("ALTER TABLE jobs ADD COLUMN result TEXT")
+                self._connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+                )
+                self._connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN next_attempt REAL"
+                )
+
+    def put(self, job_id: str, payload: dict) -> bool:
+        """Enqueue a job, returning False if it was already pending or done.
+
+        A failed job is enqueued again, keeping its result if it ran.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, 'pending', ?, NULL, 0, NULL) "
+                "ON CONFLICT (job_id) DO UPDATE SET status = 'pending', "
+                "updated_at = excluded.updated_at, attempts = 0, next_attempt = NULL "
+                "WHERE status = 'failed'",
+                (job_id, json.dumps(payload), time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def set_status(self, job_id: str, status: str):
+        """Update the status (pending, done, failed) of a job."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                (status, time.time(), job_id),
+            )
+
+    def set_result(self, job_id: str, result: dict):
+        """Record the result of a job, and what its completion did so far."""
+        with self._lock, self._connection:
+            # Attempts count the failures of the current step: running, then completing.
+            self._connection.execute(
+                "UPDATE jobs SET attempts = CASE WHEN result IS NULL THEN 0 ELSE attempts END, "
+                "result = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def result(self, job_id: str) -> dict | None:
+        """Result of a job, None if it did not run yet."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def add_attempt(self, job_id: str) -> int:
+        """Record a failed attempt of a job, returning the failed attempts of its current step."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (time.time(), job_id),
+            )
+            (attempts,) = self._connection.execute(
+                "SELECT attempts FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return attempts
+
+    def set_next_attempt(self, job_id: str, next_attempt: float):
+        """Record the UNIX time at which a job is retried."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET next_attempt = ? WHERE job_id = ?",
+                (next_attempt, job_id),
+            )
+
+    def pending(self) -> list[tuple[str, dict, float | None]]:
+        """List the jobs not yet completed, with the UNIX time of their next attempt."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT job_id, payload, next_attempt FROM jobs WHERE status = 'pending'"
+            ).fetchall()
+        return [
+            (job_id, json.loads(payload), next_attempt)
+            for job_id, payload, next_attempt in rows
+        ]
+
+    def prune(self, before: float) -> int:
+        """Delete the jobs completed (done or failed) before a UNIX time, returning their count."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM jobs WHERE status != 'pending' AND updated_at < ?",
+                (before,),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Close the underlying database."""
+        with self._lock:
+            self._connection.close()
+
+
+class JobScheduler:
+    """Bounded pool of workers running queued jobs, with per-resource concurrency limits."""
+
+    def __init__(
+        self,
+        run_job: Callable[[dict], dict],
+        on_complete: Callable[[dict, dict, Callable[[dict], None]], None],
+        workers: int,
+        queue_path: str,
+        resource_limits: dict[str, int] | None = None,
+        retention: float = 7 * 24 * 3600,
+        max_attempts: int = 8,
+        backoff: float = 30,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            run_job: Runs the job described by a payload, returning its (JSON serializable) result.
+            on_complete: Called with the payload and the result of each successful job, and a
+                checkpoint function persisting the result, in which it records its progress so
+                that a retried completion does not repeat what succeeded.
+            workers: Maximum number of jobs running at the same time.
+            queue_path: Path of the sqlite database persisting the queue.
+            resource_limits: Maximum number of concurrent holders of each named resource (see limit).
+            retention: Seconds completed jobs are kept in the queue.
+            max_attempts: Attempts at running, then at completing, a job before it fails.
+            backoff: Seconds before the first retry, doubled at each retry.
+        """
+        self.run_job = run_job
+        self.on_complete = on_complete
+        self.workers = workers
+        self.retention = retention
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.queue = JobQueue(queue_path)
+        self._semaphores = {
+            resource: threading.BoundedSemaphore(limit)
+            for resource, limit in (resource_limits or {}).items()
+        }
+        self._executor = None
+        self._next_prune = 0.0
+        self._timers = set()
+        self._timers_lock = threading.Lock()
+
+    def start(self):
+        """Start the workers and resume the jobs left pending."""
+        self._prune()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="apiary-job"
+        )
+
+        now = time.time()
+        for job_id, payload, next_attempt in self.queue.pending():
+            logging.info(f"Resuming job {job_id}.")
+            self._schedule(job_id, payload, (next_attempt or now) - now)
+
+    def stop(self, wait: bool = True):
+        """Stop the workers; jobs not completed stay pending in the queue."""
+        with self._timers_lock:
+            for timer in self._timers:
+                timer.cancel()
+            self._timers.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        self.queue.close()
+
+    def submit(self, job_id: str, payload: dict):
+        """Persist and schedule a job, returning without waiting for it.
+
+        Raises:
+            RuntimeError: If the scheduler is not running.
+        """
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError(f"Job scheduler not running, job {job_id} not accepted.")
+        if not self.queue.put(job_id, payload):
+            logging.warning(f"Job {job_id} already scheduled.")
+            return
+        executor.submit(self._work, job_id, payload)
+
+    def _schedule(self, job_id: str, payload: dict, delay: float):
+        if delay > 0:
+            timer = threading.Timer(delay, self._retry, (job_id, payload))
+            timer.daemon = True
+            with self._timers_lock:
+                self._timers.add(timer)
+            timer.start()
+            return
+
+        executor = self._executor
+        try:
+            if executor is None:
+                raise RuntimeError("Job scheduler stopped.")
+            executor.submit(self._work, job_id, payload)
+        except RuntimeError:
+            # Stopped in the meantime, the job is resumed at the next start.
+            logging.info(f"Job {job_id} left pending.")
+
+    def _retry(self, job_id: str, payload: dict):
+        with self._timers_lock:
+            self._timers.discard(threading.current_thread())
+        self._schedule(job_id, payload, 0)
+
+    @contextmanager
+    def limit(self, resource: str):
+        """Hold one of the slots of a resource, waiting for one if all are taken."""
+        semaphore = self._semaphores.get(resource)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    def _work(self, job_id: str, payload: dict):
+        result = self.queue.result(job_id)
+        step = "run" if result is None else "complete"
+        try:
+            if result is None:
+                result = self.run_job(payload)
+                self.queue.set_result(job_id, result)
+                step = "complete"
+            self.on_complete(
+                payload, result, lambda result: self.queue.set_result(job_id, result)
+            )
+        except Exception:
+            attempts = self.queue.add_attempt(job_id)
+            if attempts < self.max_attempts:
+                backoff = self.backoff * 2 ** (attempts - 1)
+                self.queue.set_next_attempt(job_id, time.time() + backoff)
+                logging.warning(
+                    f"Job {job_id} failed to {step} ({attempts}/{self.max_attempts}), "
+                    f"retrying in {backoff:.0f}s.",
+                    exc_info=True,
+                )
+                self._schedule(job_id, payload, backoff)
+                return
+            logging.error(
+                f"Job {job_id} failed to {step} after {attempts} attempts.",
+                exc_info=True,
+            )
+            self.queue.set_status(job_id, "failed")
+        else:
+            self.queue.set_status(job_id, "done")
+        self._prune()
+
+    def _prune(self):
+        # At most hourly, completed jobs are only kept to ignore duplicated submissions.
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + min(self.retention, 3600)
+        pruned = self.queue.prune(now - self.retention)
+        if pruned:
+            logging.info(f"{pruned} completed jobs pruned from the job queue.")
@@ -0,0 +1,221 @@
+"""Process-wide metrics, exposed in the Prometheus text format.
+
+Histograms time the stages of a deal (storage transfers, podman build and run, chain calls)
+and the handling of messages; counters count messages, negotiation events and errors.
+Chain calls are also timed within apiars, whose timings are drained into the
+apiary_chain_seconds histogram whenever metrics are rendered.
+
+Metrics are kept in memory per process: with several inference workers, each one exposes
+its own.
+"""
+
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds, from negotiation rounds to podman builds and on-chain confirmations.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ROUND_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        """Initialize the counter."""
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        """Increment the counter of labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        """Samples of the counter, as (name, labels, value)."""
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Histogram of observations with cumulative buckets, by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=BUCKETS) -> None:
+        """Initialize the histogram."""
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Record an observation of labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        """Samples of the histogram, as (name, labels, value)."""
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    le = (("le", _format_value(bound)),)
+                    samples.append((f"{self.name}_bucket", key + le, count))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, counts[-1]))
+        return samples
+
+
+STAGE_SECONDS = Histogram("apiary_stage_seconds", "Duration of deal stages.")
+STAGE_ERRORS = Counter("apiary_stage_errors_total", "Failed deal stages.")
+CHAIN_SECONDS = Histogram("apiary_chain_seconds", "Duration of apiars chain calls.")
+CHAIN_ERRORS = Counter("apiary_chain_errors_total", "Failed apiars chain calls.")
+MESSAGES = Counter("apiary_messages_total", "Messages handled by the Agent, by tag.")
+NEGOTIATION_EVENTS = Counter(
+    "apiary_negotiation_events_total",
+    "Negotiation events (offer, counteroffer, accept, reject).",
+)
+NEGOTIATION_ROUNDS = Histogram(
+    "apiary_negotiation_rounds", "Rounds of concluded negotiations.", ROUND_BUCKETS
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    STAGE_ERRORS,
+    CHAIN_SECONDS,
+    CHAIN_ERRORS,
+    MESSAGES,
+    NEGOTIATION_EVENTS,
+    NEGOTIATION_ROUNDS,
+]
+
+
+@contextmanager
+def timer(stage: str):
+    """Time a deal stage, counting its errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def collect_apiars():
+    """Drain the timings of apiars chain calls into CHAIN_SECONDS and CHAIN_ERRORS."""
+    try:
+        from apiary import apiars
+    except ImportError:
+        return
+
+    if not hasattr(apiars, "metrics"):
+        return
+    for call, seconds, ok in apiars.metrics.drain_timings():
+        CHAIN_SECONDS.observe(seconds, call=call)
+        if not ok:
+            CHAIN_ERRORS.inc(call=call)
+
+
+def render() -> str:
+    """Metrics of the process in the Prometheus text format."""
+    collect_apiars()
+
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_SAMPLE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+
+def parse(text: str) -> list[tuple[str, dict, float]]:
+    """Parse samples of the Prometheus text format, as (name, labels, value)."""
+    samples = []
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        samples.append((name, dict(_LABEL.findall(labels or "")), float(value)))
+    return samples
+
+
+def _quantile(q: float, buckets: list[tuple[float, float]]) -> float:
+    """Quantile estimated from cumulative buckets, interpolating within a bucket."""
+    count = buckets[-1][1]
+    if count == 0:
+        return math.nan
+    rank = q * count
+    lower, below = 0.0, 0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == math.inf:
+                return lower
+            return lower + (bound - lower) * (rank - below) / (cumulative - below)
+        lower, below = bound, cumulative
+    return lower
+
+
+def summarize(
+    samples: list[tuple[str, dict, float]], name: str, label: str
+) -> list[dict]:
+    """Summarize a histogram by label: count, mean, p50 and p95."""
+    rows = {}
+    for sample_name, labels, value in samples:
+        if not sample_name.startswith(name) or label not in labels:
+            continue
+        row = rows.setdefault(labels[label], {label: labels[label], "buckets": []})
+        match sample_name.removeprefix(name):
+            case "_bucket":
+                row["buckets"].append((float(labels["le"]), value))
+            case "_sum":
+                row["sum"] = value
+            case "_count":
+                row["count"] = int(value)
+
+    summary = []
+    for row in rows.values():
+        buckets = sorted(row.pop("buckets"))
+        count = row.get("count", 0)
+        summary.append(
+            {
+                **row,
+                "mean": row.get("sum", 0.0) / count if count else math.nan,
+                "p50": _quantile(0.5, buckets),
+                "p95": _quantile(0.95, buckets),
+            }
+        )
+    return summary
@@ -0,0 +1,205 @@
+"""Negotiation event log.
+
+Events (offers, counteroffers, acceptances, rejections) are tagged by offerId and round,
+so that concurrent negotiations can be told apart. They are buffered in memory and appended
+to a newline-delimited JSON segment by a background thread, off the request path.
+Once large enough, segments are rotated into Parquet partitions for analysis.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from apiary import utils
+
+FIELDS = ("offer_id", "round", "role", "agent", "kind", "amount", "token", "timestamp")
+
+
+def get_schema():
+    """Arrow schema of negotiation events."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("offer_id", pa.string()),
+            ("round", pa.int64()),
+            ("role", pa.string()),
+            ("agent", pa.string()),
+            ("kind", pa.string()),
+            ("amount", pa.float64()),
+            ("token", pa.string()),
+            ("timestamp", pa.float64()),
+        ]
+    )
+
+
+def rotate_segment(segment_path: str, log_dir: str) -> str:
+    """Turn a closed segment into a partition of log_dir and return its path.
+
+    Partitions are Parquet files, or the segment itself if pyarrow is not installed.
+    """
+    name = f"part-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logging.warning("pyarrow not installed, negotiation log kept as JSON lines.")
+        partition_path = os.path.join(log_dir, f"{name}.jsonl")
+        os.replace(segment_path, partition_path)
+        return partition_path
+
+    with open(segment_path, "r") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    partition_path = os.path.join(log_dir, f"{name}.parquet")
+    # Write aside, so that readers never see partial partitions.
+    tmp_path = os.path.join(log_dir, f".{name}.parquet.tmp")
+    pq.write_table(pa.Table.from_pylist(rows, schema=get_schema()), tmp_path)
+    os.replace(tmp_path, partition_path)
+    os.remove(segment_path)
+    return partition_path
+
+
+class NegotiationLog:
+    """Buffered log of negotiation events, flushed in the background."""
+
+    def __init__(
+        self, log_dir: str, flush_interval: float = 1.0, rotate_rows: int = 100_000
+    ) -> None:
+        """Initialize the log.
+
+        Args:
+            log_dir: Directory of the log segments and partitions.
+            flush_interval: Seconds between background flushes.
+            rotate_rows: Number of events after which a segment is rotated into a partition.
+        """
+        self.log_dir = os.path.abspath(log_dir)
+        self.flush_interval = flush_interval
+        self.rotate_rows = rotate_rows
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._segment_path = None
+        self._segment_rows = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._recover_segments()
+
+    def record(self, **event):
+        """Buffer an event, timestamped now unless given a timestamp."""
+        event.setdefault("timestamp", time.time())
+        with self._lock:
+            self._buffer.append(event)
+
+    def start(self):
+        """Start flushing in the background."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="apiary-negotiation-log", daemon=True
+        )
+        self._thread.start()
+
+    def flush(self):
+        """Append buffered events to the current segment, rotating it if large enough."""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+
+        with self._write_lock:
+            if events:
+                if self._segment_path is None:
+                    self._segment_path = os.path.join(
+                        self.log_dir, f"segment-{os.getpid()}-{uuid.uuid4().hex}.jsonl"
+                    )
+                with open(self._segment_path, "a") as f:
+                    for event in events:
+                        f.write(
+                            json.dumps({field: event.get(field) for field in FIELDS})
+                        )
+                        f.write("\n")
+                self._segment_rows += len(events)
+
+            if self._segment_rows >= self.rotate_rows:
+                self._rotate()
+
+    def close(self):
+        """Stop flushing in the background, flush and rotate the current segment."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+        with self._write_lock:
+            self._rotate()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logging.error("Negotiation log flush failed.", exc_info=True)
+
+    def _rotate(self):
+        if self._segment_path is None:
+            return
+        partition_path = rotate_segment(self._segment_path, self.log_dir)
+        logging.debug(f"Negotiation log rotated into {partition_path}.")
+        self._segment_path = None
+        self._segment_rows = 0
+
+    def _recover_segments(self):
+        # Segments left by processes that exited without closing their log.
+        for segment_path in glob.glob(os.path.join(self.log_dir, "segment-*.jsonl")):
+            pid = int(os.path.basename(segment_path).split("-")[1])
+            if pid == os.getpid() or utils.pid_alive(pid):
+                continue
+            try:
+                rotate_segment(segment_path, self.log_dir)
+            except FileNotFoundError:
+                # Recovered by another process in the meantime.
+                pass
+
+
+# Logs shared by the Agents of a process, keyed by directory.
+_negotiation_logs = {}
+_negotiation_logs_lock = threading.Lock()
+
+
+def get_negotiation_log() -> NegotiationLog:
+    """Get the negotiation log of NEGOTIATION_LOG.DIR, started and closed at exit.
+
+    Flush interval and rotation size are read from NEGOTIATION_LOG.FLUSH_INTERVAL and
+    NEGOTIATION_LOG.ROTATE_ROWS.
+    """
+    log_dir = os.path.abspath(
+        os.getenv("NEGOTIATION_LOG.DIR") or "apiary_output/negotiations"
+    )
+
+    with _negotiation_logs_lock:
+        negotiation_log = _negotiation_logs.get(log_dir)
+        if negotiation_log is None:
+            negotiation_log = NegotiationLog(
+                log_dir,
+                flush_interval=float(
+                    os.getenv("NEGOTIATION_LOG.FLUSH_INTERVAL") or 1.0
+                ),
+                rotate_rows=int(os.getenv("NEGOTIATION_LOG.ROTATE_ROWS") or 100_000),
+            )
+            negotiation_log.start()
+            atexit.register(negotiation_log.close)
+            _negotiation_logs[log_dir] = negotiation_log
+
+    return negotiation_log
@@ -0,0 +1,176 @@
+"""Opt-in profiling of message handling.
+
+Profiling is configured with environment variables (or the profile section of a configuration),
+so that the inference endpoint started by the CLI inherits it:
+    PROFILE.MODE: message, to profile each message with cProfile, or sample, to sample the stacks
+        of all threads over time windows. Profiling is off if unset.
+    PROFILE.DIR: Output directory, apiary_output/profiles by default.
+    PROFILE.INTERVAL: Seconds between samples (sample mode), 0.005 by default.
+    PROFILE.WINDOW: Seconds of samples per output file (sample mode), 60 by default.
+
+Message profiles are pstats files named after the offerId and _tag of the message
+(e.g. for flameprof or snakeviz). Samples are written as folded stacks (for flamegraph.pl or
+speedscope), the stacks of threads handling a message being rooted at its _tag, then offerId.
+"""
+
+import atexit
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Messages handled by thread, as (_tag, offerId).
+_messages = {}
+# cProfile cannot profile concurrent messages: a message handled while another one is
+# profiled is not profiled.
+_profile_lock = threading.Lock()
+_sampler = None
+
+
+def get_mode() -> str | None:
+    """Profiling mode, None if profiling is off."""
+    mode = os.getenv("PROFILE.MODE") or None
+    if mode not in (None, "message", "sample"):
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    return mode
+
+
+def get_output_dir() -> str:
+    """Output directory of profiles."""
+    output_dir = os.getenv("PROFILE.DIR") or "apiary_output/profiles"
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def _safe(name) -> str:
+    return re.sub(r"[^\w.-]", "_", str(name))
+
+
+@contextmanager
+def message(input: dict):
+    """Profile the handling of a message, according to the profiling mode."""
+    mode = get_mode()
+    if mode is None:
+        yield
+        return
+
+    offer_id = input.get("offerId")
+    tag = input.get("data", {}).get("_tag")
+    thread_id = threading.get_ident()
+    _messages[thread_id] = (tag, offer_id)
+    try:
+        if mode == "message" and _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                yield
+            finally:
+                profiler.disable()
+                _profile_lock.release()
+                file_path = os.path.join(
+                    get_output_dir(),
+                    f"{_safe(offer_id)}-{_safe(tag)}-{time.time_ns()}.prof",
+                )
+                profiler.dump_stats(file_path)
+        else:
+            yield
+    finally:
+        _messages.pop(thread_id, None)
+
+
+class Sampler:
+    """Sampling profiler of the stacks of all threads, flushed as folded stacks per time window."""
+
+    def __init__(
+        self, output_dir: str, interval: float = 0.005, window: float = 60.0
+    ) -> None:
+        """Initialize the sampler."""
+        self.output_dir = output_dir
+        self.interval = interval
+        self.window = window
+
+        self._stacks = Counter()
+        self._window_start = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self._window_start = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logging.info(f"Sampling profiler started, writing to {self.output_dir}.")
+
+    def stop(self):
+        """Stop sampling and flush the current window."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def sample(self):
+        """Record the current stack of every other thread."""
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            message = _messages.get(thread_id)
+            if message is not None:
+                # Root frames: _tag, then offerId.
+                stack.extend(str(name) for name in reversed(message))
+            self._stacks[";".join(reversed(stack))] += 1
+
+    def flush(self):
+        """Write the samples of the current window as folded stacks and start a new window."""
+        stacks, self._stacks = self._stacks, Counter()
+        start, self._window_start = self._window_start, time.time()
+        if not stacks:
+            return
+
+        file_path = os.path.join(
+            self.output_dir, f"sample-{os.getpid()}-{int(start)}.folded"
+        )
+        with open(file_path, "w") as f:
+            for stack, count in stacks.items():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.time() - self._window_start >= self.window:
+                self.flush()
+
+
+def start():
+    """Start the sampling profiler of the process, if PROFILE.MODE is sample."""
+    global _sampler
+    if get_mode() != "sample" or _sampler is not None:
+        return
+
+    _sampler = Sampler(
+        get_output_dir(),
+        interval=float(os.getenv("PROFILE.INTERVAL") or 0.005),
+        window=float(os.getenv("PROFILE.WINDOW") or 60),
+    )
+    _sampler.start()
+    atexit.register(stop)
+
+
+def stop():
+    """Stop the sampling profiler of the process, flushing its last window."""
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
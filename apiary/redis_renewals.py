@@ -0,0 +1,263 @@
+"""Renewal scheduler of Redis provisions.
+
+Provisions sold are indexed by expiration in a sqlite database, so that the ones due for
+renewal are read in expiration order from the index rather than by scanning every lease.
+A provision is renewed once its user paid for the renewal (a buy statement replacing it):
+due renewals are submitted in batches (reviseStatement, then collectPayment, pipelined by
+apiars.redis.update_many_and_collect), and provisions left unpaid past their expiration expire,
+as do paid ones whose renewal still fails once they expired.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+# Fields of a provision, in the order of apiars.redis provisions.
+PROVISION_FIELDS = ("user", "capacity", "egress", "cpus", "server_name", "url")
+
+
+class LeaseIndex:
+    """Persistent index of provisions (leases), keyed by statement uid and ordered by expiration."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the index, creating its sqlite database if needed."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "statement_uid TEXT PRIMARY KEY, expiration INTEGER NOT NULL, "
+                "provision TEXT NOT NULL, status TEXT NOT NULL, "
+                "renewal_uid TEXT, new_expiration INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS leases_by_expiration ON leases (status, expiration)"
+            )
+
+    def put(self, statement_uid: str, expiration: int, provision: dict):
+        """Index an active provision."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO leases VALUES (?, ?, ?, 'active', NULL, NULL)",
+                (statement_uid, expiration, json.dumps(provision)),
+            )
+
+    def set_renewal(
+        self, statement_uid: str, renewal_uid: str, new_expiration: int
+    ) -> bool:
+        """Record the buy statement paying for the renewal of a provision, False if unknown."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE leases SET renewal_uid = ?, new_expiration = ? "
+                "WHERE statement_uid = ? AND status = 'active'",
+                (renewal_uid, new_expiration, statement_uid),
+            )
+        return cursor.rowcount == 1
+
+    def due(self, until: int, limit: int, renewed: bool) -> list[dict]:
+        """Active provisions expiring by until, in expiration order.
+
+        Args:
+            until: UNIX time of the latest expiration.
+            limit: Maximum number of provisions.
+            renewed: Whether to list the provisions paid for renewal, or the unpaid ones.
+        """
+        renewal = "renewal_uid IS NOT NULL" if renewed else "renewal_uid IS NULL"
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT statement_uid, expiration, provision, renewal_uid, new_expiration "
+                f"FROM leases WHERE status = 'active' AND expiration <= ? AND {renewal} "
+                "ORDER BY expiration LIMIT ?",
+                (until, limit),
+            ).fetchall()
+        return [
+            {
+                "statement_uid": statement_uid,
+                "expiration": expiration,
+                "provision": json.loads(provision),
+                "renewal_uid": renewal_uid,
+                "new_expiration": new_expiration,
+            }
+            for statement_uid, expiration, provision, renewal_uid, new_expiration in rows
+        ]
+
+    def replace(self, statement_uid: str, new_statement_uid: str):
+        """Mark a provision as renewed and index the provision replacing it."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO leases SELECT ?, new_expiration, provision, 'active', NULL, NULL "
+                "FROM leases WHERE statement_uid = ?",
+                (new_statement_uid, statement_uid),
+            )
+            self._connection.execute(
+                "UPDATE leases SET status = 'renewed' WHERE statement_uid = ?",
+                (statement_uid,),
+            )
+
+    def set_status(self, statement_uid: str, status: str):
+        """Update the status (active, renewed, expired) of a provision."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE leases SET status = ? WHERE statement_uid = ?",
+                (status, statement_uid),
+            )
+
+    def close(self):
+        """Close the underlying database."""
+        with self._lock:
+            self._connection.close()
+
+
+def renew_with_apiars(private_key: str) -> Callable[[list[dict]], list[tuple]]:
+    """Batch renewal function submitting renewals with apiars.redis.update_many_and_collect."""
+
+    def renew_batch(leases: list[dict]) -> list[tuple]:
+        from apiary import apiars
+
+        renewals = [
+            (
+                lease["renewal_uid"],
+                lease["statement_uid"],
+                tuple(lease["provision"][field] for field in PROVISION_FIELDS),
+                lease["new_expiration"],
+            )
+            for lease in leases
+        ]
+        return apiars.redis.update_many_and_collect(renewals, private_key)
+
+    return renew_batch
+
+
+class RenewalScheduler:
+    """Periodic renewal of the provisions due within a horizon, in batches."""
+
+    def __init__(
+        self,
+        renew_batch: Callable[[list[dict]], list[tuple]],
+        index_path: str,
+        on_expire: Callable[[dict], None] | None = None,
+        horizon: float = 300,
+        batch_size: int = 100,
+        interval: float = 10,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            renew_batch: Renews leases, returning (new statement uid, error) for each of them.
+            index_path: Path of the sqlite database persisting the lease index.
+            on_expire: Called with each lease expired without being renewed (e.g. to deprovision it).
+            horizon: Seconds before expiration from which a paid lease is renewed.
+            batch_size: Maximum number of leases renewed or expired per batch.
+            interval: Seconds between two runs.
+        """
+        self.renew_batch = renew_batch
+        self.on_expire = on_expire
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.interval = interval
+        self.index = LeaseIndex(index_path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, statement_uid: str, expiration: int, provision: dict):
+        """Index a provision sold (e.g. the result of apiars.redis.make_new_and_collect)."""
+        self.index.put(statement_uid, expiration, provision)
+
+    def request_renewal(
+        self, statement_uid: str, renewal_uid: str, new_expiration: int
+    ):
+        """Schedule the renewal of a provision, paid by the buy statement renewal_uid."""
+        if not self.index.set_renewal(statement_uid, renewal_uid, new_expiration):
+            logging.warning(
+                f"Renewal of unknown or inactive provision {statement_uid} ignored."
+            )
+
+    def run_once(self, now: float | None = None) -> int:
+        """Renew the paid leases due within the horizon and expire the expired ones not renewed.
+
+        Returns the number of leases renewed.
+        """
+        now = time.time() if now is None else now
+        renewed = 0
+
+        while True:
+            leases = self.index.due(
+                int(now + self.horizon), self.batch_size, renewed=True
+            )
+            if not leases:
+                break
+            results = self.renew_batch(leases)
+            failed = 0
+            for lease, (new_statement_uid, error) in zip(leases, results):
+                if new_statement_uid is None:
+                    logging.error(
+                        f"Renewal of {lease['statement_uid']} failed: {error}"
+                    )
+                    if lease["expiration"] <= now:
+                        self._expire(lease)
+                    else:
+                        # Left active, retried at the next run.
+                        failed += 1
+                    continue
+                self.index.replace(lease["statement_uid"], new_statement_uid)
+                renewed += 1
+            if failed or len(leases) < self.batch_size:
+                break
+
+        while True:
+            leases = self.index.due(int(now), self.batch_size, renewed=False)
+            for lease in leases:
+                self._expire(lease)
+            if len(leases) < self.batch_size:
+                break
+
+        return renewed
+
+    def _expire(self, lease: dict):
+        self.index.set_status(lease["statement_uid"], "expired")
+        if self.on_expire is not None:
+            self.on_expire(lease)
+
+    def start(self):
+        """Run the scheduler every interval in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and close the index."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.index.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logging.error("Renewal run failed.", exc_info=True)
+            self._stop.wait(self.interval)
+
+
+def get_renewal_scheduler(private_key: str) -> RenewalScheduler:
+    """Renewal scheduler configured from the REDIS_RENEWALS.* environment variables.
+
+    REDIS_RENEWALS.INDEX_PATH (apiary_output/redis_leases.db), REDIS_RENEWALS.HORIZON (300 seconds),
+    REDIS_RENEWALS.BATCH_SIZE (100) and REDIS_RENEWALS.INTERVAL (10 seconds).
+    """
+    return RenewalScheduler(
+        renew_with_apiars(private_key),
+        index_path=os.getenv("REDIS_RENEWALS.INDEX_PATH")
+        or "apiary_output/redis_leases.db",
+        horizon=float(os.getenv("REDIS_RENEWALS.HORIZON") or 300),
+        batch_size=int(os.getenv("REDIS_RENEWALS.BATCH_SIZE") or 100),
+        interval=float(os.getenv("REDIS_RENEWALS.INTERVAL") or 10),
+    )
@@ -0,0 +1,210 @@
+"""Python messaging client of the compute marketplace scheme.
+
+Implements the rules of dcnScheme (client/compute-marketplace-scheme.ts) over Redis pub/sub,
+as client/client.ts does, but calls the Agent in-process instead of through the inference
+endpoint: no bun process, HTTP round-trip or extra serialization per message.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+
+from apiary import agent_registry
+
+DEFAULT_CHANNEL = "initial_offers"
+
+
+async def on_agent(client, role: str, input: dict, output: dict) -> bool:
+    """Check that output is a valid response to input and send it, as dcnScheme.onAgent."""
+    # output is responding to input
+    if input["offerId"] != output["offerId"]:
+        return False
+
+    input_tag = input["data"]["_tag"]
+    output_tag = output["data"]["_tag"]
+
+    match role, input_tag, output_tag:
+        # anyone can cancel a negotiation at any time
+        case _, _, "cancel":
+            return await client.unsubscribe_send(output)
+        # seller can respond to buyer's attestation (payment)
+        # with their own attestation (result)
+        case "seller", "buyAttest", "sellAttest":
+            return await client.unsubscribe_send(output)
+        # seller can respond to initial offers with a counteroffer
+        case "seller", "offer", "offer" if input.get("initial"):
+            return await client.subscribe_send(output)
+        # anyone can respond to a non-initial offer with a counteroffer
+        case _, "offer", "offer":
+            return await client.send(output)
+        # buyer can respond to counteroffers with payment
+        case "buyer", "offer", "buyAttest":
+            return await client.send(output)
+
+    # the above rules are exhaustive
+    return False
+
+
+async def on_message(client, role: str, message: dict):
+    """React to a message received, before the agent responds, as dcnScheme.onMessage."""
+    match role, message["data"]["_tag"]:
+        # seller stops listening to a negotiation once its attestation (result) is sent,
+        # including when the job was run in the background and the attestation published
+        # by the agent itself
+        case "seller", "sellAttest":
+            await client.unsubscribe(message["offerId"])
+
+
+async def on_start(client, role: str, init: dict | None = None) -> bool:
+    """Check the role and initial message of a client and join, as dcnScheme.onStart."""
+    match role:
+        # buyers must join with an initial offer
+        case "buyer" if (
+            init is not None and init.get("initial") and init["data"]["_tag"] == "offer"
+        ):
+            return await client.subscribe_send(init)
+        # sellers must join without an initial offer
+        case "seller" if init is None:
+            return await client.subscribe()
+
+    return False
+
+
+class RedisSchemeClient:
+    """Redis-based scheme client, handling messages with an in-process Agent."""
+
+    def __init__(
+        self,
+        role: str,
+        agent,
+        states,
+        redis_url: str,
+        default_channel: str = DEFAULT_CHANNEL,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+            role: buyer or seller.
+            agent: The Agent handling messages.
+            states: The negotiation states of the Agent.
+            redis_url: URL of the Redis server.
+            default_channel: Channel of initial offers.
+        """
+        self.role = role
+        self.agent = agent
+        self.states = states
+        self.redis_url = redis_url
+        self.default_channel = default_channel
+
+        self._redis = None
+        self._pubsub = None
+        self._tasks = set()
+
+    async def start(self, init: dict | None = None) -> bool:
+        """Connect to Redis and join the scheme."""
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis.from_url(self.redis_url)
+        self._pubsub = self._redis.pubsub()
+
+        if not await on_start(self, self.role, init):
+            raise RuntimeError("Failed to start")
+        return True
+
+    async def subscribe(self, offer_id: str | None = None) -> bool:
+        """Listen to the messages of an offer, or to initial offers."""
+        await self._pubsub.subscribe(offer_id or self.default_channel)
+        return True
+
+    async def unsubscribe(self, offer_id: str | None = None) -> bool:
+        """Stop listening to the messages of an offer, or to initial offers."""
+        await self._pubsub.unsubscribe(offer_id or self.default_channel)
+        return True
+
+    async def send(self, message: dict) -> bool:
+        """Publish a message on its offer channel, or on the default channel if initial."""
+        channel = self.default_channel if message.get("initial") else message["offerId"]
+        await self._redis.publish(channel, json.dumps(message))
+        return True
+
+    async def subscribe_send(self, message: dict) -> bool:
+        """Listen to the messages of the offer of a message, then send it."""
+        return await self.subscribe(message["offerId"]) and await self.send(message)
+
+    async def unsubscribe_send(self, message: dict) -> bool:
+        """Stop listening to the messages of the offer of a message, then send it."""
+        return await self.unsubscribe(message["offerId"]) and await self.send(message)
+
+    async def run(self):
+        """Handle incoming messages until cancelled."""
+        while True:
+            if not self._pubsub.subscribed:
+                # Nothing to listen to until the next subscription.
+                await asyncio.sleep(0.01)
+                continue
+
+            message = await self._pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=1.0
+            )
+            if message is None:
+                continue
+
+            # Messages are handled concurrently, as inferences may block on chain calls.
+            task = asyncio.create_task(
+                self._on_message(message["data"], message["channel"].decode())
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Wait for messages being handled and disconnect."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _on_message(self, raw: bytes, topic: str):
+        message = json.loads(raw)
+
+        # spam filter
+        if topic != message["offerId"] and not (
+            topic == self.default_channel and message.get("initial")
+        ):
+            return
+        await on_message(self, self.role, message)
+        logging.info(f"message to agent: {message}")
+
+        try:
+            # Agents update their input in place, it is kept intact for the scheme rules.
+            response = await asyncio.to_thread(
+                self.agent.infer, self.states, copy.deepcopy(message)
+            )
+        except Exception:
+            logging.error("Agent inference failed.", exc_info=True)
+            return
+        logging.info(f"agent response: {response}")
+
+        if response == "noop":
+            return
+        if not await on_agent(self, self.role, message, response):
+            logging.error(
+                f"Invalid agent response. Role: {self.role}, Message: {message}, Response: {response}"
+            )
+
+
+async def run_messaging_client(initial_offer: dict | None = None):
+    """Run the Python messaging client of the configured Agent until cancelled."""
+    agent, states = agent_registry.get_cached_agent()
+    client = RedisSchemeClient(os.getenv("ROLE"), agent, states, os.getenv("REDIS_URL"))
+
+    await client.start(initial_offer)
+    logging.info("Messaging Client started.")
+    try:
+        await client.run()
+    finally:
+        await client.close()
+        agent_registry.clear_agents_cache()
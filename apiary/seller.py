@@ -16,7 +16,7 @@ class Naive(Agent):
         super().__init__()
         logging.info("Naive Seller initialized.")
 
-    def _handle_offer(self, input, output):
+    def _handle_offer(self, state, input, output):
         """Confirm buyer offer with identity counteroffer."""
-        _ = input
+        _ = state, input
         return output
@@ -1,30 +1,29 @@
 """This module defines the Agents Shared among different roles, used within the CoopHive protocol."""
 
-import json
 import logging
-import os
-from datetime import datetime
 from typing import Literal
 
 import numpy as np
 from apiary.base_agent import Agent
-from apiary.utils import add_float_to_csv
 from dotenv import load_dotenv
 
+from apiary import batch_strategies, strategy_params
+
 load_dotenv(override=True)
 
 
 class Kalman(Agent):
     """Kalman filter-based Agent in the CoopHive protocol."""
 
+    params_class = strategy_params.KalmanParams
+
     def __init__(self, is_buyer: bool) -> None:
         """Initialize the instance."""
         super().__init__()
         logging.info("Kalman initialized.")
         self.is_buyer = is_buyer
-        self.abs_tol = float(os.getenv("ABSOLUTE_TOLERANCE") or 0.0)
 
-    def _handle_offer(self, input, output):
+    def _handle_offer(self, state, input, output):
         # TODO: generalize strategy to multi-dimensional payment case.
 
         # TODO: move to appending the state of the negotiation instead of overwriting it
@@ -38,15 +37,19 @@ class Kalman(Agent):
                 "Strategy currently defined over scalar ERC20 amount only."
             )
 
-        add_float_to_csv(input["data"]["tokens"][0]["amt"], "negotiation")
-        valuation_estimation = float(os.getenv("VALUATION_ESTIMATION"))
-        valuation_variance = float(os.getenv("VALUATION_VARIANCE"))
+        params = self.params
+        # Configured valuation is the prior of each negotiation.
+        valuation_estimation = state.get(
+            "valuation_estimation", params.valuation_estimation
+        )
+        valuation_variance = state.get("valuation_variance", params.valuation_variance)
 
         valuation_measurement = input["data"]["tokens"][0]["amt"]
 
         if (
             self.is_buyer
-            and valuation_measurement <= valuation_estimation + self.abs_tol
+            and valuation_measurement
+            <= valuation_estimation + params.absolute_tolerance
         ):
             # Beneficial incoming offer, no further negotiation needed.
             return self._offer_to_buy_attestation(input, output)
@@ -55,9 +58,7 @@ class Kalman(Agent):
             # Confirm buyer offer with identity counteroffer
             return output
         else:
-            valuation_measurement_variance = float(
-                os.getenv("VALUATION_MEASUREMENT_VARIANCE")
-            )
+            valuation_measurement_variance = params.valuation_measurement_variance
 
             kalman_gain = valuation_variance / (
                 valuation_variance + valuation_measurement_variance
@@ -65,36 +66,36 @@ class Kalman(Agent):
 
             # Covariance Update
             valuation_variance *= 1 - kalman_gain
-            os.environ["VALUATION_VARIANCE"] = str(valuation_variance)
+            state["valuation_variance"] = valuation_variance
 
             # State Update
             valuation_estimation *= 1 - kalman_gain
             valuation_estimation += kalman_gain * valuation_measurement
-            os.environ["VALUATION_ESTIMATION"] = str(valuation_estimation)
+            state["valuation_estimation"] = valuation_estimation
             output["data"]["tokens"][0]["amt"] = valuation_estimation
 
-            add_float_to_csv(output["data"]["tokens"][0]["amt"], "negotiation")
             return output
 
 
 class Time(Agent):
     """Time Dependent Agent in the CoopHive protocol."""
 
+    params_class = strategy_params.TimeParams
+
     def __init__(self, is_buyer: bool, alpha: Literal["poly", "exp"]) -> None:
         """Initialize the instance."""
         super().__init__()
         logging.info("Time initialized.")
         self.is_buyer = is_buyer
         self.alpha = alpha
-        self.abs_tol = float(os.getenv("ABSOLUTE_TOLERANCE") or 0.0)
 
     def _poly(self, t, t_max, beta, k):
-        return k + (1 - k) * (t / t_max) ** (1 / beta)
+        return batch_strategies.poly(t, t_max, beta, k)
 
     def _exp(self, t, t_max, beta, k):
-        return k ** ((1 - t / t_max) ** beta)
+        return batch_strategies.exp(t, t_max, beta, k)
 
-    def _handle_offer(self, input, output):
+    def _handle_offer(self, state, input, output):
         """Handle Offer Using Time."""
         if (
             len(input["data"]["tokens"]) != 1
@@ -107,33 +108,32 @@ class Time(Agent):
             # TODO: Agents shall have a whitelist of assets and potentially a set of parameters asset-specific, in the multivariate case.
             # This is true for every strategy, and should inform the high-level design of agents.
 
-        t0 = float(os.getenv("T0"))
-        t = datetime.utcnow().timestamp() - t0
-        t_max = float(os.getenv("T_MAX"))
+        params = self.params
+        t = self._now() - state["t0"]
+        t_max = params.t_max
 
         if t > t_max:
             return "noop"
 
-        add_float_to_csv(input["data"]["tokens"][0]["amt"], "negotiation")
         x_in = input["data"]["tokens"][0]["amt"]
 
-        beta = float(os.getenv("BETA"))
-        k = float(os.getenv("K"))
+        beta = params.beta
+        k = params.k
 
         if self.alpha == "poly":
             alpha_t = self._poly(t, t_max, beta, k)
         elif self.alpha == "exp":
             alpha_t = self._exp(t, t_max, beta, k)
 
-        x_min = int(os.getenv("MIN_USDC"))
-        x_max = int(os.getenv("MAX_USDC"))
+        x_min = params.min_usdc
+        x_max = params.max_usdc
 
         if self.is_buyer:
             x_out = x_min + alpha_t * (x_max - x_min)
         else:
             x_out = x_min + (1 - alpha_t) * (x_max - x_min)
 
-        if self.is_buyer and x_in <= x_out + self.abs_tol:
+        if self.is_buyer and x_in <= x_out + params.absolute_tolerance:
             # Beneficial incoming offer, no further negotiation needed.
             return self._offer_to_buy_attestation(input, output)
         elif not self.is_buyer and x_in >= x_out:
@@ -142,13 +142,58 @@ class Time(Agent):
             return output
         else:
             output["data"]["tokens"][0]["amt"] = x_out
-            add_float_to_csv(output["data"]["tokens"][0]["amt"], "negotiation")
             return output
 
 
+class History:
+    """Bounded history of the last values of a negotiation, stored in its state.
+
+    Values are kept in a ring buffer, a list of at most capacity values with the position of the
+    oldest one, so that appending is O(1) and the state stays JSON serializable (see
+    state_store.RedisStateStore) and bounded however long the negotiation.
+    """
+
+    def __init__(self, state: dict, key: str, capacity: int) -> None:
+        """Load the history of state[key], created if missing and resized to capacity."""
+        ring = state.setdefault(key, {"values": [], "head": 0})
+        if isinstance(ring, list):
+            # State saved before the ring buffer, a list of all the values in order.
+            ring = state[key] = {"values": ring[-capacity:], "head": 0}
+        values, head = ring["values"], ring["head"]
+        if len(values) > capacity or (len(values) < capacity and head):
+            # Capacity changed (e.g. reloaded parameters), keep the most recent values in order.
+            ring["values"] = (values[head:] + values[:head])[-capacity:]
+            ring["head"] = 0
+        self._ring = ring
+        self.capacity = capacity
+
+    def append(self, value):
+        """Append a value, overwriting the oldest one once full."""
+        ring = self._ring
+        values = ring["values"]
+        if len(values) < self.capacity:
+            values.append(value)
+        else:
+            values[ring["head"]] = value
+            ring["head"] = (ring["head"] + 1) % self.capacity
+
+    def __len__(self) -> int:
+        """Number of values kept, at most capacity."""
+        return len(self._ring["values"])
+
+    def __getitem__(self, i: int):
+        """Value i steps back, -1 being the last one."""
+        values = self._ring["values"]
+        if not -len(values) <= i < 0:
+            raise IndexError(f"History index {i} out of range.")
+        return values[(self._ring["head"] + i) % len(values)]
+
+
 class TitForTat(Agent):
     """TitForTat Agent in the CoopHive protocol."""
 
+    params_class = strategy_params.TitForTatParams
+
     def __init__(
         self,
         is_buyer: bool,
@@ -159,10 +204,8 @@ class TitForTat(Agent):
         logging.info("TitForTat initialized.")
         self.is_buyer = is_buyer
         self.imitation_type = imitation_type
-        self.delta = int(os.getenv("DELTA"))
-        self.abs_tol = float(os.getenv("ABSOLUTE_TOLERANCE") or 0.0)
 
-    def _handle_offer(self, input, output):
+    def _handle_offer(self, state, input, output):
         """Handle Offer."""
         if (
             len(input["data"]["tokens"]) != 1
@@ -175,23 +218,22 @@ class TitForTat(Agent):
             # TODO: Agents shall have a whitelist of assets and potentially a set of parameters asset-specific, in the multivariate case.
             # This is true for every strategy, and should inform the high-level design of agents.
 
-        add_float_to_csv(input["data"]["tokens"][0]["amt"], "negotiation")
+        params = self.params
         x_in = input["data"]["tokens"][0]["amt"]
 
-        x_int_t_str = "X_IN_T"
-        x_in_t = json.loads(os.getenv(x_int_t_str, "[]"))
+        # Only the last delta + 1 offers are imitated.
+        x_in_t = History(state, "x_in_t", params.delta + 1)
         x_in_t.append(x_in)
-        os.environ[x_int_t_str] = json.dumps(x_in_t)
 
-        x_min = float(os.getenv("MIN_USDC"))
-        x_max = float(os.getenv("MAX_USDC"))
+        x_min = params.min_usdc
+        x_max = params.max_usdc
 
         len_x_in_t = len(x_in_t)
         if len_x_in_t < 2:
             x_out = x_min if self.is_buyer else x_max
         else:
-            delta = min(len_x_in_t - 1, self.delta)
-            last_x_out = float(os.getenv("X_OUT", 0))
+            delta = min(len_x_in_t - 1, params.delta)
+            last_x_out = state.get("x_out", 0.0)
 
             if self.imitation_type == "relative":
                 ratio = x_in_t[-delta - 1] / x_in_t[-delta]
@@ -199,18 +241,16 @@ class TitForTat(Agent):
             elif self.imitation_type == "random_absolute":
                 variation = x_in_t[-delta - 1] - x_in_t[-delta]
                 perturbation = (
-                    +(1 ** (int(self.is_buyer)))
-                    * float(os.getenv("M", 1))
-                    * np.random.randn() ** 2
+                    +(1 ** (int(self.is_buyer))) * params.m * np.random.randn() ** 2
                 )
                 x_out = min(max(last_x_out + variation + perturbation, x_min), x_max)
             elif self.imitation_type == "averaged":
                 ratio = x_in_t[-delta - 1] / x_in_t[-1]
                 x_out = min(max(ratio * last_x_out, x_min), x_max)
 
-        os.environ["X_OUT"] = str(x_out)
+        state["x_out"] = x_out
 
-        if self.is_buyer and x_in <= x_out + self.abs_tol:
+        if self.is_buyer and x_in <= x_out + params.absolute_tolerance:
             # Beneficial incoming offer, no further negotiation needed.
             return self._offer_to_buy_attestation(input, output)
         elif not self.is_buyer and x_in >= x_out:
@@ -219,5 +259,4 @@ class TitForTat(Agent):
             return output
         else:
             output["data"]["tokens"][0]["amt"] = x_out
-            add_float_to_csv(output["data"]["tokens"][0]["amt"], "negotiation")
             return output
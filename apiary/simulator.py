@@ -0,0 +1,211 @@
+"""In-process negotiation simulator.
+
+Pairs a buyer and a seller from the agents registry and drives their inferences directly,
+without inference endpoints, messaging client or Redis. Buy attestations are stubbed, so that
+no transaction is sent, and time is simulated, so that time-dependent strategies advance by a
+fixed duration per round instead of by wall-clock time.
+
+Agents read their configuration from environment variables: each simulated agent
+carries its own flattened configuration, set around each of its calls, from which its
+strategy parameters are parsed.
+"""
+
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import readwrite as rw
+
+from apiary import agent_registry, state_store, utils
+
+SIMULATION_ENV = {
+    "STORAGE.BACKEND": "local",
+    "STORAGE.CACHE_MAX_BYTES": "0",
+}
+
+
+@contextmanager
+def environment(env: dict):
+    """Set environment variables, restoring the previous ones on exit."""
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class SimulatedAgent:
+    """An Agent of the registry with its own configuration, states and simulated clock."""
+
+    def __init__(self, agent_name: str, config: dict | str, role: str) -> None:
+        """Build the agent under its configuration.
+
+        Args:
+            agent_name: Name of the agent in the agents registry.
+            config: Configuration dictionary, or path of a configuration file.
+            role: buyer or seller.
+        """
+        if isinstance(config, str):
+            config = rw.read(config)
+
+        self.env = {
+            **SIMULATION_ENV,
+            **utils.flatten_config(config),
+            "AGENT_NAME": agent_name,
+            "ROLE": role,
+        }
+        self.now = 0.0
+
+        with environment(self.env):
+            self.agent = agent_registry.get_agent()
+            self.states = state_store.InMemoryStateStore(ttl=float("inf"))
+
+        self.agent._now = lambda: self.now
+        self.agent._offer_to_buy_attestation = self._offer_to_buy_attestation
+
+    @property
+    def public_key(self) -> str:
+        """Public key of the agent."""
+        return self.env.get("PUBLIC_KEY", self.env["ROLE"])
+
+    def infer(self, message: dict):
+        """Infer the response of the agent to a message."""
+        with environment(self.env):
+            return self.agent.infer(self.states, message)
+
+    def _offer_to_buy_attestation(self, input, output):
+        output["data"]["_tag"] = "buyAttest"
+        output["data"]["attestation"] = f"0x{uuid.uuid4().hex}"
+        output["data"].pop("query", None)
+        output["data"].pop("tokens", None)
+        return output
+
+
+def _copy(message: dict) -> dict:
+    # Messages are serialized between agents, which share nothing.
+    data = dict(message["data"])
+    if "tokens" in data:
+        data["tokens"] = [dict(token) for token in data["tokens"]]
+    return {**message, "data": data}
+
+
+def negotiate(
+    buyer: SimulatedAgent,
+    seller: SimulatedAgent,
+    tokens: list,
+    max_rounds: int = 1000,
+    round_duration: float = 1.0,
+) -> dict:
+    """Simulate a negotiation, from the initial offer of the buyer to its outcome.
+
+    Args:
+        buyer: The buyer.
+        seller: The seller.
+        tokens: Tokens of the initial offer (see utils.create_offer_tokens).
+        max_rounds: Maximum number of offers of the buyer.
+        round_duration: Simulated seconds between two offers.
+
+    Returns:
+        Offer id, outcome (agreement, rejection or timeout), number of rounds,
+        agreed tokens and wall-clock duration of the negotiation.
+    """
+    start = time.perf_counter()
+    offer_id = str(uuid.uuid4())
+
+    buyer.now = seller.now = 0.0
+    if len(tokens) == 1 and tokens[0]["tokenStandard"] == "ERC20":
+        # As when parsing the initial offer, the buyer valuation is its initial offer.
+        buyer.env["VALUATION_ESTIMATION"] = str(tokens[0]["amt"])
+        buyer.agent._reload_params({**os.environ, **buyer.env})
+    # Initial Offer UNIX time (Buyer Measurement), as set when parsing the initial offer.
+    buyer.states.save(offer_id, {"t0": 0.0})
+
+    message = {
+        "pubkey": buyer.public_key,
+        "offerId": offer_id,
+        "initial": True,
+        "data": {"_tag": "offer", "query": "FROM alpine", "tokens": tokens},
+    }
+
+    outcome = "timeout"
+    agreed = None
+    rounds = 0
+    while rounds < max_rounds:
+        rounds += 1
+
+        message = seller.infer(_copy(message))
+        seller.now += round_duration
+        buyer.now += round_duration
+        if message == "noop":
+            outcome = "rejection"
+            break
+
+        last_offer = message["data"]["tokens"]
+        message = buyer.infer(_copy(message))
+        if message == "noop":
+            outcome = "rejection"
+            break
+        if message["data"]["_tag"] == "buyAttest":
+            outcome = "agreement"
+            agreed = last_offer
+            break
+
+    for agent in (buyer, seller):
+        agent.states.delete(offer_id)
+
+    return {
+        "offer_id": offer_id,
+        "outcome": outcome,
+        "rounds": rounds,
+        "tokens": agreed,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def simulate(
+    buyer: SimulatedAgent,
+    seller: SimulatedAgent,
+    tokens: list,
+    n_negotiations: int,
+    max_rounds: int = 1000,
+    round_duration: float = 1.0,
+    seed: int | None = None,
+) -> dict:
+    """Simulate n_negotiations negotiations and report their outcomes and throughput."""
+    if seed is not None:
+        np.random.seed(seed)
+
+    results = [
+        negotiate(buyer, seller, tokens, max_rounds, round_duration)
+        for _ in range(n_negotiations)
+    ]
+
+    seconds = np.array([result["seconds"] for result in results])
+    rounds = np.array([result["rounds"] for result in results])
+    outcomes = [result["outcome"] for result in results]
+
+    report = {
+        "negotiations": n_negotiations,
+        "agreements": outcomes.count("agreement"),
+        "rejections": outcomes.count("rejection"),
+        "timeouts": outcomes.count("timeout"),
+        "mean_rounds": float(rounds.mean()),
+        "rounds_per_second": float(rounds.sum() / seconds.sum()),
+        "mean_seconds": float(seconds.mean()),
+        "p95_seconds": float(np.percentile(seconds, 95)),
+        "results": results,
+    }
+    logging.info(
+        f"{n_negotiations} negotiations: {report['agreements']} agreements, "
+        f"{report['mean_rounds']:.1f} rounds on average, "
+        f"{report['rounds_per_second']:,.0f} rounds/s."
+    )
+    return report
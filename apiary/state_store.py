@@ -0,0 +1,118 @@
+"""Per-negotiation state stores, keyed by offerId.
+
+Negotiation states (e.g. the thread t0, Kalman estimates, TitForTat histories) are plain dictionaries
+loaded before and saved after each inference, so that concurrent negotiations do not share state.
+"""
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class StateStore(ABC):
+    """A store of negotiation states, keyed by offerId, expiring after ttl seconds of inactivity."""
+
+    def __init__(self, ttl: float) -> None:
+        """Initialize the store."""
+        self.ttl = ttl
+
+    @abstractmethod
+    def load(self, offer_id: str) -> dict:
+        """Load the state of a negotiation, empty if unknown or expired."""
+        ...
+
+    @abstractmethod
+    def save(self, offer_id: str, state: dict):
+        """Save the state of a negotiation, resetting its expiration."""
+        ...
+
+    @abstractmethod
+    def delete(self, offer_id: str):
+        """Delete the state of a concluded negotiation."""
+        ...
+
+
+class InMemoryStateStore(StateStore):
+    """Process-local, thread-safe state store with TTL eviction."""
+
+    def __init__(self, ttl: float) -> None:
+        """Initialize the store."""
+        super().__init__(ttl)
+        # offer_id -> (expiration, state), ordered by expiration since the ttl is shared.
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float):
+        while self._states:
+            offer_id, (expiration, _) = next(iter(self._states.items()))
+            if expiration > now:
+                break
+            del self._states[offer_id]
+
+    def load(self, offer_id: str) -> dict:
+        """Load the state of a negotiation, empty if unknown or expired."""
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            entry = self._states.get(offer_id)
+        return {} if entry is None else entry[1]
+
+    def save(self, offer_id: str, state: dict):
+        """Save the state of a negotiation, resetting its expiration."""
+        with self._lock:
+            self._states[offer_id] = (time.monotonic() + self.ttl, state)
+            self._states.move_to_end(offer_id)
+
+    def delete(self, offer_id: str):
+        """Delete the state of a concluded negotiation."""
+        with self._lock:
+            self._states.pop(offer_id, None)
+
+    def __len__(self) -> int:
+        """Number of negotiations currently stored."""
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return len(self._states)
+
+
+class RedisStateStore(StateStore):
+    """State store shared among processes, backed by Redis key expiration."""
+
+    def __init__(self, ttl: float, redis_url: str, prefix: str = "apiary:negotiation:"):
+        """Initialize the store."""
+        super().__init__(ttl)
+        import redis
+
+        self._client = redis.Redis.from_url(redis_url)
+        self._prefix = prefix
+
+    def load(self, offer_id: str) -> dict:
+        """Load the state of a negotiation, empty if unknown or expired."""
+        raw = self._client.get(self._prefix + offer_id)
+        return {} if raw is None else json.loads(raw)
+
+    def save(self, offer_id: str, state: dict):
+        """Save the state of a negotiation, resetting its expiration."""
+        self._client.set(
+            self._prefix + offer_id, json.dumps(state), ex=max(1, int(self.ttl))
+        )
+
+    def delete(self, offer_id: str):
+        """Delete the state of a concluded negotiation."""
+        self._client.delete(self._prefix + offer_id)
+
+
+def get_state_store() -> StateStore:
+    """Get the state store selected by STATE_STORE (memory, redis), with STATE_STORE_TTL seconds expiration."""
+    backend = os.getenv("STATE_STORE") or "memory"
+    ttl = float(os.getenv("STATE_STORE_TTL") or 3600)
+
+    match backend:
+        case "memory":
+            return InMemoryStateStore(ttl)
+        case "redis":
+            return RedisStateStore(ttl, os.getenv("REDIS_URL"))
+
+    raise ValueError(f"Unknown state store: {backend}")
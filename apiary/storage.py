@@ -0,0 +1,324 @@
+"""Content storage used by Agents to exchange jobs and results.
+
+Storages are addressed by content identifiers (cids). Lighthouse is the default backend:
+the Lighthouse SDK reads whole files in memory when uploading, files are instead streamed
+in chunks as a multipart body, so that memory usage does not depend on the size of results.
+Since cids are immutable, a local content-addressed cache can sit in front of any backend.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class MultipartFile:
+    """Multipart/form-data body of a single file, iterated in chunks read from disk."""
+
+    def __init__(self, file_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+        """Initialize the body."""
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+
+        filename = os.path.basename(file_path)
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    @property
+    def content_type(self) -> str:
+        """Content-Type header of the body."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        """Size of the body, so that it is sent with a Content-Length rather than chunked encoding."""
+        return len(self._head) + os.path.getsize(self.file_path) + len(self._tail)
+
+    def __iter__(self):
+        """Iterate over the body."""
+        yield self._head
+        with open(self.file_path, "rb") as f:
+            while chunk := f.read(self.chunk_size):
+                yield chunk
+        yield self._tail
+
+
+def upload_file(lh, file_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Upload a file to Lighthouse in chunks and return its cid."""
+    import requests
+    from lighthouseweb3.functions.config import Config
+
+    body = MultipartFile(file_path, chunk_size)
+    response = requests.post(
+        f"{Config.lighthouse_node}/api/v0/add",
+        data=body,
+        headers={
+            "Authorization": f"Bearer {lh.token}",
+            "Content-Type": body.content_type,
+            "Encryption": "false",
+            "Mime-Type": "application/octet-stream",
+        },
+    )
+    response.raise_for_status()
+
+    try:
+        data = response.json()
+    except ValueError:
+        # Progress lines may precede the final result.
+        data = json.loads(response.text.strip().split("\n")[-1])
+    return data["Hash"]
+
+
+def download_file(lh, cid: str, file_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Download a file from Lighthouse in chunks to file_path and return it."""
+    with open(file_path, "wb") as f:
+        lh.downloadBlob(f, cid, chunk_size)
+    return file_path
+
+
+def file_hash(file_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """Sha256 of the content of a file, read in chunks."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class Storage(ABC):
+    """A content-addressed storage."""
+
+    @abstractmethod
+    def upload(self, file_path: str) -> str:
+        """Upload a file and return its cid."""
+        ...
+
+    @abstractmethod
+    def download(self, cid: str, file_path: str) -> str:
+        """Download the content of a cid to file_path and return it."""
+        ...
+
+    @property
+    def uncached(self) -> "Storage":
+        """The storage without its cache, for content read once (e.g. job results)."""
+        return self
+
+
+class LighthouseStorage(Storage):
+    """Lighthouse (IPFS) storage."""
+
+    def __init__(self, token: str, chunk_size: int = CHUNK_SIZE) -> None:
+        """Initialize the storage."""
+        self.token = token
+        self.chunk_size = chunk_size
+        self._lh = None
+
+    @property
+    def lh(self):
+        """Lighthouse client, created on first use: the SDK (and eth_account) takes ~1s to import."""
+        if self._lh is None:
+            from lighthouseweb3 import Lighthouse
+
+            self._lh = Lighthouse(self.token)
+        return self._lh
+
+    def upload(self, file_path: str) -> str:
+        """Upload a file and return its cid."""
+        return upload_file(self.lh, file_path, self.chunk_size)
+
+    def download(self, cid: str, file_path: str) -> str:
+        """Download the content of a cid to file_path and return it."""
+        return download_file(self.lh, cid, file_path, self.chunk_size)
+
+
+class LocalStorage(Storage):
+    """Local filesystem storage, standing in for Lighthouse in tests and benchmarks."""
+
+    def __init__(self, root: str) -> None:
+        """Initialize the storage."""
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def upload(self, file_path: str) -> str:
+        """Upload a file and return its cid."""
+        cid = file_hash(file_path)
+        shutil.copyfile(file_path, os.path.join(self.root, cid))
+        return cid
+
+    def download(self, cid: str, file_path: str) -> str:
+        """Download the content of a cid to file_path and return it."""
+        shutil.copyfile(os.path.join(self.root, cid), file_path)
+        return file_path
+
+
+class CachedStorage(Storage):
+    """On-disk content-addressed cache in front of a storage.
+
+    Uploads are indexed by content hash, so that uploading the same content again returns
+    its cid without a network round-trip. Downloads are kept by cid, unless larger than
+    max_bytes. The least recently used downloads are evicted once the cache exceeds max_bytes,
+    and the least recently used uploads once there are more than max_uploads of them.
+    """
+
+    def __init__(
+        self,
+        backend: Storage,
+        cache_dir: str,
+        max_bytes: int,
+        max_uploads: int = 10_000,
+    ) -> None:
+        """Initialize the cache."""
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_uploads = max_uploads
+
+        self._uploads_dir = os.path.join(cache_dir, "uploads")
+        self._blobs_dir = os.path.join(cache_dir, "blobs")
+        self._partial_dir = os.path.join(cache_dir, "partial")
+        for directory in (self._uploads_dir, self._blobs_dir, self._partial_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in os.scandir(self._blobs_dir))
+        self._uploads = sum(1 for _ in os.scandir(self._uploads_dir))
+
+    @property
+    def uncached(self) -> Storage:
+        """The storage without its cache, for content read once (e.g. job results)."""
+        return self.backend
+
+    def upload(self, file_path: str) -> str:
+        """Upload a file and return its cid, unless the same content was uploaded before."""
+        index_path = os.path.join(self._uploads_dir, file_hash(file_path))
+
+        with self._lock:
+            try:
+                with open(index_path, "r") as f:
+                    cid = f.read()
+                # Touch the entry, recording its use for eviction.
+                os.utime(index_path)
+            except FileNotFoundError:
+                cid = None
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cid is not None:
+            return cid
+
+        cid = self.backend.upload(file_path)
+        with self._lock:
+            if not os.path.exists(index_path):
+                self._uploads += 1
+            with open(index_path, "w") as f:
+                f.write(cid)
+            self._evict_uploads(keep=index_path)
+        return cid
+
+    def download(self, cid: str, file_path: str) -> str:
+        """Download the content of a cid to file_path, from the cache if present, and return it."""
+        blob_path = os.path.join(self._blobs_dir, cid)
+
+        with self._lock:
+            cached = os.path.exists(blob_path)
+            if cached:
+                # Touch the blob, recording its use for eviction.
+                os.utime(blob_path)
+        if cached:
+            try:
+                shutil.copyfile(blob_path, file_path)
+            except FileNotFoundError:
+                # Evicted by another download meanwhile, downloaded again.
+                logging.debug(f"{cid} evicted from storage cache before being read.")
+            else:
+                with self._lock:
+                    self.hits += 1
+                return file_path
+
+        with self._lock:
+            self.misses += 1
+        # Download aside, so that partial blobs are never served, and copy it before it is
+        # cached, as it may be evicted by other downloads right after.
+        partial_path = os.path.join(self._partial_dir, uuid.uuid4().hex)
+        self.backend.download(cid, partial_path)
+        shutil.copyfile(partial_path, file_path)
+
+        with self._lock:
+            if os.path.getsize(partial_path) > self.max_bytes:
+                # Would evict every other blob, and still not fit.
+                os.remove(partial_path)
+            elif os.path.exists(blob_path):
+                # Downloaded concurrently.
+                os.remove(partial_path)
+            else:
+                os.replace(partial_path, blob_path)
+                self._size += os.path.getsize(blob_path)
+                self._evict(keep=blob_path)
+
+        return file_path
+
+    def _evict(self, keep: str):
+        if self._size <= self.max_bytes:
+            return
+
+        blobs = sorted(
+            (entry for entry in os.scandir(self._blobs_dir) if entry.path != keep),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in blobs:
+            if self._size <= self.max_bytes:
+                break
+            self._size -= entry.stat().st_size
+            os.remove(entry.path)
+            logging.debug(f"Evicted {entry.name} from storage cache.")
+
+    def _evict_uploads(self, keep: str):
+        if self._uploads <= self.max_uploads:
+            return
+
+        entries = sorted(
+            (entry for entry in os.scandir(self._uploads_dir) if entry.path != keep),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        # A tenth of the entries at once, as evicting scans all of them.
+        for entry in entries[
+            : self._uploads - self.max_uploads + self.max_uploads // 10
+        ]:
+            os.remove(entry.path)
+            self._uploads -= 1
+
+
+def get_storage() -> Storage:
+    """Get the storage selected by STORAGE.BACKEND (lighthouse, local), cached unless STORAGE.CACHE_MAX_BYTES is 0."""
+    backend = os.getenv("STORAGE.BACKEND") or "lighthouse"
+
+    match backend:
+        case "lighthouse":
+            storage = LighthouseStorage(os.getenv("LIGHTHOUSE_TOKEN"))
+        case "local":
+            storage = LocalStorage(os.getenv("STORAGE.LOCAL_DIR") or "tmp/storage")
+        case _:
+            raise ValueError(f"Unknown storage backend: {backend}")
+
+    max_bytes = int(os.getenv("STORAGE.CACHE_MAX_BYTES") or 1024**3)
+    if max_bytes == 0:
+        return storage
+
+    return CachedStorage(
+        storage,
+        os.getenv("STORAGE.CACHE_DIR") or "tmp/storage_cache",
+        max_bytes,
+        max_uploads=int(os.getenv("STORAGE.CACHE_MAX_UPLOADS") or 10_000),
+    )
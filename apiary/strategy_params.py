@@ -0,0 +1,213 @@
+"""Typed parameters of the negotiation strategies.
+
+Strategies are configured with environment variables, flattened from their configuration file
+(see utils.load_configuration). Parameters are parsed and validated once, into frozen parameter
+objects, rather than on every message: a bad configuration fails when the agent is built,
+before the first offer arrives.
+
+ConfigWatcher reloads the parameters when the configuration file changes, so that they can be
+tuned without restarting the inference endpoint. Environment variables that differ from the
+configuration file keep precedence over it across reloads.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import MISSING, dataclass, fields
+from typing import Callable, Mapping, Self
+
+
+class ConfigError(ValueError):
+    """Invalid strategy configuration."""
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class StrategyParams:
+    """Parameters shared by all strategies.
+
+    Each field is read from the environment variable of its uppercased name, fields without
+    default are required.
+    """
+
+    absolute_tolerance: float = 0.0
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] | None = None) -> Self:
+        """Parse and validate the parameters from environment variables (os.environ by default)."""
+        env = os.environ if env is None else env
+
+        values, errors = {}, []
+        for field in fields(cls):
+            key = field.name.upper()
+            raw = env.get(key)
+            if not raw:
+                if field.default is MISSING:
+                    errors.append(f"{key} is not set")
+                continue
+            try:
+                values[field.name] = field.type(raw)
+            except ValueError:
+                errors.append(f"{key}={raw!r} is not a valid {field.type.__name__}")
+
+        if errors:
+            raise ConfigError(f"Invalid {cls.__name__}: {'; '.join(errors)}.")
+        return cls(**values)
+
+    def __post_init__(self):
+        """Validate the parameters."""
+        errors = self._errors()
+        if errors:
+            raise ConfigError(f"Invalid {type(self).__name__}: {'; '.join(errors)}.")
+
+    def _errors(self) -> list[str]:
+        return (
+            [] if self.absolute_tolerance >= 0 else ["ABSOLUTE_TOLERANCE must be >= 0"]
+        )
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class KalmanParams(StrategyParams):
+    """Parameters of the Kalman strategy."""
+
+    valuation_estimation: float
+    valuation_variance: float
+    valuation_measurement_variance: float
+
+    def _errors(self) -> list[str]:
+        errors = StrategyParams._errors(self)
+        if self.valuation_variance <= 0:
+            errors.append("VALUATION_VARIANCE must be > 0")
+        if self.valuation_measurement_variance <= 0:
+            errors.append("VALUATION_MEASUREMENT_VARIANCE must be > 0")
+        return errors
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class TimeParams(StrategyParams):
+    """Parameters of the Time strategies."""
+
+    t_max: float
+    beta: float
+    k: float
+    min_usdc: int
+    max_usdc: int
+
+    def _errors(self) -> list[str]:
+        errors = StrategyParams._errors(self)
+        if self.t_max <= 0:
+            errors.append("T_MAX must be > 0")
+        if self.beta <= 0:
+            errors.append("BETA must be > 0")
+        if self.min_usdc > self.max_usdc:
+            errors.append("MIN_USDC must be <= MAX_USDC")
+        return errors
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class TitForTatParams(StrategyParams):
+    """Parameters of the TitForTat strategies."""
+
+    delta: int
+    min_usdc: float
+    max_usdc: float
+    m: float = 1.0
+
+    def _errors(self) -> list[str]:
+        errors = StrategyParams._errors(self)
+        if self.delta < 1:
+            errors.append("DELTA must be >= 1")
+        if self.min_usdc > self.max_usdc:
+            errors.append("MIN_USDC must be <= MAX_USDC")
+        return errors
+
+
+class ConfigWatcher:
+    """Watch a configuration file, applying it again whenever it changes."""
+
+    def __init__(
+        self,
+        config_path: str,
+        apply: Callable[[Mapping[str, str]], None],
+        interval: float = 1.0,
+    ) -> None:
+        """Initialize the watcher.
+
+        Args:
+            config_path: Path of the configuration file.
+            apply: Called with the environment the new configuration results in, raising
+                ConfigError to reject it. The environment is only updated once applied.
+            interval: Seconds between two checks of the modification time of the file.
+        """
+        self.config_path = config_path
+        self.apply = apply
+        self.interval = interval
+
+        self._mtime = os.stat(config_path).st_mtime_ns
+        self._config = self._read()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self) -> dict:
+        import readwrite as rw
+
+        from apiary import utils
+
+        return utils.flatten_config(rw.read(self.config_path))
+
+    def check(self) -> bool:
+        """Reload the configuration if the file changed, returning whether it was applied."""
+        mtime = os.stat(self.config_path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            config = self._read()
+        except Exception:
+            logging.error(f"Couldn't read {self.config_path}.", exc_info=True)
+            return False
+
+        # Variables set from the previous configuration follow the file, overrides are kept.
+        updates, removals = {}, []
+        for key, value in config.items():
+            current = os.environ.get(key)
+            if current is None or current == self._config.get(key):
+                updates[key] = value
+        for key in self._config.keys() - config.keys():
+            if os.environ.get(key) == self._config[key]:
+                removals.append(key)
+
+        env = {**os.environ, **updates}
+        for key in removals:
+            env.pop(key, None)
+        try:
+            self.apply(env)
+        except ConfigError as error:
+            logging.error(f"Configuration {self.config_path} not reloaded: {error}")
+            return False
+
+        os.environ.update(updates)
+        for key in removals:
+            os.environ.pop(key, None)
+        self._config = config
+        logging.info(f"Configuration {self.config_path} reloaded.")
+        return True
+
+    def start(self):
+        """Check the file every interval in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the file."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logging.error("Configuration reload failed.", exc_info=True)
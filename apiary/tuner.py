@@ -0,0 +1,230 @@
+"""Parameter sweeps of strategy configurations.
+
+Candidate parameters (sampled on a grid or at random) are scored against a population of
+opponent strategies with the batched strategy engine: each worker process evaluates a chunk
+of candidates, all negotiations of a chunk being stepped together. Scores are checkpointed as
+chunks complete, so that an interrupted sweep resumes where it stopped.
+
+The score of a candidate is its mean utility per negotiation: the agreed amount minus the
+valuation for a seller, the valuation minus the agreed amount for a buyer, 0 without agreement.
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import readwrite as rw
+
+from apiary import batch_strategies
+
+# Parameters shaping the state of an engine, the same for all its negotiations.
+ENGINE_PARAMS = ("delta", "imitation_type")
+
+
+def parse_param(spec: str) -> tuple[str, float, float]:
+    """Parse a NAME=LOW:HIGH parameter range."""
+    name, _, bounds = spec.partition("=")
+    low, _, high = bounds.partition(":")
+    try:
+        return name, float(low), float(high)
+    except ValueError:
+        raise ValueError(f"Invalid parameter range: {spec}, expected NAME=LOW:HIGH")
+
+
+def check_params(agent_name: str, config: dict, names):
+    """Check that parameters are read by the strategy of an agent and set in its configuration.
+
+    Raises:
+        ValueError: If a parameter is not, as tuning it would not change the negotiations.
+    """
+    role, _, strategy = agent_name.partition("_")
+    if strategy not in batch_strategies.PARAMS:
+        raise ValueError(f"Unknown agent: {agent_name}")
+    replaced = ()
+    if role == "buyer":
+        replaced = batch_strategies.BUYER_INITIAL_OFFER_PARAMS.get(strategy, ())
+    for name in names:
+        if name not in batch_strategies.PARAMS[strategy]:
+            raise ValueError(f"{name} is not a parameter of the {strategy} strategy.")
+        if name in replaced:
+            raise ValueError(
+                f"{name} of {agent_name} is replaced by its initial offer."
+            )
+        if name not in config:
+            raise ValueError(f"{name} is not set in the configuration of {agent_name}.")
+
+
+def sample_candidates(
+    space: dict[str, tuple[float, float]],
+    method: str,
+    n_candidates: int,
+    grid_size: int,
+    integers: set[str],
+    seed: int,
+) -> list[dict]:
+    """Sample candidate parameters from their ranges, on a grid or uniformly at random."""
+    match method:
+        case "grid":
+            axes = [np.linspace(low, high, grid_size) for low, high in space.values()]
+            points = list(itertools.product(*axes))
+        case "random":
+            rng = np.random.default_rng(seed)
+            points = zip(
+                *(rng.uniform(low, high, n_candidates) for low, high in space.values())
+            )
+        case _:
+            raise ValueError(f"Unknown sweep method: {method}")
+
+    candidates = {}
+    for point in points:
+        candidate = {
+            name: int(round(value)) if name in integers else float(value)
+            for name, value in zip(space, point)
+        }
+        # Rounding integers may produce duplicates.
+        candidates.setdefault(json.dumps(candidate, sort_keys=True), candidate)
+    return list(candidates.values())
+
+
+def default_opponents(agent_name: str) -> list[str]:
+    """Agents of the registry with the other role."""
+    # Imported here, so that worker processes only import the batched strategies.
+    from apiary import agent_registry
+
+    role = agent_name.partition("_")[0]
+    other = "seller" if role == "buyer" else "buyer"
+    return [name for name in agent_registry.agents_registry if name.startswith(other)]
+
+
+def evaluate(
+    agent_name: str,
+    config: dict,
+    candidates: list[dict],
+    opponents: dict[str, dict],
+    amount: float,
+    valuation: float,
+    n_negotiations: int,
+    max_rounds: int,
+    round_duration: float,
+    seed: int,
+) -> list[float]:
+    """Score candidate parameters of an agent against opponents (name -> configuration)."""
+    np.random.seed(seed)
+    is_buyer = agent_name.startswith("buyer")
+    scores = np.zeros(len(candidates))
+
+    groups = {}
+    for i, candidate in enumerate(candidates):
+        key = tuple(candidate.get(name, config.get(name)) for name in ENGINE_PARAMS)
+        groups.setdefault(key, []).append(i)
+
+    for key, indices in groups.items():
+        n = len(indices) * n_negotiations
+        tuned_config = {**config, **dict(zip(ENGINE_PARAMS, key))}
+        for name in candidates[0]:
+            if name not in ENGINE_PARAMS:
+                values = [candidates[i][name] for i in indices]
+                tuned_config[name] = np.repeat(values, n_negotiations)
+
+        for opponent_name, opponent_config in opponents.items():
+            agent = batch_strategies.build(agent_name, tuned_config, n)
+            opponent = batch_strategies.build(opponent_name, opponent_config, n)
+            buyer, seller = (agent, opponent) if is_buyer else (opponent, agent)
+
+            result = batch_strategies.negotiate(
+                buyer, seller, amount, max_rounds, round_duration
+            )
+            utility = result["agreed"] - valuation
+            if is_buyer:
+                utility = -utility
+            utility = np.nan_to_num(utility, nan=0.0)
+            scores[indices] += utility.reshape(-1, n_negotiations).mean(axis=1)
+
+    return list(scores / len(opponents))
+
+
+def load_checkpoint(checkpoint_path: str) -> list[dict]:
+    """Load the scored candidates of a checkpoint."""
+    if not os.path.exists(checkpoint_path):
+        return []
+    with open(checkpoint_path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def tune(
+    agent_name: str,
+    config: dict,
+    candidates: list[dict],
+    opponents: dict[str, dict],
+    amount: float,
+    valuation: float,
+    checkpoint_path: str,
+    n_negotiations: int = 100,
+    max_rounds: int = 1000,
+    round_duration: float = 1.0,
+    workers: int | None = None,
+    chunk_size: int = 64,
+    seed: int = 0,
+) -> list[dict]:
+    """Score candidates in worker processes, returning them from best to worst.
+
+    Candidates already scored in checkpoint_path are not evaluated again.
+    """
+    check_params(agent_name, config, {name for c in candidates for name in c})
+
+    keys = {json.dumps(candidate, sort_keys=True) for candidate in candidates}
+    results = [
+        result
+        for result in load_checkpoint(checkpoint_path)
+        if json.dumps(result["params"], sort_keys=True) in keys
+    ]
+    scored = {json.dumps(result["params"], sort_keys=True) for result in results}
+    pending = [c for c in candidates if json.dumps(c, sort_keys=True) not in scored]
+    logging.info(
+        f"Tuning {agent_name}: {len(pending)} candidates to evaluate, {len(results)} resumed."
+    )
+
+    chunks = [pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    if os.path.dirname(checkpoint_path):
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+
+    # Spawned rather than forked, as the calling process may run threads.
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            executor.submit(
+                evaluate,
+                agent_name,
+                config,
+                chunk,
+                opponents,
+                amount,
+                valuation,
+                n_negotiations,
+                max_rounds,
+                round_duration,
+                seed + i,
+            ): chunk
+            for i, chunk in enumerate(chunks)
+        }
+
+        with open(checkpoint_path, "a") as f:
+            for future in as_completed(futures):
+                for params, score in zip(futures[future], future.result()):
+                    result = {"params": params, "score": score}
+                    f.write(json.dumps(result) + "\n")
+                    results.append(result)
+                f.flush()
+                logging.info(f"{len(results)}/{len(candidates)} candidates evaluated.")
+
+    return sorted(results, key=lambda result: result["score"], reverse=True)
+
+
+def load_opponents(names: list[str], config_dir: str = "config") -> dict[str, dict]:
+    """Load the configurations of opponents from config_dir."""
+    return {name: rw.read(os.path.join(config_dir, f"{name}.json")) for name in names}
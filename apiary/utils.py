@@ -1,17 +1,13 @@
 """This module defines various utility classes and functions for the CoopHive simulator."""
 
-import csv
 import json
 import logging
 import os
+import time
 import uuid
 from datetime import datetime
 from typing import TypedDict, Union
 
-import colorlog
-import matplotlib.pyplot as plt
-import pandas as pd
-import readwrite as rw
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
@@ -33,6 +29,8 @@ def setup_logger(logs_path, verbose, no_color):
     Returns:
         logging.Logger: Configured logger instance.
     """
+    import colorlog
+
     console_handler = colorlog.StreamHandler()
 
     log_format = (
@@ -71,44 +69,37 @@ def setup_logger(logs_path, verbose, no_color):
     return logger
 
 
-def set_env_variables(config: dict):
-    """Set environment variables based on a configuration dictionary.
+def flatten_config(config: dict) -> dict:
+    """Flatten a nested configuration dictionary into environment variables.
 
-    This function flattens the nested dictionary and assigns the corresponding values
-    to environment variables. Existing environment variables take precedence over
-    values in the config.
+    Nested keys are joined with dots and uppercased, values are converted to strings.
     """
 
-    def get_keys(d, parent_key=""):
-        """Recursively flatten dictionary keys."""
-        keys = []
+    def flatten(d, parent_key=""):
+        """Recursively flatten dictionary items."""
+        items = {}
         for k, v in d.items():
             new_key = f"{parent_key}.{k}" if parent_key else k
             if isinstance(v, dict):
-                keys.extend(get_keys(v, new_key))
+                items.update(flatten(v, new_key))
             else:
-                keys.append(new_key)
-        return keys
+                items[new_key.upper()] = str(v)
+        return items
 
-    def get_value_by_key(d, key):
-        """Get the value from a nested dictionary using a flattened key."""
-        keys = key.split(".")
-        value = d
-        for k in keys:
-            value = value.get(k)
-        return value
+    return flatten(config)
 
-    # Flatten the config keys
-    keys = get_keys(config)
 
-    for key in keys:
-        # Use the dotted keys directly for environment variables
-        env_key = key.upper()
+def set_env_variables(config: dict):
+    """Set environment variables based on a configuration dictionary.
 
+    This function flattens the nested dictionary and assigns the corresponding values
+    to environment variables. Existing environment variables take precedence over
+    values in the config.
+    """
+    for env_key, value in flatten_config(config).items():
         # If the env variable is not already set, use the value from config
         if not os.getenv(env_key):
-            value = get_value_by_key(config, key)
-            os.environ[env_key] = str(value)
+            os.environ[env_key] = value
             logging.info(f"Set {env_key} = {value}")
 
 
@@ -117,8 +108,12 @@ def load_configuration(config_path: str):
 
     This function reads the configuration from a given file path and sets the
     appropriate environment variables, including setting AGENT_NAME based on the file name if not already defined.
+    CONFIG_PATH is always set, so that inference workers can tell configurations apart.
     """
+    import readwrite as rw
+
     config = rw.read(config_path)
+    os.environ["CONFIG_PATH"] = config_path
 
     if not os.getenv("AGENT_NAME"):
         agent_name = config_path.rpartition(".")[0]
@@ -129,6 +124,58 @@ def load_configuration(config_path: str):
     set_env_variables(config)
 
 
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this PID is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_lock_file(lock_file: str) -> int | None:
+    """PID of the running process holding a lock file, removing the lock file if stale."""
+    if not os.path.exists(lock_file):
+        return None
+
+    with open(lock_file, "r") as file:
+        lock_content = file.read().strip()
+    if lock_content.isdigit() and pid_alive(int(lock_content)):
+        return int(lock_content)
+
+    logging.warning(f"Removing stale {lock_file} (PID {lock_content or 'missing'}).")
+    os.remove(lock_file)
+    return None
+
+
+def wait_until_ready(process, is_ready, name: str, timeout: float | None = None):
+    """Poll is_ready until the started process is ready.
+
+    Polling starts at 10ms and backs off up to 200ms. The process is terminated if it is not
+    ready within timeout seconds (STARTUP_TIMEOUT, 30 by default).
+
+    Raises:
+        RuntimeError: If the process exits or times out before being ready.
+    """
+    if timeout is None:
+        timeout = float(os.getenv("STARTUP_TIMEOUT", 30))
+
+    start = time.monotonic()
+    interval = 0.01
+    while not is_ready():
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {process.returncode}.")
+        if time.monotonic() - start > timeout:
+            process.terminate()
+            raise RuntimeError(f"{name} not ready after {timeout}s.")
+        time.sleep(interval)
+        interval = min(interval * 2, 0.2)
+
+    logging.info(f"{name} ready in {time.monotonic() - start:.2f}s.")
+
+
 class ERC20Token(TypedDict):
     """ERC20."""
 
@@ -178,6 +225,8 @@ def create_offer_tokens(tokens_data: list) -> Token:
 
 def parse_initial_offer(job_path, tokens_data):
     """Parses the initial offer based on the provided job path and price."""
+    import readwrite as rw
+
     pubkey = os.getenv("PUBLIC_KEY")
     query = rw.read_as(job_path, "txt")
 
@@ -201,63 +250,3 @@ def parse_initial_offer(job_path, tokens_data):
         "initial": True,
         "data": data,
     }
-
-
-def add_float_to_csv(value, filename: str):
-    """Append a float value to a CSV file."""
-    file_path = f"apiary_output/{filename}.csv"
-    file_exists = os.path.isfile(file_path)
-
-    # Open the file in append mode if it exists, otherwise create a new file
-    with open(file_path, mode="a", newline="") as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            # Write the header if the file is being created
-            writer.writerow(["Amount"])
-        # Append the current float value to the file
-        writer.writerow([value])
-
-
-def plot_negotiation(filename: str):
-    """Plot negotiation offers from a CSV file file_path."""
-    file_path = f"apiary_output/{filename}.csv"
-    df = pd.read_csv(file_path)
-
-    num_entries = len(df)
-    downsample_rate = 1  # No downsampling by default
-    max_points = 400
-
-    if num_entries > max_points:
-        downsample_rate = num_entries // max_points
-
-    odd_entries = df.iloc[::2][::downsample_rate]
-    even_entries = df.iloc[1::2][::downsample_rate]
-
-    unit_price = 1e-6  # TODO: hardcoded, may change for != USDC.
-    plt.figure(figsize=(13, 5))
-    plt.plot(
-        odd_entries.index,
-        odd_entries * unit_price,
-        color="g",
-        linewidth=1.5,
-        label="Seller Offers",
-    )
-    plt.plot(
-        even_entries.index,
-        even_entries * unit_price,
-        color="m",
-        linewidth=1.5,
-        label="Buyer Offers",
-    )
-
-    plt.title("Negotiation Rounds vs Offers", fontsize=16, fontweight="bold")
-    plt.xlabel("Negotiation Round []", fontsize=12)
-    plt.ylabel("Offer [USDC]", fontsize=12)  # TODO: remove hardcoded.
-    plt.grid(True, linestyle="--", linewidth=0.5)
-
-    plt.legend()
-
-    plt.tight_layout()
-
-    plt.savefig(f"apiary_output/{filename}.png")
-    plt.close()
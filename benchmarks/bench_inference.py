@@ -0,0 +1,51 @@
+"""Benchmark inference endpoint throughput with and without the agents cache.
+
+Usage: python benchmarks/bench_inference.py [n_messages]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault("LIGHTHOUSE_TOKEN", "benchmark")
+os.environ.setdefault("AGENT_NAME", "seller_naive")
+os.environ.setdefault("STORAGE.CACHE_MAX_BYTES", "0")
+os.environ.setdefault("PUBLIC_KEY", "0x1C53Ec481419daA436B47B2c916Fa3766C6Da9Fc")
+
+from apiary import agent_registry, inference  # noqa: E402
+
+MESSAGE = {
+    "pubkey": "0x002189E2F82ac8FBF19e2Dc279d19E07eCE12cfb",
+    "offerId": "benchmark",
+    "initial": False,
+    "data": {
+        "_tag": "offer",
+        "query": "FROM alpine",
+        "tokens": [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}],
+    },
+}
+
+
+def uncached_endpoint(message: dict):
+    """Inference endpoint as it was before the agents cache: one Agent per message."""
+    agent = agent_registry.get_agent()
+    states = agent.load_states()
+    return agent.infer(states, message)
+
+
+def requests_per_second(endpoint, n_messages: int) -> float:
+    """Run endpoint on n_messages messages and return the throughput."""
+    start = time.perf_counter()
+    for _ in range(n_messages):
+        endpoint(dict(MESSAGE))
+    return n_messages / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    before = requests_per_second(uncached_endpoint, n_messages)
+    after = requests_per_second(inference.inference_endpoint, n_messages)
+
+    print(f"uncached: {before:,.0f} requests/s")
+    print(f"cached:   {after:,.0f} requests/s ({after / before:.1f}x)")
@@ -0,0 +1,70 @@
+"""Benchmark CLI import and inference worker cold start, each in a fresh interpreter.
+
+Usage: python benchmarks/bench_startup.py [n_runs]
+
+Exits with status 1 if a median exceeds its startup budget.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+# Startup budgets, in seconds.
+CLI_IMPORT_BUDGET = 0.5
+INFERENCE_IMPORT_BUDGET = 1.0
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from apiary import agent_registry, inference
+imported = time.perf_counter()
+agent_registry.get_cached_agent()
+print(imported - start, time.perf_counter() - imported)
+"""
+
+ENV = {
+    **os.environ,
+    "LIGHTHOUSE_TOKEN": os.getenv("LIGHTHOUSE_TOKEN", "benchmark"),
+    "AGENT_NAME": os.getenv("AGENT_NAME", "seller_naive"),
+    "ROLE": os.getenv("ROLE", "seller"),
+}
+
+
+def run(code: str) -> list[float]:
+    """Run code in a fresh interpreter and return the timings it prints."""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=ENV,
+    )
+    return [float(value) for value in result.stdout.split()]
+
+
+if __name__ == "__main__":
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    cli = [
+        run(
+            "import time; s = time.perf_counter(); import apiary.cli; print(time.perf_counter() - s)"
+        )[0]
+        for _ in range(n_runs)
+    ]
+    cli_import = statistics.median(cli)
+    print(
+        f"apiary.cli import: {cli_import * 1e3:.0f}ms "
+        f"(budget {CLI_IMPORT_BUDGET * 1e3:.0f}ms)"
+    )
+
+    imports, builds = zip(*(run(COLD_START) for _ in range(n_runs)))
+    inference_import = statistics.median(imports)
+    print(
+        f"inference worker: {inference_import * 1e3:.0f}ms import "
+        f"(budget {INFERENCE_IMPORT_BUDGET * 1e3:.0f}ms), "
+        f"{statistics.median(builds) * 1e3:.0f}ms agent build"
+    )
+
+    if cli_import > CLI_IMPORT_BUDGET or inference_import > INFERENCE_IMPORT_BUDGET:
+        sys.exit("Startup budget exceeded.")
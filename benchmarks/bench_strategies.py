@@ -0,0 +1,60 @@
+"""Benchmark strategy agents with the in-process negotiation simulator and the batched engine.
+
+Usage: python benchmarks/bench_strategies.py [n_negotiations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import readwrite as rw
+
+from apiary import batch_strategies, simulator, utils
+
+PAIRS = [
+    ("buyer_naive", "seller_naive"),
+    ("buyer_kalman", "seller_kalman"),
+    ("buyer_poly_time", "seller_poly_time"),
+    ("buyer_exp_time", "seller_exp_time"),
+    ("buyer_tit_for_tat", "seller_tit_for_tat"),
+]
+
+TOKENS = utils.create_offer_tokens(
+    ["ERC20", "0x036CbD53842c5426634e7929541eC2318f3dCF7e", 100]
+)
+
+if __name__ == "__main__":
+    n_negotiations = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    config_dir = os.path.abspath("config")
+    # Negotiation logs and local storage of the simulated agents.
+    os.chdir(tempfile.mkdtemp())
+
+    for buyer_name, seller_name in PAIRS:
+        buyer = simulator.SimulatedAgent(
+            buyer_name, f"{config_dir}/{buyer_name}.json", "buyer"
+        )
+        seller = simulator.SimulatedAgent(
+            seller_name, f"{config_dir}/{seller_name}.json", "seller"
+        )
+        report = simulator.simulate(buyer, seller, TOKENS, n_negotiations, seed=0)
+        print(
+            f"{buyer_name} vs {seller_name}: "
+            f"{report['rounds_per_second']:>10,.0f} rounds/s, "
+            f"{report['mean_seconds'] * 1e3:6.2f}ms per negotiation "
+            f"({report['mean_rounds']:.1f} rounds, "
+            f"{report['agreements']}/{n_negotiations} agreements)"
+        )
+
+        start = time.perf_counter()
+        result = batch_strategies.negotiate(
+            batch_strategies.build(
+                buyer_name, rw.read(f"{config_dir}/{buyer_name}.json"), n_negotiations
+            ),
+            batch_strategies.build(
+                seller_name, rw.read(f"{config_dir}/{seller_name}.json"), n_negotiations
+            ),
+            TOKENS[0]["amt"],
+        )
+        seconds = time.perf_counter() - start
+        print(f"  batched: {result['rounds'].sum() / seconds:>10,.0f} rounds/s")
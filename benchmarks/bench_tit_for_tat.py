@@ -0,0 +1,54 @@
+"""Benchmark the cost per round of a TitForTat negotiation as it grows.
+
+Each round goes through a JSON round trip of the negotiation state, as with the Redis state store.
+The TitForTat history is bounded by DELTA, so that the cost per round stays constant.
+
+Usage: python benchmarks/bench_tit_for_tat.py [n_rounds]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from apiary import simulator
+
+WINDOW = 2_500
+
+if __name__ == "__main__":
+    n_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    config_path = os.path.abspath("config/seller_tit_for_tat.json")
+    # Negotiation logs and local storage of the simulated agent.
+    os.chdir(tempfile.mkdtemp())
+
+    seller = simulator.SimulatedAgent("seller_tit_for_tat", config_path, "seller")
+    # Offers of a buyer too low to ever be accepted.
+    offers = np.random.default_rng(0).uniform(1, 50, n_rounds).tolist()
+
+    with simulator.environment(seller.env):
+        raw_state = json.dumps({"t0": 0.0})
+        start = time.perf_counter()
+        for i, amt in enumerate(offers, start=1):
+            message = {
+                "data": {
+                    "_tag": "offer",
+                    "tokens": [
+                        {"tokenStandard": "ERC20", "address": "0x0", "amt": amt}
+                    ],
+                }
+            }
+            state = json.loads(raw_state)
+            seller.agent._handle_offer(state, message, message)
+            raw_state = json.dumps(state)
+
+            if i % WINDOW == 0:
+                seconds = time.perf_counter() - start
+                print(
+                    f"rounds {i - WINDOW + 1:>6}-{i:<6}: "
+                    f"{seconds / WINDOW * 1e6:6.2f}us per round, "
+                    f"{len(raw_state)} bytes of state"
+                )
+                start = time.perf_counter()
@@ -111,6 +111,7 @@ export class RedisSchemeClient<
       !(topic == this.defaultChannel && message_.initial)
     )
       return;
+    await this.scheme.onMessage?.(this, this.role, message_);
     console.log("message to agent: ", message_);
 
     const response = await fetch(this.agent, {
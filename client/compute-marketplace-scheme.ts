@@ -61,6 +61,18 @@ export const dcnScheme: Scheme<Messages, Roles> = {
       )
       // the above rules are exhaustive
       .otherwise(() => false),
+  onMessage: async (client, role, message) =>
+    match({ role, message })
+      // seller stops listening to a negotiation once its attestation (result) is sent,
+      // including when the job was run in the background and the attestation published
+      // by the agent itself
+      .with(
+        { role: "seller", message: { data: { _tag: "sellAttest" } } },
+        async ({ message }) => {
+          await client.unsubscribe(message.offerId);
+        }
+      )
+      .otherwise(async () => {}),
   onStart: async (client, role, init) =>
     match({ role, init })
       // buyers must join with an initial offer
@@ -32,6 +32,20 @@ export type Scheme<T extends ADT, R extends string> = {
     output: Message<T>
   ): Promise<boolean>;
 
+  /**
+   * Defines how a client reacts to the messages it receives, before the agent responds.
+   * @param client - Provides methods for managing communication.
+   * @param role - The agent's role in the scheme.
+   * @param message - Message received.
+   * @returns A promise that resolves once the client reacted to the message.
+   *
+   * Implementation notes:
+   * - Optional, for messages concluding a negotiation without a response of the client
+   *   (e.g. sent on its behalf from outside of it).
+   * - Use client.unsubscribe() to stop listening about an offerId.
+   */
+  onMessage?(client: SchemeClient<T>, role: R, message: Message<T>): Promise<void>;
+
   /**
    * Defines rules for valid parameters when initializing an agent
    * @param client - Provides methods for managing communication.
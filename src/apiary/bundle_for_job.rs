@@ -1,21 +1,51 @@
 use alloy::{
     primitives::{self, b256, Address, Bytes, FixedBytes},
+    providers::WalletProvider as _,
     sol_types::{SolEvent, SolValue},
 };
 use std::env;
 
 use crate::provider;
+use crate::tx_queue;
 use crate::{
     contracts::{BundlePaymentObligation, JobResultObligation, IEAS, IERC20, IERC721},
     shared::BundlePrice,
 };
 
+async fn await_receipts(
+    provider: &provider::WalletProvider,
+    pending_txs: Vec<tx_queue::PendingTx>,
+    name: &str,
+) -> eyre::Result<()> {
+    // Transactions are already broadcast, so waiting on them one after the other
+    // takes as long as waiting on the last one.
+    for pending_tx in pending_txs {
+        let receipt = tx_queue::confirm(provider, pending_tx).await?;
+
+        if !receipt.status() {
+            return Err(eyre::eyre!("{} failed", name));
+        };
+    }
+    Ok(())
+}
+
+/// Approve the bundle tokens and make the buy statement.
+///
+/// In pipelined mode, approvals and the statement are broadcast back to back with nonces
+/// handed out by the transaction queue, and their receipts awaited afterwards: nonce ordering guarantees the
+/// statement is executed after the approvals, so setting up a deal takes about one
+/// confirmation instead of one per token. Approvals already in place are skipped if
+/// skip_approved is set: concurrent deals of a wallet may then rely on the same allowance,
+/// the statement of the later ones reverting once it is spent.
 pub async fn make_buy_statement(
     price: BundlePrice,
     query: String,
     private_key: String,
+    pipelined: bool,
+    skip_approved: bool,
 ) -> eyre::Result<FixedBytes<32>> {
     let provider = provider::get_wallet_provider(private_key)?;
+    let owner = provider.default_signer_address();
 
     let payment_address =
         env::var("BUNDLE_PAYMENT_OBLIGATION").map(|a| Address::parse_checksummed(a, None))??;
@@ -28,10 +58,23 @@ pub async fn make_buy_statement(
         .abi_encode()
         .into();
 
+    let mut approvals = Vec::new();
+
     // Iterate over erc20_addresses and erc20_amounts together
     for (erc_20_address, amount) in price.erc20_addresses.iter().zip(price.erc20_amounts.iter()){
         let token_contract = IERC20::new(*erc_20_address, &provider);
 
+        if skip_approved {
+            let allowance = token_contract
+                .allowance(owner, payment_address)
+                .call()
+                .await?
+                ._0;
+            if allowance >= *amount {
+                continue;
+            }
+        }
+
         let mut call = token_contract
         .approve(payment_address, *amount);
         
@@ -42,33 +85,32 @@ pub async fn make_buy_statement(
         let gas_limit = 2_000_000u128;
         call = call.gas(gas_limit);
 
-        let approval_receipt = call
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+        approvals.push(tx_queue::send(&provider, call.into_transaction_request()).await?);
 
-        if !approval_receipt.status() {
-            return Err(eyre::eyre!("approval failed"));
-        };
+        if !pipelined {
+            await_receipts(&provider, approvals.split_off(0), "approval").await?;
+        }
     }
 
     // Iterate over erc721_addresses and erc721_ids together
     for (erc_721_address, id) in price.erc721_addresses.iter().zip(price.erc721_ids.iter()){
         let token_contract = IERC721::new(*erc_721_address, &provider);
 
-        let mut call = token_contract
+        if skip_approved {
+            let approved = token_contract.getApproved(*id).call().await?._0;
+            if approved == payment_address {
+                continue;
+            }
+        }
+
+        let call = token_contract
         .approve(payment_address, *id);
 
-        let approval_receipt = call
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+        approvals.push(tx_queue::send(&provider, call.into_transaction_request()).await?);
 
-        if !approval_receipt.status() {
-            return Err(eyre::eyre!("approval failed"));
-        };
+        if !pipelined {
+            await_receipts(&provider, approvals.split_off(0), "approval").await?;
+        }
     }
 
     let statement_contract = BundlePaymentObligation::new(payment_address, &provider);
@@ -91,13 +133,16 @@ pub async fn make_buy_statement(
     // .estimate_gas()
     // .await?;
     // let gas_limit = gas_estimate * 120 / 100;
+    // The gas limit is fixed, estimating it would fail while approvals are pending.
     let gas_limit = 5_000_000u128;
     call = call.gas(gas_limit);
 
-    let log = call
-        .send()
-        .await?
-        .get_receipt()
+    let statement_tx = tx_queue::send(&provider, call.into_transaction_request()).await?;
+
+    // A failed approval makes the statement revert, report the approval instead.
+    await_receipts(&provider, approvals, "approval").await?;
+
+    let log = tx_queue::confirm(&provider, statement_tx)
         .await?
         .inner
         .logs()
@@ -132,30 +177,32 @@ pub async fn submit_and_collect(
     let result_contract = JobResultObligation::new(result_address, &provider);
     let payment_contract = BundlePaymentObligation::new(payment_address, &provider);
 
-    let sell_uid = result_contract
-        .makeStatement(
-            JobResultObligation::StatementData { result: result_cid },
-            buy_attestation_uid,
-        )
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
-
-    let collect_receipt = payment_contract
-        .collectPayment(buy_attestation_uid, sell_uid)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let sell_uid = tx_queue::submit(
+        &provider,
+        result_contract
+            .makeStatement(
+                JobResultObligation::StatementData { result: result_cid },
+                buy_attestation_uid,
+            )
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
+
+    let collect_receipt = tx_queue::submit(
+        &provider,
+        payment_contract
+            .collectPayment(buy_attestation_uid, sell_uid)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if collect_receipt.status() {
         Ok(sell_uid)
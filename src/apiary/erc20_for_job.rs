@@ -5,6 +5,7 @@ use alloy::{
 use std::env;
 
 use crate::provider;
+use crate::tx_queue;
 use crate::{
     contracts::{ERC20PaymentObligation, JobResultObligation, IEAS, IERC20},
     shared::ERC20Price,
@@ -31,40 +32,42 @@ pub async fn make_buy_statement(
     let token_contract = IERC20::new(price.token, &provider);
     let statement_contract = ERC20PaymentObligation::new(payment_address, &provider);
 
-    let approval_receipt = token_contract
-        .approve(payment_address, price.amount)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let approval_receipt = tx_queue::submit(
+        &provider,
+        token_contract
+            .approve(payment_address, price.amount)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if !approval_receipt.status() {
         return Err(eyre::eyre!("approval failed"));
     };
 
-    let log = statement_contract
-        .makeStatement(
-            ERC20PaymentObligation::StatementData {
-                token: price.token,
-                amount: price.amount,
-                arbiter: arbiter_address,
-                demand,
-            },
-            0,
-            b256!("0000000000000000000000000000000000000000000000000000000000000000"),
-        )
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>())
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
+    let log = tx_queue::submit(
+        &provider,
+        statement_contract
+            .makeStatement(
+                ERC20PaymentObligation::StatementData {
+                    token: price.token,
+                    amount: price.amount,
+                    arbiter: arbiter_address,
+                    demand,
+                },
+                0,
+                b256!("0000000000000000000000000000000000000000000000000000000000000000"),
+            )
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>())
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
 
     Ok(log.inner.uid)
 }
@@ -90,30 +93,32 @@ pub async fn submit_and_collect(
     let result_contract = JobResultObligation::new(result_address, &provider);
     let payment_contract = ERC20PaymentObligation::new(payment_address, &provider);
 
-    let sell_uid = result_contract
-        .makeStatement(
-            JobResultObligation::StatementData { result: result_cid },
-            buy_attestation_uid,
-        )
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
-
-    let collect_receipt = payment_contract
-        .collectPayment(buy_attestation_uid, sell_uid)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let sell_uid = tx_queue::submit(
+        &provider,
+        result_contract
+            .makeStatement(
+                JobResultObligation::StatementData { result: result_cid },
+                buy_attestation_uid,
+            )
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attested"))??;
+
+    let collect_receipt = tx_queue::submit(
+        &provider,
+        payment_contract
+            .collectPayment(buy_attestation_uid, sell_uid)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if collect_receipt.status() {
         Ok(sell_uid)
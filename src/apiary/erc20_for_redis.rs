@@ -1,11 +1,13 @@
 use alloy::{
     primitives::{b256, Address, Bytes, FixedBytes},
+    rpc::types::TransactionReceipt,
     sol,
     sol_types::{SolEvent, SolValue},
 };
 use std::env;
 
 use crate::provider;
+use crate::tx_queue;
 use crate::{
     contracts::{ERC20PaymentObligation, RedisProvisionObligation, IEAS, IERC20},
     shared::ERC20Price,
@@ -62,40 +64,42 @@ pub async fn make_buy_statement(
     let token_contract = IERC20::new(price.token, &provider);
     let statement_contract = ERC20PaymentObligation::new(payment_address, &provider);
 
-    let approval_receipt = token_contract
-        .approve(payment_address, price.amount)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let approval_receipt = tx_queue::submit(
+        &provider,
+        token_contract
+            .approve(payment_address, price.amount)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if !approval_receipt.status() {
         return Err(eyre::eyre!("approval failed"));
     };
 
-    let log = statement_contract
-        .makeStatement(
-            ERC20PaymentObligation::StatementData {
-                token: price.token,
-                amount: price.amount,
-                arbiter: arbiter_address,
-                demand,
-            },
-            0,
-            b256!("0000000000000000000000000000000000000000000000000000000000000000"),
-        )
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>())
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
+    let log = tx_queue::submit(
+        &provider,
+        statement_contract
+            .makeStatement(
+                ERC20PaymentObligation::StatementData {
+                    token: price.token,
+                    amount: price.amount,
+                    arbiter: arbiter_address,
+                    demand,
+                },
+                0,
+                b256!("0000000000000000000000000000000000000000000000000000000000000000"),
+            )
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>())
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
 
     Ok(log.inner.uid)
 }
@@ -152,27 +156,29 @@ pub async fn update_and_collect(
     let result_contract = RedisProvisionObligation::new(result_address, &provider);
     let payment_contract = ERC20PaymentObligation::new(payment_address, &provider);
 
-    let sell_uid = result_contract
-        .reviseStatement(old_statement_uid, revision, new_expiration)
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
+    let sell_uid = tx_queue::submit(
+        &provider,
+        result_contract
+            .reviseStatement(old_statement_uid, revision, new_expiration)
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
 
-    let collect_receipt = payment_contract
-        .collectPayment(buy_attestation_uid, sell_uid)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let collect_receipt = tx_queue::submit(
+        &provider,
+        payment_contract
+            .collectPayment(buy_attestation_uid, sell_uid)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if collect_receipt.status() {
         Ok(sell_uid)
@@ -197,37 +203,39 @@ pub async fn make_new_and_collect(
     let result_contract = RedisProvisionObligation::new(result_address, &provider);
     let payment_contract = ERC20PaymentObligation::new(payment_address, &provider);
 
-    let sell_uid = result_contract
-        .makeStatement(
-            RedisProvisionObligation::StatementData {
-                user: provision.user,
-                capacity: provision.capacity,
-                egress: provision.egress,
-                cpus: provision.cpus,
-                serverName: provision.serverName,
-                url: provision.url,
-            },
-            expiration,
-        )
-        .send()
-        .await?
-        .get_receipt()
-        .await?
-        .inner
-        .logs()
-        .iter()
-        .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
-        .collect::<Vec<_>>()
-        .first()
-        .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
-        .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
+    let sell_uid = tx_queue::submit(
+        &provider,
+        result_contract
+            .makeStatement(
+                RedisProvisionObligation::StatementData {
+                    user: provision.user,
+                    capacity: provision.capacity,
+                    egress: provision.egress,
+                    cpus: provision.cpus,
+                    serverName: provision.serverName,
+                    url: provision.url,
+                },
+                expiration,
+            )
+            .into_transaction_request(),
+    )
+    .await?
+    .inner
+    .logs()
+    .iter()
+    .filter(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+    .collect::<Vec<_>>()
+    .first()
+    .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
+    .ok_or_else(|| eyre::eyre!("makeStatement logs didn't contain Attest"))??;
 
-    let collect_receipt = payment_contract
-        .collectPayment(buy_attestation_uid, sell_uid)
-        .send()
-        .await?
-        .get_receipt()
-        .await?;
+    let collect_receipt = tx_queue::submit(
+        &provider,
+        payment_contract
+            .collectPayment(buy_attestation_uid, sell_uid)
+            .into_transaction_request(),
+    )
+    .await?;
 
     if collect_receipt.status() {
         Ok(sell_uid)
@@ -235,3 +243,97 @@ pub async fn make_new_and_collect(
         Err(eyre::eyre!("contract call to collect payment failed"))
     }
 }
+
+/// Renewal of a provision, paid by a buy statement.
+pub struct Renewal {
+    pub buy_attestation_uid: FixedBytes<32>,
+    pub old_statement_uid: FixedBytes<32>,
+    pub revision: RedisProvisionObligation::StatementData,
+    pub new_expiration: u64,
+}
+
+fn attested_uid(receipt: &TransactionReceipt) -> eyre::Result<FixedBytes<32>> {
+    receipt
+        .inner
+        .logs()
+        .iter()
+        .find(|log| log.topic0() == Some(&IEAS::Attested::SIGNATURE_HASH))
+        .map(|log| log.log_decode::<IEAS::Attested>().map(|a| a.inner.uid))
+        .ok_or_else(|| eyre::eyre!("reviseStatement logs didn't contain Attest"))?
+        .map_err(Into::into)
+}
+
+/// Renew many provisions, returning the new statement uid of each renewal.
+///
+/// Transactions are pipelined: every reviseStatement is broadcast before waiting for any of
+/// them, then every collectPayment. Renewals fail independently of each other.
+pub async fn update_many_and_collect(
+    renewals: Vec<Renewal>,
+    private_key: String,
+) -> eyre::Result<Vec<eyre::Result<FixedBytes<32>>>> {
+    let provider = provider::get_wallet_provider(private_key)?;
+
+    let result_address =
+        env::var("REDIS_PROVISION_OBLIGATION").map(|a| Address::parse_checksummed(a, None))??;
+    let payment_address =
+        env::var("ERC20_PAYMENT_OBLIGATION").map(|a| Address::parse_checksummed(a, None))??;
+
+    let result_contract = RedisProvisionObligation::new(result_address, &provider);
+    let payment_contract = ERC20PaymentObligation::new(payment_address, &provider);
+
+    let mut results: Vec<eyre::Result<FixedBytes<32>>> = renewals
+        .iter()
+        .map(|_| Err(eyre::eyre!("provision not renewed")))
+        .collect();
+
+    let mut revisions = Vec::new();
+    for (i, renewal) in renewals.iter().enumerate() {
+        let request = result_contract
+            .reviseStatement(
+                renewal.old_statement_uid,
+                renewal.revision.clone(),
+                renewal.new_expiration,
+            )
+            .into_transaction_request();
+        match tx_queue::send(&provider, request).await {
+            Ok(pending) => revisions.push((i, pending)),
+            Err(error) => results[i] = Err(error),
+        }
+    }
+
+    let (indices, pending): (Vec<_>, Vec<_>) = revisions.into_iter().unzip();
+    let mut collections = Vec::new();
+    for (i, receipt) in indices
+        .into_iter()
+        .zip(tx_queue::confirm_all(&provider, pending).await)
+    {
+        let sell_uid = match receipt.and_then(|receipt| attested_uid(&receipt)) {
+            Ok(sell_uid) => sell_uid,
+            Err(error) => {
+                results[i] = Err(error);
+                continue;
+            }
+        };
+        let request = payment_contract
+            .collectPayment(renewals[i].buy_attestation_uid, sell_uid)
+            .into_transaction_request();
+        match tx_queue::send(&provider, request).await {
+            Ok(pending) => collections.push(((i, sell_uid), pending)),
+            Err(error) => results[i] = Err(error),
+        }
+    }
+
+    let (renewed, pending): (Vec<_>, Vec<_>) = collections.into_iter().unzip();
+    for ((i, sell_uid), receipt) in renewed
+        .into_iter()
+        .zip(tx_queue::confirm_all(&provider, pending).await)
+    {
+        results[i] = match receipt {
+            Ok(receipt) if receipt.status() => Ok(sell_uid),
+            Ok(_) => Err(eyre::eyre!("contract call to collect payment failed")),
+            Err(error) => Err(error),
+        };
+    }
+
+    Ok(results)
+}
@@ -1,8 +1,18 @@
 use crate::{contracts::{BundlePaymentObligation, ERC721PaymentObligation}, provider};
-use std::env;
+use crate::chain_watcher::{self, AttestedFilter};
+use std::{
+    collections::{HashMap, VecDeque},
+    env,
+    sync::{Mutex, OnceLock},
+};
 
 use alloy::{
-    hex, primitives::{self, Address, FixedBytes}, sol_types::SolValue
+    eips::BlockNumberOrTag,
+    hex,
+    primitives::{self, Address, Bytes, FixedBytes},
+    providers::Provider,
+    rpc::{client::BatchRequest, types::TransactionRequest},
+    sol_types::{SolCall, SolValue},
 };
 
 use crate::shared::{ERC20Price, ERC721Price, BundlePrice};
@@ -20,19 +30,149 @@ pub struct JobPayment {
     pub demand: JobResultObligation::StatementData,
 }
 
+/// Immutable part of an attestation: its schema and data never change once attested
+/// (unlike its revocation time), so they can be memoized.
+#[derive(Clone)]
+pub struct AttestationData {
+    pub schema: FixedBytes<32>,
+    pub data: Bytes,
+}
+
+const MAX_CACHED_ATTESTATIONS: usize = 65_536;
+const MAX_BATCH_SIZE: usize = 100;
+
+type AttestationKey = (Address, FixedBytes<32>);
+
+/// Memoized attestations, the oldest evicted one at a time once MAX_CACHED_ATTESTATIONS are
+/// cached, so that a full cache does not send every read back to the node at once.
+#[derive(Default)]
+struct AttestationCache {
+    entries: HashMap<AttestationKey, AttestationData>,
+    /// Keys in insertion order.
+    order: VecDeque<AttestationKey>,
+}
+
+static ATTESTATIONS: OnceLock<Mutex<AttestationCache>> = OnceLock::new();
+
+fn cached_attestation(eas_address: Address, uid: FixedBytes<32>) -> Option<AttestationData> {
+    ATTESTATIONS
+        .get_or_init(Default::default)
+        .lock()
+        .ok()?
+        .entries
+        .get(&(eas_address, uid))
+        .cloned()
+}
+
+fn cache_attestation(eas_address: Address, uid: FixedBytes<32>, attestation: &AttestationData) {
+    // Unknown uids read as empty attestations, which must not be memoized.
+    if attestation.schema == FixedBytes::<32>::ZERO {
+        return;
+    }
+    if let Ok(mut cache) = ATTESTATIONS.get_or_init(Default::default).lock() {
+        let key = (eas_address, uid);
+        if cache.entries.contains_key(&key) {
+            return;
+        }
+        if cache.entries.len() >= MAX_CACHED_ATTESTATIONS {
+            if let Some(oldest) = cache.order.pop_front() {
+                cache.entries.remove(&oldest);
+            }
+        }
+        cache.entries.insert(key, attestation.clone());
+        cache.order.push_back(key);
+    }
+}
+
+pub async fn get_attestation(uid: FixedBytes<32>) -> eyre::Result<AttestationData> {
+    let eas_address = env::var("EAS_CONTRACT").map(|a| Address::parse_checksummed(a, None))??;
+
+    if let Some(attestation) = cached_attestation(eas_address, uid) {
+        return Ok(attestation);
+    }
+
+    let provider = provider::get_public_provider()?;
+    let contract = IEAS::new(eas_address, provider);
+    let attestation = contract.getAttestation(uid).call().await?._0;
+
+    let attestation = AttestationData {
+        schema: attestation.schema,
+        data: attestation.data,
+    };
+    cache_attestation(eas_address, uid, &attestation);
+
+    Ok(attestation)
+}
+
+/// Get many attestations, reading the ones not memoized with batched JSON-RPC eth_calls.
+pub async fn get_attestations(uids: &[FixedBytes<32>]) -> eyre::Result<Vec<AttestationData>> {
+    let eas_address = env::var("EAS_CONTRACT").map(|a| Address::parse_checksummed(a, None))??;
+
+    let mut attestations: Vec<Option<AttestationData>> = uids
+        .iter()
+        .map(|uid| cached_attestation(eas_address, *uid))
+        .collect();
+
+    let missing: Vec<usize> = (0..uids.len()).filter(|&i| attestations[i].is_none()).collect();
+
+    if !missing.is_empty() {
+        let provider = provider::get_public_provider()?;
+
+        for chunk in missing.chunks(MAX_BATCH_SIZE) {
+            let mut batch = BatchRequest::new(provider.client());
+
+            let waiters = chunk
+                .iter()
+                .map(|&i| {
+                    let tx = TransactionRequest::default()
+                        .to(eas_address)
+                        .input(Bytes::from(IEAS::getAttestationCall { uid: uids[i] }.abi_encode()).into());
+                    batch.add_call::<_, Bytes>("eth_call", &(tx, BlockNumberOrTag::Latest))
+                })
+                .collect::<Result<Vec<_>, _>>()?;
+
+            batch.send().await?;
+
+            for (&i, waiter) in chunk.iter().zip(waiters) {
+                let output = waiter.await?;
+                let attestation = IEAS::getAttestationCall::abi_decode_returns(&output, true)?._0;
+
+                let attestation = AttestationData {
+                    schema: attestation.schema,
+                    data: attestation.data,
+                };
+                cache_attestation(eas_address, uids[i], &attestation);
+                attestations[i] = Some(attestation);
+            }
+        }
+    }
+
+    attestations
+        .into_iter()
+        .map(|attestation| attestation.ok_or_else(|| eyre::eyre!("missing attestation")))
+        .collect()
+}
+
 pub async fn get_buy_statement(
     statement_uid: FixedBytes<32>,
 ) -> eyre::Result<JobPayment> {
-    let provider = provider::get_public_provider()?;
+    let attestation = get_attestation(statement_uid).await?;
+    decode_buy_statement(&attestation)
+}
 
-    let eas_address = env::var("EAS_CONTRACT").map(|a| Address::parse_checksummed(a, None))??;
+pub async fn get_buy_statements(
+    statement_uids: &[FixedBytes<32>],
+) -> eyre::Result<Vec<JobPayment>> {
+    get_attestations(statement_uids)
+        .await?
+        .iter()
+        .map(decode_buy_statement)
+        .collect()
+}
 
-    let contract = IEAS::new(eas_address, provider);
-    let attestation = contract.getAttestation(statement_uid).call().await?._0;
+fn decode_buy_statement(attestation: &AttestationData) -> eyre::Result<JobPayment> {
     let attestation_schema_string = hex::encode(attestation.schema);
 
-    println!("{}", attestation_schema_string);
-
     let erc20_schema_uid =
         env::var("ERC20_SCHEMA_UID")?;
 
@@ -88,21 +228,65 @@ pub async fn get_buy_statement(
 pub async fn get_sell_statement(
     sell_uid: FixedBytes<32>,
 ) -> eyre::Result<String> {
-    let provider = provider::get_public_provider()?;
-
-    let eas_address = env::var("EAS_CONTRACT")
-        .map(|a| Address::parse_checksummed(a, None))??;
-
-    let contract = IEAS::new(eas_address, provider);
+    let attestation = get_attestation(sell_uid).await?;
+    decode_sell_statement(&attestation)
+}
 
-    let attestation = contract
-        .getAttestation(sell_uid)
-        .call()
+pub async fn get_sell_statements(
+    sell_uids: &[FixedBytes<32>],
+) -> eyre::Result<Vec<String>> {
+    get_attestations(sell_uids)
         .await?
-        ._0;
+        .iter()
+        .map(decode_sell_statement)
+        .collect()
+}
 
+fn decode_sell_statement(attestation: &AttestationData) -> eyre::Result<String> {
     let attestation_data =
         JobResultObligation::StatementData::abi_decode(attestation.data.as_ref(), true)?;
 
     Ok(attestation_data.result)
 }
+
+/// Wait for the sell statement of a buy statement, returning its uid.
+///
+/// Sell statements are attested by JOB_RESULT_OBLIGATION: its Attested events are watched from
+/// from_block (the latest block if None), and the one referring to the buy statement is kept.
+pub async fn wait_for_sell_statement(
+    buy_uid: FixedBytes<32>,
+    from_block: Option<u64>,
+) -> eyre::Result<FixedBytes<32>> {
+    let eas_address = env::var("EAS_CONTRACT").map(|a| Address::parse_checksummed(a, None))??;
+    let result_address =
+        env::var("JOB_RESULT_OBLIGATION").map(|a| Address::parse_checksummed(a, None))??;
+
+    let mut attested = chain_watcher::watch_attested(
+        AttestedFilter {
+            attester: Some(result_address),
+            ..Default::default()
+        },
+        from_block,
+    )?;
+
+    let provider = provider::get_public_provider()?;
+    let contract = IEAS::new(eas_address, provider);
+
+    while let Some(event) = attested.recv().await {
+        let attestation = contract.getAttestation(event.uid).call().await?._0;
+        if attestation.refUID == buy_uid {
+            // Read right after by get_sell_statement.
+            cache_attestation(
+                eas_address,
+                event.uid,
+                &AttestationData {
+                    schema: attestation.schema,
+                    data: attestation.data,
+                },
+            );
+            return Ok(event.uid);
+        }
+    }
+
+    Err(eyre::eyre!("chain watcher stopped"))
+}
@@ -4,23 +4,20 @@ use pyo3::prelude::*;
 
 use crate::shared::BundlePrice;
 use crate::apiary::bundle_for_job;
+use crate::metrics;
+use crate::runtime;
 
-#[tokio::main]
 #[pyfunction]
-async fn helloworld() -> PyResult<String> {
+fn helloworld() -> PyResult<String> {
     Ok("HelloWorld Bundle".into())
 }
 
-#[tokio::main]
-#[pyfunction]
-async fn make_buy_statement(
+fn parse_price(
     erc20_addresses_list: Vec<String>,
     erc20_amounts_list: Vec<u64>,
     erc721_addresses_list: Vec<String>,
     erc721_ids_list: Vec<u64>,
-    query: String,
-    private_key: String,
-) -> PyResult<String> {
+) -> PyResult<BundlePrice> {
 
     if erc20_addresses_list.len() != erc20_amounts_list.len() {
         return Err(PyValueError::new_err("erc20_addresses_list and erc20_amounts_list must have the same length"));
@@ -35,34 +32,110 @@ async fn make_buy_statement(
     let erc721_addresses = erc721_addresses_list.iter().map(|token| {Address::parse_checksummed(token, None).map_err(|_| PyValueError::new_err("couldn't parse token as an address"))}).collect::<Result<Vec<Address>, _>>()?;
     let erc721_ids: Vec<alloy::primitives::Uint<256, 4>> = erc721_ids_list.iter().map(|&id| U256::from(id)).collect();
 
-    let price = BundlePrice {
+    Ok(BundlePrice {
         erc20_addresses: erc20_addresses,
         erc20_amounts: erc20_amounts,
         erc721_addresses: erc721_addresses,
         erc721_ids: erc721_ids
-    };
+    })
+}
+
+fn parse_buy_attestation_uid(buy_attestation_uid: String) -> PyResult<FixedBytes<32>> {
+    buy_attestation_uid
+        .parse::<FixedBytes<32>>()
+        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))
+}
+
+#[pyfunction]
+#[pyo3(signature = (erc20_addresses_list, erc20_amounts_list, erc721_addresses_list, erc721_ids_list, query, private_key, pipelined=true, skip_approved=false))]
+fn make_buy_statement(
+    py: Python<'_>,
+    erc20_addresses_list: Vec<String>,
+    erc20_amounts_list: Vec<u64>,
+    erc721_addresses_list: Vec<String>,
+    erc721_ids_list: Vec<u64>,
+    query: String,
+    private_key: String,
+    pipelined: bool,
+    skip_approved: bool,
+) -> PyResult<String> {
+    let price = parse_price(erc20_addresses_list, erc20_amounts_list, erc721_addresses_list, erc721_ids_list)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "bundle.make_buy_statement",
+            bundle_for_job::make_buy_statement(price, query, private_key, pipelined, skip_approved),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+#[pyo3(signature = (erc20_addresses_list, erc20_amounts_list, erc721_addresses_list, erc721_ids_list, query, private_key, pipelined=true, skip_approved=false))]
+async fn make_buy_statement_async(
+    erc20_addresses_list: Vec<String>,
+    erc20_amounts_list: Vec<u64>,
+    erc721_addresses_list: Vec<String>,
+    erc721_ids_list: Vec<u64>,
+    query: String,
+    private_key: String,
+    pipelined: bool,
+    skip_approved: bool,
+) -> PyResult<String> {
+    let price = parse_price(erc20_addresses_list, erc20_amounts_list, erc721_addresses_list, erc721_ids_list)?;
 
-    bundle_for_job::make_buy_statement(price, query, private_key)
+    runtime::spawn(metrics::timed(
+        "bundle.make_buy_statement",
+        bundle_for_job::make_buy_statement(price, query, private_key, pipelined, skip_approved),
+    ))
         .await
         .map(|x| x.to_string())
         .map_err(PyErr::from)
 }
 
-#[tokio::main]
 #[pyfunction]
-async fn submit_and_collect(
+fn submit_and_collect(
+    py: Python<'_>,
     buy_attestation_uid: String,
     result_cid: String,
     private_key: String,
 ) -> PyResult<String> {
-    let buy_attestation_uid: FixedBytes<32> = buy_attestation_uid
-        .parse::<FixedBytes<32>>()
-        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))?;
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
 
-        bundle_for_job::submit_and_collect(buy_attestation_uid, result_cid, private_key)
-        .await
-        .map(|x| x.to_string())
-        .map_err(PyErr::from)
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "bundle.submit_and_collect",
+            bundle_for_job::submit_and_collect(
+                buy_attestation_uid,
+                result_cid,
+                private_key,
+            ),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn submit_and_collect_async(
+    buy_attestation_uid: String,
+    result_cid: String,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
+
+    runtime::spawn(metrics::timed(
+        "bundle.submit_and_collect",
+        bundle_for_job::submit_and_collect(
+            buy_attestation_uid,
+            result_cid,
+            private_key,
+        ),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
 }
 
 pub fn add_bundle_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
@@ -70,7 +143,9 @@ pub fn add_bundle_submodule(py: Python, parent_module: &Bound<'_, PyModule>) ->
 
     bundle_module.add_function(wrap_pyfunction!(helloworld, &bundle_module)?)?;
     bundle_module.add_function(wrap_pyfunction!(make_buy_statement, &bundle_module)?)?;
+    bundle_module.add_function(wrap_pyfunction!(make_buy_statement_async, &bundle_module)?)?;
     bundle_module.add_function(wrap_pyfunction!(submit_and_collect, &bundle_module)?)?;
+    bundle_module.add_function(wrap_pyfunction!(submit_and_collect_async, &bundle_module)?)?;
 
     parent_module.add_submodule(&bundle_module)?;
     Ok(())
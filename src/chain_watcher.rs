@@ -0,0 +1,366 @@
+use alloy::{
+    primitives::{Address, FixedBytes, TxHash},
+    providers::Provider,
+    rpc::{
+        client::BatchRequest,
+        types::{Filter, Log, TransactionReceipt},
+    },
+    sol_types::SolEvent,
+};
+use std::{
+    collections::HashMap,
+    env,
+    sync::{Mutex, MutexGuard, OnceLock, PoisonError},
+    time::Duration,
+};
+use tokio::sync::mpsc;
+
+use crate::contracts::IEAS;
+use crate::shared::env_or;
+use crate::{metrics, provider, runtime};
+
+/// Receipts requested by a single poll, the others are requested by the next polls.
+const MAX_BATCH_SIZE: usize = 100;
+/// Blocks scanned by a single eth_getLogs, so that catching up stays within node limits.
+const MAX_BLOCK_RANGE: u64 = 2_000;
+
+/// Filter on the indexed fields of IEAS::Attested, None matching any value.
+#[derive(Clone, Default)]
+pub struct AttestedFilter {
+    pub recipient: Option<Address>,
+    pub attester: Option<Address>,
+    pub schema: Option<FixedBytes<32>>,
+}
+
+impl AttestedFilter {
+    fn matches(&self, event: &IEAS::Attested) -> bool {
+        self.recipient.map_or(true, |recipient| recipient == event.recipient)
+            && self.attester.map_or(true, |attester| attester == event.attester)
+            && self.schema.map_or(true, |schema| schema == event.schemaUID)
+    }
+}
+
+struct ReceiptWatch {
+    /// Head at which the receipt was last found missing, it is requested once per block.
+    checked_at: Option<u64>,
+    senders: Vec<mpsc::UnboundedSender<TransactionReceipt>>,
+}
+
+struct AttestedWatch {
+    eas_address: Address,
+    filter: AttestedFilter,
+    /// Next block to scan, the head at the next poll if None.
+    next_block: Option<u64>,
+    sender: mpsc::UnboundedSender<IEAS::Attested>,
+}
+
+#[derive(Default)]
+struct Watches {
+    receipts: HashMap<TxHash, ReceiptWatch>,
+    attested: Vec<AttestedWatch>,
+    running: bool,
+}
+
+/// Receipts and attestations watched by the process.
+///
+/// A single task polls the chain for all of them: each poll is one JSON-RPC batch, with an
+/// eth_getTransactionReceipt per pending transaction and one eth_getLogs for the Attested
+/// events of every watch. The task runs while something is watched.
+static WATCHES: OnceLock<Mutex<Watches>> = OnceLock::new();
+
+fn watches() -> MutexGuard<'static, Watches> {
+    // A panic of the polling task while holding the lock leaves the watches usable.
+    WATCHES
+        .get_or_init(Default::default)
+        .lock()
+        .unwrap_or_else(PoisonError::into_inner)
+}
+
+/// Clears Watches::running if the polling task ends without clearing it itself, by a panic or
+/// by the runtime dropping it, so that the next watch starts a new task.
+struct RunningGuard;
+
+impl Drop for RunningGuard {
+    fn drop(&mut self) {
+        watches().running = false;
+    }
+}
+
+fn ensure_running(watches: &mut Watches) {
+    if !watches.running {
+        watches.running = true;
+        runtime::get_runtime().spawn(run());
+    }
+}
+
+/// Drop the watches whose receivers are gone.
+fn prune(watches: &mut Watches) {
+    watches.receipts.retain(|_, watch| {
+        watch.senders.retain(|sender| !sender.is_closed());
+        !watch.senders.is_empty()
+    });
+    watches.attested.retain(|watch| !watch.sender.is_closed());
+}
+
+/// Watch for the receipt of a transaction, sent to sender once it is mined.
+pub fn watch_receipt(tx_hash: TxHash, sender: mpsc::UnboundedSender<TransactionReceipt>) {
+    let mut watches = watches();
+    watches
+        .receipts
+        .entry(tx_hash)
+        .or_insert_with(|| ReceiptWatch {
+            checked_at: None,
+            senders: Vec::new(),
+        })
+        .senders
+        .push(sender);
+    ensure_running(&mut watches);
+}
+
+/// Watch for the Attested events of EAS_CONTRACT matching filter, from from_block (the latest
+/// block if None). The watch lasts until the receiver is dropped.
+pub fn watch_attested(
+    filter: AttestedFilter,
+    from_block: Option<u64>,
+) -> eyre::Result<mpsc::UnboundedReceiver<IEAS::Attested>> {
+    let eas_address = env::var("EAS_CONTRACT").map(|a| Address::parse_checksummed(a, None))??;
+    let (sender, receiver) = mpsc::unbounded_channel();
+
+    let mut watches = watches();
+    watches.attested.push(AttestedWatch {
+        eas_address,
+        filter,
+        next_block: from_block,
+        sender,
+    });
+    ensure_running(&mut watches);
+
+    Ok(receiver)
+}
+
+/// Poll every CHAIN_WATCHER.POLL_INTERVAL seconds (1 by default) while something is watched.
+async fn run() {
+    let poll_interval = Duration::from_secs_f64(env_or("CHAIN_WATCHER.POLL_INTERVAL", 1.0));
+    let running = RunningGuard;
+
+    loop {
+        // A failed poll is retried by the next one: its watches are left as they were.
+        let _ = metrics::timed("chain_watcher.poll", poll()).await;
+
+        {
+            let mut watches = watches();
+            prune(&mut watches);
+            if watches.receipts.is_empty() && watches.attested.is_empty() {
+                // Cleared under the lock: a watch added once it is released starts a new task,
+                // which the guard must not mark as stopped.
+                watches.running = false;
+                std::mem::forget(running);
+                return;
+            }
+        }
+
+        tokio::time::sleep(poll_interval).await;
+    }
+}
+
+async fn poll() -> eyre::Result<()> {
+    let provider = provider::get_public_provider()?;
+    let head = provider.get_block_number().await?;
+
+    // What this poll requests, the lock is not held across requests.
+    let (hashes, addresses, blocks) = {
+        let mut watches = watches();
+        prune(&mut watches);
+
+        let hashes: Vec<TxHash> = watches
+            .receipts
+            .iter()
+            .filter(|(_, watch)| watch.checked_at.map_or(true, |block| block < head))
+            .map(|(hash, _)| *hash)
+            .take(MAX_BATCH_SIZE)
+            .collect();
+
+        let mut addresses: Vec<Address> = Vec::new();
+        let mut from_block: Option<u64> = None;
+        for watch in watches.attested.iter_mut() {
+            let next_block = *watch.next_block.get_or_insert(head);
+            from_block = Some(from_block.map_or(next_block, |block| block.min(next_block)));
+            if !addresses.contains(&watch.eas_address) {
+                addresses.push(watch.eas_address);
+            }
+        }
+        let blocks = from_block
+            .filter(|&block| block <= head)
+            .map(|block| (block, head.min(block + MAX_BLOCK_RANGE - 1)));
+
+        (hashes, addresses, blocks)
+    };
+
+    if hashes.is_empty() && blocks.is_none() {
+        return Ok(());
+    }
+
+    let mut batch = BatchRequest::new(provider.client());
+    let receipt_waiters = hashes
+        .iter()
+        .map(|hash| {
+            batch.add_call::<_, Option<TransactionReceipt>>("eth_getTransactionReceipt", &(hash,))
+        })
+        .collect::<Result<Vec<_>, _>>()?;
+    let logs_waiter = blocks
+        .map(|(from_block, to_block)| {
+            let filter = Filter::new()
+                .address(addresses)
+                .event_signature(IEAS::Attested::SIGNATURE_HASH)
+                .from_block(from_block)
+                .to_block(to_block);
+            batch.add_call::<_, Vec<Log>>("eth_getLogs", &(filter,))
+        })
+        .transpose()?;
+
+    batch.send().await?;
+
+    let mut receipts = Vec::with_capacity(hashes.len());
+    for (hash, waiter) in hashes.into_iter().zip(receipt_waiters) {
+        receipts.push((hash, waiter.await?));
+    }
+    let logs = match logs_waiter {
+        Some(waiter) => waiter.await?,
+        None => Vec::new(),
+    };
+
+    let mut watches = watches();
+
+    for (hash, receipt) in receipts {
+        match receipt {
+            Some(receipt) => {
+                if let Some(watch) = watches.receipts.remove(&hash) {
+                    for sender in watch.senders {
+                        let _ = sender.send(receipt.clone());
+                    }
+                }
+            }
+            None => {
+                if let Some(watch) = watches.receipts.get_mut(&hash) {
+                    watch.checked_at = Some(head);
+                }
+            }
+        }
+    }
+
+    if let Some((from_block, to_block)) = blocks {
+        let events: Vec<(Address, u64, IEAS::Attested)> = logs
+            .iter()
+            .filter_map(|log| {
+                let event = log.log_decode::<IEAS::Attested>().ok()?.inner.data;
+                Some((log.address(), log.block_number?, event))
+            })
+            .collect();
+
+        for watch in watches.attested.iter_mut() {
+            // Watches added since the request was made may start outside of the scanned blocks.
+            let Some(next_block) = watch.next_block else {
+                continue;
+            };
+            if next_block < from_block || next_block > to_block {
+                continue;
+            }
+            for (address, block, event) in &events {
+                if *address == watch.eas_address
+                    && *block >= next_block
+                    && watch.filter.matches(event)
+                {
+                    let _ = watch.sender.send(event.clone());
+                }
+            }
+            watch.next_block = Some(to_block + 1);
+        }
+    }
+
+    Ok(())
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use alloy::{
+        hex,
+        network::TransactionBuilder,
+        node_bindings::Anvil,
+        primitives::{Bytes, B256},
+        rpc::types::TransactionRequest,
+    };
+
+    use crate::tx_queue;
+
+    /// Init code of a contract logging its calldata: four topics, then the data.
+    const LOG4_EMITTER: &str =
+        "601b80600b6000396000f360803603806080600037606035604035602035600035846000a400";
+
+    fn attested_calldata(attester: Address, uid: B256) -> Bytes {
+        [
+            IEAS::Attested::SIGNATURE_HASH.as_slice(),
+            Address::ZERO.into_word().as_slice(),
+            attester.into_word().as_slice(),
+            B256::ZERO.as_slice(),
+            uid.as_slice(),
+        ]
+        .concat()
+        .into()
+    }
+
+    #[tokio::test]
+    async fn watches_receipts_and_attestations() -> eyre::Result<()> {
+        let anvil = Anvil::new().block_time(1).try_spawn()?;
+        env::set_var("RPC_URL", anvil.endpoint());
+        let provider = provider::get_wallet_provider(hex::encode(anvil.keys()[0].to_bytes()))?;
+
+        // Stand-in for EAS, emitting the Attested events of its calls.
+        let deployment = tx_queue::submit(
+            &provider,
+            TransactionRequest::default().with_deploy_code(hex::decode(LOG4_EMITTER)?),
+        )
+        .await?;
+        let eas_address = deployment.contract_address.unwrap();
+        env::set_var("EAS_CONTRACT", eas_address.to_checksum(None));
+
+        let attester = Address::repeat_byte(1);
+        let mut attested = watch_attested(
+            AttestedFilter {
+                attester: Some(attester),
+                ..Default::default()
+            },
+            deployment.block_number,
+        )?;
+
+        let mut pending = Vec::new();
+        for (attester, uid) in [
+            (attester, B256::repeat_byte(1)),
+            (Address::repeat_byte(2), B256::repeat_byte(2)),
+            (attester, B256::repeat_byte(3)),
+        ] {
+            let request = TransactionRequest::default()
+                .with_to(eas_address)
+                .with_input(attested_calldata(attester, uid));
+            pending.push(tx_queue::send(&provider, request).await?);
+        }
+
+        // The receipts of all transactions are watched at once.
+        let mut pending = pending.into_iter();
+        let (first, second, third) = tokio::join!(
+            tx_queue::confirm(&provider, pending.next().unwrap()),
+            tx_queue::confirm(&provider, pending.next().unwrap()),
+            tx_queue::confirm(&provider, pending.next().unwrap()),
+        );
+        assert!(first?.status() && second?.status() && third?.status());
+
+        let mut uids = vec![
+            attested.recv().await.unwrap().uid,
+            attested.recv().await.unwrap().uid,
+        ];
+        uids.sort();
+        assert_eq!(uids, vec![B256::repeat_byte(1), B256::repeat_byte(3)]);
+
+        Ok(())
+    }
+}
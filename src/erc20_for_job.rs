@@ -4,48 +4,108 @@ use pyo3::prelude::*;
 
 use crate::shared::ERC20Price;
 use crate::apiary::erc20_for_job;
+use crate::metrics;
+use crate::runtime;
 
-#[tokio::main]
 #[pyfunction]
-async fn helloworld() -> PyResult<String> {
+fn helloworld() -> PyResult<String> {
     Ok("HelloWorld ERC20".into())
 }
 
-#[tokio::main]
+fn parse_price(token: String, amount: u64) -> PyResult<ERC20Price> {
+    Ok(ERC20Price {
+        token: Address::parse_checksummed(&token, None)
+            .map_err(|_| PyValueError::new_err("couldn't parse token as an address"))?,
+        amount: U256::from(amount),
+    })
+}
+
+fn parse_buy_attestation_uid(buy_attestation_uid: String) -> PyResult<FixedBytes<32>> {
+    buy_attestation_uid
+        .parse::<FixedBytes<32>>()
+        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))
+}
+
 #[pyfunction]
-async fn make_buy_statement(
+fn make_buy_statement(
+    py: Python<'_>,
     token: String,
     amount: u64,
     query: String,
     private_key: String,
 ) -> PyResult<String> {
-    let price = ERC20Price {
-        token: Address::parse_checksummed(&token, None)
-            .map_err(|_| PyValueError::new_err("couldn't parse token as an address"))?,
-        amount: U256::from(amount),
-    };
+    let price = parse_price(token, amount)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "erc20.make_buy_statement",
+            erc20_for_job::make_buy_statement(price, query, private_key),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn make_buy_statement_async(
+    token: String,
+    amount: u64,
+    query: String,
+    private_key: String,
+) -> PyResult<String> {
+    let price = parse_price(token, amount)?;
 
-    erc20_for_job::make_buy_statement(price, query, private_key)
+    runtime::spawn(metrics::timed(
+        "erc20.make_buy_statement",
+        erc20_for_job::make_buy_statement(price, query, private_key),
+    ))
         .await
         .map(|x| x.to_string())
         .map_err(PyErr::from)
 }
 
-#[tokio::main]
 #[pyfunction]
-async fn submit_and_collect(
+fn submit_and_collect(
+    py: Python<'_>,
     buy_attestation_uid: String,
     result_cid: String,
     private_key: String,
 ) -> PyResult<String> {
-    let buy_attestation_uid: FixedBytes<32> = buy_attestation_uid
-        .parse::<FixedBytes<32>>()
-        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))?;
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
 
-    erc20_for_job::submit_and_collect(buy_attestation_uid, result_cid, private_key)
-        .await
-        .map(|x| x.to_string())
-        .map_err(PyErr::from)
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "erc20.submit_and_collect",
+            erc20_for_job::submit_and_collect(
+                buy_attestation_uid,
+                result_cid,
+                private_key,
+            ),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn submit_and_collect_async(
+    buy_attestation_uid: String,
+    result_cid: String,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
+
+    runtime::spawn(metrics::timed(
+        "erc20.submit_and_collect",
+        erc20_for_job::submit_and_collect(
+            buy_attestation_uid,
+            result_cid,
+            private_key,
+        ),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
 }
 
 pub fn add_erc20_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
@@ -53,7 +113,9 @@ pub fn add_erc20_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> P
 
     erc20_module.add_function(wrap_pyfunction!(helloworld, &erc20_module)?)?;
     erc20_module.add_function(wrap_pyfunction!(make_buy_statement, &erc20_module)?)?;
+    erc20_module.add_function(wrap_pyfunction!(make_buy_statement_async, &erc20_module)?)?;
     erc20_module.add_function(wrap_pyfunction!(submit_and_collect, &erc20_module)?)?;
+    erc20_module.add_function(wrap_pyfunction!(submit_and_collect_async, &erc20_module)?)?;
 
     parent_module.add_submodule(&erc20_module)?;
     Ok(())
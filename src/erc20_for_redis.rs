@@ -0,0 +1,390 @@
+use alloy::primitives::{Address, FixedBytes, U256};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+
+use crate::apiary::erc20_for_redis::{self, RedisProvisionDemand, Renewal};
+use crate::contracts::RedisProvisionObligation;
+use crate::metrics;
+use crate::runtime;
+use crate::shared::ERC20Price;
+
+#[pyfunction]
+fn helloworld() -> PyResult<String> {
+    Ok("HelloWorld Redis".into())
+}
+
+fn parse_address(address: &str, name: &str) -> PyResult<Address> {
+    Address::parse_checksummed(address, None)
+        .map_err(|_| PyValueError::new_err(format!("couldn't parse {} as an address", name)))
+}
+
+fn parse_uid(uid: &str, name: &str) -> PyResult<FixedBytes<32>> {
+    uid.parse::<FixedBytes<32>>()
+        .map_err(|_| PyValueError::new_err(format!("couldn't parse {} as bytes32", name)))
+}
+
+fn to_u64(value: U256, name: &str) -> PyResult<u64> {
+    value
+        .try_into()
+        .map_err(|_| PyValueError::new_err(format!("{} too big for u64", name)))
+}
+
+/// Provision of a Redis server, as (user, capacity, egress, cpus, server_name, url).
+type Provision = (String, u64, u64, u64, String, String);
+
+fn parse_provision(provision: Provision) -> PyResult<RedisProvisionObligation::StatementData> {
+    let (user, capacity, egress, cpus, server_name, url) = provision;
+    Ok(RedisProvisionObligation::StatementData {
+        user: parse_address(&user, "user")?,
+        capacity: U256::from(capacity),
+        egress: U256::from(egress),
+        cpus: U256::from(cpus),
+        serverName: server_name,
+        url,
+    })
+}
+
+#[pyclass(get_all)]
+pub struct RedisBuyStatement {
+    token: String,
+    amount: u64,
+    arbiter: String,
+    service_provider: String,
+    replaces: String,
+    user: String,
+    capacity: u64,
+    egress: u64,
+    cpus: u64,
+    expiration: u64,
+    server_name: String,
+}
+
+fn to_buy_statement(
+    payment: erc20_for_redis::RedisProvisionPayment,
+) -> PyResult<RedisBuyStatement> {
+    let demand = payment.base_demand;
+    Ok(RedisBuyStatement {
+        token: payment.price.token.to_string(),
+        amount: to_u64(payment.price.amount, "amount")?,
+        arbiter: payment.arbiter.to_string(),
+        service_provider: payment.provider_demand.to_string(),
+        replaces: demand.replaces.to_string(),
+        user: demand.user.to_string(),
+        capacity: to_u64(demand.capacity, "capacity")?,
+        egress: to_u64(demand.egress, "egress")?,
+        cpus: to_u64(demand.cpus, "cpus")?,
+        expiration: demand.expiration,
+        server_name: demand.serverName,
+    })
+}
+
+#[allow(clippy::too_many_arguments)]
+fn parse_demand(
+    replaces: String,
+    user: String,
+    capacity: u64,
+    egress: u64,
+    cpus: u64,
+    expiration: u64,
+    server_name: String,
+) -> PyResult<RedisProvisionDemand> {
+    Ok(RedisProvisionDemand {
+        replaces: parse_uid(&replaces, "replaces")?,
+        user: parse_address(&user, "user")?,
+        capacity: U256::from(capacity),
+        egress: U256::from(egress),
+        cpus: U256::from(cpus),
+        expiration,
+        serverName: server_name,
+    })
+}
+
+/// Buy a Redis provision from a service provider, replacing the provision `replaces` if
+/// it isn't the zero uid (a renewal).
+#[pyfunction]
+#[allow(clippy::too_many_arguments)]
+fn make_buy_statement(
+    py: Python<'_>,
+    token: String,
+    amount: u64,
+    replaces: String,
+    user: String,
+    capacity: u64,
+    egress: u64,
+    cpus: u64,
+    expiration: u64,
+    server_name: String,
+    service_provider: String,
+    private_key: String,
+) -> PyResult<String> {
+    let price = ERC20Price {
+        token: parse_address(&token, "token")?,
+        amount: U256::from(amount),
+    };
+    let demand = parse_demand(replaces, user, capacity, egress, cpus, expiration, server_name)?;
+    let service_provider = parse_address(&service_provider, "service_provider")?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "redis.make_buy_statement",
+            erc20_for_redis::make_buy_statement(price, demand, service_provider, private_key),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+#[allow(clippy::too_many_arguments)]
+async fn make_buy_statement_async(
+    token: String,
+    amount: u64,
+    replaces: String,
+    user: String,
+    capacity: u64,
+    egress: u64,
+    cpus: u64,
+    expiration: u64,
+    server_name: String,
+    service_provider: String,
+    private_key: String,
+) -> PyResult<String> {
+    let price = ERC20Price {
+        token: parse_address(&token, "token")?,
+        amount: U256::from(amount),
+    };
+    let demand = parse_demand(replaces, user, capacity, egress, cpus, expiration, server_name)?;
+    let service_provider = parse_address(&service_provider, "service_provider")?;
+
+    runtime::spawn(metrics::timed(
+        "redis.make_buy_statement",
+        erc20_for_redis::make_buy_statement(price, demand, service_provider, private_key),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+fn get_buy_statement(py: Python<'_>, statement_uid: String) -> PyResult<RedisBuyStatement> {
+    let statement_uid = parse_uid(&statement_uid, "statement_uid")?;
+
+    let payment = py
+        .allow_threads(|| {
+            runtime::block_on(metrics::timed(
+                "redis.get_buy_statement",
+                erc20_for_redis::get_buy_statement(statement_uid),
+            ))
+        })
+        .map_err(PyErr::from)?;
+
+    to_buy_statement(payment)
+}
+
+#[pyfunction]
+async fn get_buy_statement_async(statement_uid: String) -> PyResult<RedisBuyStatement> {
+    let statement_uid = parse_uid(&statement_uid, "statement_uid")?;
+
+    let payment = runtime::spawn(metrics::timed(
+        "redis.get_buy_statement",
+        erc20_for_redis::get_buy_statement(statement_uid),
+    ))
+    .await
+    .map_err(PyErr::from)?;
+
+    to_buy_statement(payment)
+}
+
+/// Provision a new Redis server for a buy statement and collect its payment.
+#[pyfunction]
+fn make_new_and_collect(
+    py: Python<'_>,
+    buy_attestation_uid: String,
+    provision: Provision,
+    expiration: u64,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_uid(&buy_attestation_uid, "buy_attestation_uid")?;
+    let provision = parse_provision(provision)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "redis.make_new_and_collect",
+            erc20_for_redis::make_new_and_collect(
+                buy_attestation_uid,
+                provision,
+                expiration,
+                private_key,
+            ),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn make_new_and_collect_async(
+    buy_attestation_uid: String,
+    provision: Provision,
+    expiration: u64,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_uid(&buy_attestation_uid, "buy_attestation_uid")?;
+    let provision = parse_provision(provision)?;
+
+    runtime::spawn(metrics::timed(
+        "redis.make_new_and_collect",
+        erc20_for_redis::make_new_and_collect(
+            buy_attestation_uid,
+            provision,
+            expiration,
+            private_key,
+        ),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+/// Revise a provision for a buy statement and collect its payment.
+#[pyfunction]
+fn update_and_collect(
+    py: Python<'_>,
+    buy_attestation_uid: String,
+    old_statement_uid: String,
+    provision: Provision,
+    new_expiration: u64,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_uid(&buy_attestation_uid, "buy_attestation_uid")?;
+    let old_statement_uid = parse_uid(&old_statement_uid, "old_statement_uid")?;
+    let revision = parse_provision(provision)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "redis.update_and_collect",
+            erc20_for_redis::update_and_collect(
+                buy_attestation_uid,
+                old_statement_uid,
+                revision,
+                new_expiration,
+                private_key,
+            ),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn update_and_collect_async(
+    buy_attestation_uid: String,
+    old_statement_uid: String,
+    provision: Provision,
+    new_expiration: u64,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_uid(&buy_attestation_uid, "buy_attestation_uid")?;
+    let old_statement_uid = parse_uid(&old_statement_uid, "old_statement_uid")?;
+    let revision = parse_provision(provision)?;
+
+    runtime::spawn(metrics::timed(
+        "redis.update_and_collect",
+        erc20_for_redis::update_and_collect(
+            buy_attestation_uid,
+            old_statement_uid,
+            revision,
+            new_expiration,
+            private_key,
+        ),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+/// Renewal of a provision, as (buy_attestation_uid, old_statement_uid, provision, new_expiration).
+type RenewalArgs = (String, String, Provision, u64);
+
+fn parse_renewals(renewals: Vec<RenewalArgs>) -> PyResult<Vec<Renewal>> {
+    renewals
+        .into_iter()
+        .map(|(buy_attestation_uid, old_statement_uid, provision, new_expiration)| {
+            Ok(Renewal {
+                buy_attestation_uid: parse_uid(&buy_attestation_uid, "buy_attestation_uid")?,
+                old_statement_uid: parse_uid(&old_statement_uid, "old_statement_uid")?,
+                revision: parse_provision(provision)?,
+                new_expiration,
+            })
+        })
+        .collect()
+}
+
+/// Results of renewals, as (new statement uid, None) or (None, error).
+fn to_renewal_results(
+    results: Vec<eyre::Result<FixedBytes<32>>>,
+) -> Vec<(Option<String>, Option<String>)> {
+    results
+        .into_iter()
+        .map(|result| match result {
+            Ok(uid) => (Some(uid.to_string()), None),
+            Err(error) => (None, Some(error.to_string())),
+        })
+        .collect()
+}
+
+/// Renew many provisions in one pipelined batch, each renewal failing independently.
+#[pyfunction]
+fn update_many_and_collect(
+    py: Python<'_>,
+    renewals: Vec<RenewalArgs>,
+    private_key: String,
+) -> PyResult<Vec<(Option<String>, Option<String>)>> {
+    let renewals = parse_renewals(renewals)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "redis.update_many_and_collect",
+            erc20_for_redis::update_many_and_collect(renewals, private_key),
+        ))
+    })
+    .map(to_renewal_results)
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn update_many_and_collect_async(
+    renewals: Vec<RenewalArgs>,
+    private_key: String,
+) -> PyResult<Vec<(Option<String>, Option<String>)>> {
+    let renewals = parse_renewals(renewals)?;
+
+    runtime::spawn(metrics::timed(
+        "redis.update_many_and_collect",
+        erc20_for_redis::update_many_and_collect(renewals, private_key),
+    ))
+    .await
+    .map(to_renewal_results)
+    .map_err(PyErr::from)
+}
+
+pub fn add_redis_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
+    let redis_module = PyModule::new_bound(py, "redis")?;
+
+    redis_module.add_function(wrap_pyfunction!(helloworld, &redis_module)?)?;
+
+    redis_module.add_class::<RedisBuyStatement>()?;
+    redis_module.add_function(wrap_pyfunction!(make_buy_statement, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(make_buy_statement_async, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(get_buy_statement, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(get_buy_statement_async, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(make_new_and_collect, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(make_new_and_collect_async, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(update_and_collect, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(update_and_collect_async, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(update_many_and_collect, &redis_module)?)?;
+    redis_module.add_function(wrap_pyfunction!(update_many_and_collect_async, &redis_module)?)?;
+
+    parent_module.add_submodule(&redis_module)?;
+    Ok(())
+}
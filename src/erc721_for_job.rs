@@ -1,49 +1,107 @@
 use alloy::primitives::{Address, FixedBytes, U256};
 use pyo3::{exceptions::PyValueError, prelude::*};
 
-use crate::{shared::ERC721Price, apiary::erc721_for_job};
+use crate::{shared::ERC721Price, apiary::erc721_for_job, metrics, runtime};
 
-#[tokio::main]
 #[pyfunction]
-async fn helloworld() -> PyResult<String> {
+fn helloworld() -> PyResult<String> {
     Ok("HelloWorld ERC721".into())
 }
 
-#[tokio::main]
+fn parse_price(token: String, token_id: u64) -> PyResult<ERC721Price> {
+    Ok(ERC721Price {
+        token: Address::parse_checksummed(&token, None)
+            .map_err(|_| PyValueError::new_err("couldn't parse token as an address"))?,
+        id: U256::from(token_id),
+    })
+}
+
+fn parse_buy_attestation_uid(buy_attestation_uid: String) -> PyResult<FixedBytes<32>> {
+    buy_attestation_uid
+        .parse::<FixedBytes<32>>()
+        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))
+}
+
 #[pyfunction]
-async fn make_buy_statement(
+fn make_buy_statement(
+    py: Python<'_>,
     token: String,
     token_id: u64,
     query: String,
     private_key: String,
 ) -> PyResult<String> {
-    let price = ERC721Price {
-        token: Address::parse_checksummed(&token, None)
-            .map_err(|_| PyValueError::new_err("couldn't parse token as an address"))?,
-        id: U256::from(token_id),
-    };
+    let price = parse_price(token, token_id)?;
+
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "erc721.make_buy_statement",
+            erc721_for_job::make_buy_statement(price, query, private_key),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn make_buy_statement_async(
+    token: String,
+    token_id: u64,
+    query: String,
+    private_key: String,
+) -> PyResult<String> {
+    let price = parse_price(token, token_id)?;
 
-    erc721_for_job::make_buy_statement(price, query, private_key)
+    runtime::spawn(metrics::timed(
+        "erc721.make_buy_statement",
+        erc721_for_job::make_buy_statement(price, query, private_key),
+    ))
         .await
         .map(|x| x.to_string())
         .map_err(PyErr::from)
 }
 
-#[tokio::main]
 #[pyfunction]
-async fn submit_and_collect(
+fn submit_and_collect(
+    py: Python<'_>,
     buy_attestation_uid: String,
     result_cid: String,
     private_key: String,
 ) -> PyResult<String> {
-    let buy_attestation_uid: FixedBytes<32> = buy_attestation_uid
-        .parse::<FixedBytes<32>>()
-        .map_err(|_| PyValueError::new_err("couldn't parse buy_attestation_uid as bytes32"))?;
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
 
-    erc721_for_job::submit_and_collect(buy_attestation_uid, result_cid, private_key)
-        .await
-        .map(|x| x.to_string())
-        .map_err(PyErr::from)
+    py.allow_threads(|| {
+        runtime::block_on(metrics::timed(
+            "erc721.submit_and_collect",
+            erc721_for_job::submit_and_collect(
+                buy_attestation_uid,
+                result_cid,
+                private_key,
+            ),
+        ))
+    })
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
+}
+
+#[pyfunction]
+async fn submit_and_collect_async(
+    buy_attestation_uid: String,
+    result_cid: String,
+    private_key: String,
+) -> PyResult<String> {
+    let buy_attestation_uid = parse_buy_attestation_uid(buy_attestation_uid)?;
+
+    runtime::spawn(metrics::timed(
+        "erc721.submit_and_collect",
+        erc721_for_job::submit_and_collect(
+            buy_attestation_uid,
+            result_cid,
+            private_key,
+        ),
+    ))
+    .await
+    .map(|x| x.to_string())
+    .map_err(PyErr::from)
 }
 
 pub fn add_erc721_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
@@ -51,7 +109,9 @@ pub fn add_erc721_submodule(py: Python, parent_module: &Bound<'_, PyModule>) ->
 
     erc721_module.add_function(wrap_pyfunction!(helloworld, &erc721_module)?)?;
     erc721_module.add_function(wrap_pyfunction!(make_buy_statement, &erc721_module)?)?;
+    erc721_module.add_function(wrap_pyfunction!(make_buy_statement_async, &erc721_module)?)?;
     erc721_module.add_function(wrap_pyfunction!(submit_and_collect, &erc721_module)?)?;
+    erc721_module.add_function(wrap_pyfunction!(submit_and_collect_async, &erc721_module)?)?;
 
     parent_module.add_submodule(&erc721_module)?;
     Ok(())
@@ -1,12 +1,14 @@
 use alloy::primitives::FixedBytes;
-use pyo3::exceptions::PyValueError;
+use pyo3::exceptions::{PyTimeoutError, PyValueError};
+use std::time::Duration;
 
 use pyo3::prelude::*;
 use crate::apiary::erc_for_job;
+use crate::metrics;
+use crate::runtime;
 
-#[tokio::main]
 #[pyfunction]
-async fn helloworld() -> PyResult<String> {
+fn helloworld() -> PyResult<String> {
     Ok("HelloWorld ERC".into())
 }
 
@@ -17,19 +19,85 @@ pub enum BuyStatement {
     Bundle(Vec<String>, Vec<u64>, Vec<String>, Vec<u64>, String, String),
 }
 
-#[tokio::main]
+fn parse_uid(uid: String, name: &str) -> PyResult<FixedBytes<32>> {
+    uid.parse::<FixedBytes<32>>()
+        .map_err(|_| PyValueError::new_err(format!("couldn't parse {} as bytes32", name)))
+}
+
+#[pyfunction]
+fn get_buy_statement(
+    py: Python<'_>,
+    statement_uid: String,
+) -> PyResult<BuyStatement> {
+    let statement_uid = parse_uid(statement_uid, "statement_uid")?;
+
+    let payment_result = py
+        .allow_threads(|| runtime::block_on(metrics::timed(
+            "erc.get_buy_statement",
+            erc_for_job::get_buy_statement(statement_uid),
+        )))
+        .map_err(PyErr::from)?;
+
+    to_buy_statement(payment_result)
+}
+
 #[pyfunction]
-async fn get_buy_statement(
+async fn get_buy_statement_async(
     statement_uid: String,
 ) -> PyResult<BuyStatement> {
-    let statement_uid: FixedBytes<32> = statement_uid
-        .parse::<FixedBytes<32>>()
-        .map_err(|_| PyValueError::new_err("couldn't parse statement_uid as bytes32"))?;
+    let statement_uid = parse_uid(statement_uid, "statement_uid")?;
 
-    let payment_result = erc_for_job::get_buy_statement(statement_uid)
+    let payment_result = runtime::spawn(metrics::timed(
+        "erc.get_buy_statement",
+        erc_for_job::get_buy_statement(statement_uid),
+    ))
         .await
         .map_err(PyErr::from)?;
 
+    to_buy_statement(payment_result)
+}
+
+#[pyfunction]
+fn get_buy_statements(
+    py: Python<'_>,
+    statement_uids: Vec<String>,
+) -> PyResult<Vec<BuyStatement>> {
+    let statement_uids = statement_uids
+        .into_iter()
+        .map(|uid| parse_uid(uid, "statement_uid"))
+        .collect::<PyResult<Vec<_>>>()?;
+
+    py.allow_threads(|| runtime::block_on(metrics::timed(
+        "erc.get_buy_statements",
+        erc_for_job::get_buy_statements(&statement_uids),
+    )))
+        .map_err(PyErr::from)?
+        .into_iter()
+        .map(to_buy_statement)
+        .collect()
+}
+
+#[pyfunction]
+async fn get_buy_statements_async(
+    statement_uids: Vec<String>,
+) -> PyResult<Vec<BuyStatement>> {
+    let statement_uids = statement_uids
+        .into_iter()
+        .map(|uid| parse_uid(uid, "statement_uid"))
+        .collect::<PyResult<Vec<_>>>()?;
+
+    runtime::spawn(metrics::timed(
+        "erc.get_buy_statements",
+        async move { erc_for_job::get_buy_statements(&statement_uids).await },
+    ))
+        .await
+        .map_err(PyErr::from)?
+        .into_iter()
+        .map(to_buy_statement)
+        .collect()
+}
+
+fn to_buy_statement(payment_result: erc_for_job::JobPayment) -> PyResult<BuyStatement> {
     match payment_result.price {
         erc_for_job::JobPrice::ERC20(price) => {
             let result = BuyStatement::ERC20(
@@ -86,23 +154,131 @@ async fn get_buy_statement(
     }
 }
 
-#[tokio::main]
 #[pyfunction]
-pub async fn get_sell_statement(
+pub fn get_sell_statement(
+    py: Python<'_>,
     sell_uid: String,
 ) -> PyResult<String> {
+    let sell_uid = parse_uid(sell_uid, "sell_uid")?;
 
-    let sell_uid = sell_uid
-    .parse::<FixedBytes<32>>()
-    .map_err(|_| PyValueError::new_err("couldn't parse sell_uid as bytes32"))?;
+    let result_cid = py
+        .allow_threads(|| runtime::block_on(metrics::timed(
+            "erc.get_sell_statement",
+            erc_for_job::get_sell_statement(sell_uid),
+        )))
+        .map_err(PyErr::from)?;
 
-    let result_cid = erc_for_job::get_sell_statement(sell_uid)
-    .await
-    .map_err(PyErr::from)?;
+    Ok(result_cid)
+}
+
+#[pyfunction]
+pub async fn get_sell_statement_async(
+    sell_uid: String,
+) -> PyResult<String> {
+    let sell_uid = parse_uid(sell_uid, "sell_uid")?;
+
+    let result_cid = runtime::spawn(metrics::timed(
+        "erc.get_sell_statement",
+        erc_for_job::get_sell_statement(sell_uid),
+    ))
+        .await
+        .map_err(PyErr::from)?;
 
     Ok(result_cid)
 }
 
+#[pyfunction]
+pub fn get_sell_statements(
+    py: Python<'_>,
+    sell_uids: Vec<String>,
+) -> PyResult<Vec<String>> {
+    let sell_uids = sell_uids
+        .into_iter()
+        .map(|uid| parse_uid(uid, "sell_uid"))
+        .collect::<PyResult<Vec<_>>>()?;
+
+    py.allow_threads(|| runtime::block_on(metrics::timed(
+        "erc.get_sell_statements",
+        erc_for_job::get_sell_statements(&sell_uids),
+    )))
+        .map_err(PyErr::from)
+}
+
+#[pyfunction]
+pub async fn get_sell_statements_async(
+    sell_uids: Vec<String>,
+) -> PyResult<Vec<String>> {
+    let sell_uids = sell_uids
+        .into_iter()
+        .map(|uid| parse_uid(uid, "sell_uid"))
+        .collect::<PyResult<Vec<_>>>()?;
+
+    runtime::spawn(metrics::timed(
+        "erc.get_sell_statements",
+        async move { erc_for_job::get_sell_statements(&sell_uids).await },
+    ))
+        .await
+        .map_err(PyErr::from)
+}
+
+async fn sell_statement_within(
+    timeout: f64,
+    statement_uid: FixedBytes<32>,
+    from_block: Option<u64>,
+) -> eyre::Result<Option<FixedBytes<32>>> {
+    let sell_uid = erc_for_job::wait_for_sell_statement(statement_uid, from_block);
+    match tokio::time::timeout(Duration::from_secs_f64(timeout), sell_uid).await {
+        Ok(sell_uid) => sell_uid.map(Some),
+        Err(_) => Ok(None),
+    }
+}
+
+fn to_sell_uid(sell_uid: Option<FixedBytes<32>>, timeout: f64) -> PyResult<String> {
+    sell_uid
+        .map(|uid| uid.to_string())
+        .ok_or_else(|| PyTimeoutError::new_err(format!("no sell statement after {}s", timeout)))
+}
+
+/// Wait for the sell statement of a buy statement, watching the chain, and return its uid.
+#[pyfunction]
+#[pyo3(signature = (statement_uid, timeout, from_block=None))]
+fn wait_for_sell_statement(
+    py: Python<'_>,
+    statement_uid: String,
+    timeout: f64,
+    from_block: Option<u64>,
+) -> PyResult<String> {
+    let statement_uid = parse_uid(statement_uid, "statement_uid")?;
+
+    let sell_uid = py
+        .allow_threads(|| runtime::block_on(metrics::timed(
+            "erc.wait_for_sell_statement",
+            sell_statement_within(timeout, statement_uid, from_block),
+        )))
+        .map_err(PyErr::from)?;
+
+    to_sell_uid(sell_uid, timeout)
+}
+
+#[pyfunction]
+#[pyo3(signature = (statement_uid, timeout, from_block=None))]
+async fn wait_for_sell_statement_async(
+    statement_uid: String,
+    timeout: f64,
+    from_block: Option<u64>,
+) -> PyResult<String> {
+    let statement_uid = parse_uid(statement_uid, "statement_uid")?;
+
+    let sell_uid = runtime::spawn(metrics::timed(
+        "erc.wait_for_sell_statement",
+        sell_statement_within(timeout, statement_uid, from_block),
+    ))
+        .await
+        .map_err(PyErr::from)?;
+
+    to_sell_uid(sell_uid, timeout)
+}
+
 pub fn add_erc_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
     let erc_module = PyModule::new_bound(py, "erc")?;
 
@@ -110,7 +286,15 @@ pub fn add_erc_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyR
 
     erc_module.add_class::<BuyStatement>()?;
     erc_module.add_function(wrap_pyfunction!(get_buy_statement, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_buy_statement_async, &erc_module)?)?;
     erc_module.add_function(wrap_pyfunction!(get_sell_statement, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_sell_statement_async, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_buy_statements, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_buy_statements_async, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_sell_statements, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(get_sell_statements_async, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(wait_for_sell_statement, &erc_module)?)?;
+    erc_module.add_function(wrap_pyfunction!(wait_for_sell_statement_async, &erc_module)?)?;
 
     parent_module.add_submodule(&erc_module)?;
     Ok(())
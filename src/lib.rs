@@ -3,12 +3,17 @@ use pyo3::prelude::*;
 pub mod contracts;
 pub mod erc20_for_job;
 pub mod erc721_for_job;
+pub mod erc20_for_redis;
 pub mod bundle_for_job;
 pub mod erc_for_job;
+pub mod chain_watcher;
+pub mod metrics;
 
 pub mod provider;
+pub mod runtime;
 pub mod apiary;
 pub mod shared;
+pub mod tx_queue;
 
 /// A Python module implemented in Rust.
 #[pymodule]
@@ -17,6 +22,8 @@ fn apiars(py: Python, m: &Bound<'_, PyModule>) -> PyResult<()> {
     erc20_for_job::add_erc20_submodule(py, m)?;
     erc721_for_job::add_erc721_submodule(py, m)?;
     bundle_for_job::add_bundle_submodule(py, m)?;
+    erc20_for_redis::add_redis_submodule(py, m)?;
+    metrics::add_metrics_submodule(py, m)?;
     
     Ok(())
 }
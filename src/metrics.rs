@@ -0,0 +1,48 @@
+use std::{collections::VecDeque, future::Future, sync::Mutex, time::Instant};
+
+use pyo3::prelude::*;
+
+/// Timings kept until drained, the oldest are dropped beyond this bound.
+const MAX_TIMINGS: usize = 10_000;
+
+/// (call, seconds, ok) of the calls made since the last drain.
+static TIMINGS: Mutex<VecDeque<(&'static str, f64, bool)>> = Mutex::new(VecDeque::new());
+
+pub fn record(call: &'static str, seconds: f64, ok: bool) {
+    let mut timings = TIMINGS.lock().unwrap();
+    if timings.len() == MAX_TIMINGS {
+        timings.pop_front();
+    }
+    timings.push_back((call, seconds, ok));
+}
+
+/// Time a fallible future, recording its duration and whether it succeeded.
+pub async fn timed<T, E, F>(call: &'static str, future: F) -> Result<T, E>
+where
+    F: Future<Output = Result<T, E>>,
+{
+    let start = Instant::now();
+    let result = future.await;
+    record(call, start.elapsed().as_secs_f64(), result.is_ok());
+    result
+}
+
+/// Timings of the calls made since the last drain, as (call, seconds, ok).
+#[pyfunction]
+fn drain_timings() -> Vec<(String, f64, bool)> {
+    TIMINGS
+        .lock()
+        .unwrap()
+        .drain(..)
+        .map(|(call, seconds, ok)| (call.to_string(), seconds, ok))
+        .collect()
+}
+
+pub fn add_metrics_submodule(py: Python, parent_module: &Bound<'_, PyModule>) -> PyResult<()> {
+    let metrics_module = PyModule::new_bound(py, "metrics")?;
+
+    metrics_module.add_function(wrap_pyfunction!(drain_timings, &metrics_module)?)?;
+
+    parent_module.add_submodule(&metrics_module)?;
+    Ok(())
+}
@@ -11,11 +11,15 @@ use alloy::{
     transports::http::{Client, Http},
 };
 use alloy_provider::Identity;
-use std::env;
+use std::{
+    collections::HashMap,
+    env,
+    sync::{Mutex, OnceLock},
+};
 
-use crate::shared::py_val_err;
+use crate::shared::{py_run_err, py_val_err};
 
-type WalletProvider = FillProvider<
+pub type WalletProvider = FillProvider<
     JoinFill<
         JoinFill<
             Identity,
@@ -28,14 +32,27 @@ type WalletProvider = FillProvider<
     Ethereum,
 >;
 
-pub fn get_wallet_provider(private_key: String) -> Result<WalletProvider, pyo3::PyErr> {
+// Providers are cached per (RPC_URL, private_key) so that signers are parsed once
+// and HTTP connections are kept alive across calls.
+static WALLET_PROVIDERS: OnceLock<Mutex<HashMap<(String, String), WalletProvider>>> =
+    OnceLock::new();
+static PUBLIC_PROVIDERS: OnceLock<Mutex<HashMap<String, RootProvider<Http<Client>>>>> =
+    OnceLock::new();
+
+fn get_rpc_url() -> Result<String, pyo3::PyErr> {
+    env::var("RPC_URL").map_err(|_| py_val_err("RPC_URL not set"))
+}
+
+fn build_wallet_provider(
+    rpc_url: &str,
+    private_key: &str,
+) -> Result<WalletProvider, pyo3::PyErr> {
     let signer: PrivateKeySigner = private_key
         .parse()
         .map_err(|_| py_val_err("couldn't parse private_key as PrivateKeySigner"))?;
 
     let wallet = EthereumWallet::from(signer);
-    let rpc_url = env::var("RPC_URL")
-        .map_err(|_| py_val_err("RPC_URL not set"))?
+    let rpc_url = rpc_url
         .parse()
         .map_err(|_| py_val_err("couldn't parse RPC_URL as a url"))?;
 
@@ -47,14 +64,42 @@ pub fn get_wallet_provider(private_key: String) -> Result<WalletProvider, pyo3::
     Ok(provider)
 }
 
+pub fn get_wallet_provider(private_key: String) -> Result<WalletProvider, pyo3::PyErr> {
+    let key = (get_rpc_url()?, private_key);
+    let providers = WALLET_PROVIDERS.get_or_init(Default::default);
+
+    let mut providers = providers
+        .lock()
+        .map_err(|_| py_run_err("wallet providers pool poisoned"))?;
+
+    if let Some(provider) = providers.get(&key) {
+        return Ok(provider.clone());
+    }
+
+    let provider = build_wallet_provider(&key.0, &key.1)?;
+    providers.insert(key, provider.clone());
+
+    Ok(provider)
+}
+
 pub fn get_public_provider() -> Result<RootProvider<Http<Client>>, pyo3::PyErr> {
-    let rpc_url = env::var("RPC_URL")
-        .map_err(|_| py_val_err("RPC_URL not set"))?
-        .parse()
-        .map_err(|_| py_val_err("couldn't parse RPC_URL as a url"))?;
+    let rpc_url = get_rpc_url()?;
+    let providers = PUBLIC_PROVIDERS.get_or_init(Default::default);
 
-    let provider = ProviderBuilder::new()
-        .on_http(rpc_url);
+    let mut providers = providers
+        .lock()
+        .map_err(|_| py_run_err("public providers pool poisoned"))?;
+
+    if let Some(provider) = providers.get(&rpc_url) {
+        return Ok(provider.clone());
+    }
+
+    let provider = ProviderBuilder::new().on_http(
+        rpc_url
+            .parse()
+            .map_err(|_| py_val_err("couldn't parse RPC_URL as a url"))?,
+    );
+    providers.insert(rpc_url, provider.clone());
 
     Ok(provider)
 }
@@ -0,0 +1,30 @@
+use std::{future::Future, sync::OnceLock};
+
+use tokio::runtime::Runtime;
+
+static RUNTIME: OnceLock<Runtime> = OnceLock::new();
+
+/// Process-wide Tokio runtime, shared by every binding so that pooled
+/// providers (and their keep-alive connections) outlive a single call.
+pub fn get_runtime() -> &'static Runtime {
+    RUNTIME.get_or_init(|| {
+        tokio::runtime::Builder::new_multi_thread()
+            .enable_all()
+            .build()
+            .expect("couldn't build tokio runtime")
+    })
+}
+
+pub fn block_on<F: Future>(future: F) -> F::Output {
+    get_runtime().block_on(future)
+}
+
+/// Run a future on the shared runtime from a foreign executor (e.g. a Python
+/// coroutine driven by asyncio), which only needs to poll the join handle.
+pub async fn spawn<T, F>(future: F) -> eyre::Result<T>
+where
+    T: Send + 'static,
+    F: Future<Output = eyre::Result<T>> + Send + 'static,
+{
+    get_runtime().spawn(future).await?
+}
@@ -1,4 +1,6 @@
 use alloy::primitives::{Address, U256};
+use std::{env, str::FromStr};
+
 use pyo3::{
     exceptions::{PyRuntimeError, PyValueError},
     prelude::*,
@@ -27,3 +29,11 @@ pub fn py_val_err(msg: impl Into<String>) -> PyErr {
 pub fn py_run_err(msg: impl Into<String>) -> PyErr {
     PyErr::new::<PyRuntimeError, _>(msg.into())
 }
+
+/// Value of an optional environment variable, default if unset or unparsable.
+pub fn env_or<T: FromStr>(key: &str, default: T) -> T {
+    env::var(key)
+        .ok()
+        .and_then(|value| value.parse().ok())
+        .unwrap_or(default)
+}
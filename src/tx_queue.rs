@@ -0,0 +1,211 @@
+use alloy::{
+    network::TransactionBuilder,
+    primitives::{Address, TxHash},
+    providers::{Provider, WalletProvider as _},
+    rpc::types::{TransactionReceipt, TransactionRequest},
+};
+use std::{
+    collections::HashMap,
+    sync::{Arc, Mutex, OnceLock},
+    time::{Duration, Instant},
+};
+use tokio::{
+    sync::{mpsc, Mutex as AsyncMutex},
+    task::JoinSet,
+};
+
+use crate::chain_watcher;
+use crate::metrics;
+use crate::provider::WalletProvider;
+use crate::shared::env_or;
+
+/// Next nonce of each signer, None until synchronized with the node.
+///
+/// Nonces are handed out locally, so that concurrent deals settled from the same key
+/// don't race for the nonce reported by the node. After a failed broadcast, the next
+/// nonce is synchronized again, as the failure may come from a transaction sent by
+/// another process.
+static NONCES: OnceLock<Mutex<HashMap<Address, Arc<AsyncMutex<Option<u64>>>>>> =
+    OnceLock::new();
+
+fn nonce_slot(address: Address) -> Arc<AsyncMutex<Option<u64>>> {
+    NONCES
+        .get_or_init(Default::default)
+        .lock()
+        .unwrap()
+        .entry(address)
+        .or_default()
+        .clone()
+}
+
+fn is_nonce_error(error: &impl ToString) -> bool {
+    let message = error.to_string().to_lowercase();
+    message.contains("nonce too low")
+        || message.contains("already known")
+        || message.contains("replacement transaction underpriced")
+}
+
+/// A broadcast transaction, with the hashes of its broadcasts (replacements have new fees).
+pub struct PendingTx {
+    request: TransactionRequest,
+    hashes: Vec<TxHash>,
+    rebroadcasts: usize,
+}
+
+impl PendingTx {
+    pub fn tx_hash(&self) -> TxHash {
+        self.hashes[0]
+    }
+}
+
+/// Broadcast a transaction with the next nonce of its signer.
+///
+/// Gas and fees are estimated before taking the nonce, so that the nonce of a signer is
+/// only held for the broadcast itself.
+pub async fn send(
+    provider: &WalletProvider,
+    mut request: TransactionRequest,
+) -> eyre::Result<PendingTx> {
+    let from = provider.default_signer_address();
+    request.set_from(from);
+
+    if request.max_fee_per_gas.is_none() {
+        let fees = provider.estimate_eip1559_fees(None).await?;
+        request.set_max_fee_per_gas(fees.max_fee_per_gas);
+        request.set_max_priority_fee_per_gas(fees.max_priority_fee_per_gas);
+    }
+    if request.gas.is_none() {
+        let gas = provider.estimate_gas(&request).await?;
+        request.set_gas_limit(gas * 6 / 5);
+    }
+
+    let slot = nonce_slot(from);
+    let mut next_nonce = slot.lock().await;
+
+    // A nonce error means the local nonce is behind: synchronize and retry once.
+    for attempt in 0..2 {
+        let nonce = match *next_nonce {
+            Some(nonce) => nonce,
+            None => provider.get_transaction_count(from).pending().await?,
+        };
+        request.set_nonce(nonce);
+
+        match provider.send_transaction(request.clone()).await {
+            Ok(pending) => {
+                *next_nonce = Some(nonce + 1);
+                return Ok(PendingTx {
+                    request,
+                    hashes: vec![*pending.tx_hash()],
+                    rebroadcasts: 0,
+                });
+            }
+            Err(error) => {
+                *next_nonce = None;
+                if attempt == 1 || !is_nonce_error(&error) {
+                    return Err(error.into());
+                }
+            }
+        }
+    }
+    unreachable!()
+}
+
+/// Replace a stuck transaction with the same nonce and higher fees, returning its hash.
+async fn rebroadcast(
+    provider: &WalletProvider,
+    pending: &mut PendingTx,
+) -> eyre::Result<Option<TxHash>> {
+    // Nodes require replacements to raise fees by at least 10%.
+    let bump = |fee: u128| fee + fee / 4;
+    pending.request.max_fee_per_gas = pending.request.max_fee_per_gas.map(bump);
+    pending.request.max_priority_fee_per_gas = pending.request.max_priority_fee_per_gas.map(bump);
+    pending.rebroadcasts += 1;
+
+    match provider.send_transaction(pending.request.clone()).await {
+        Ok(replacement) => {
+            pending.hashes.push(*replacement.tx_hash());
+            Ok(Some(*replacement.tx_hash()))
+        }
+        // A previous broadcast was mined meanwhile: its receipt is picked up by confirm.
+        Err(error) if is_nonce_error(&error) => Ok(None),
+        Err(error) => Err(error.into()),
+    }
+}
+
+/// Wait for the receipt of a transaction, rebroadcasting it if it is stuck.
+///
+/// Receipts are watched by the chain watcher, along with the ones of every other pending
+/// transaction. A transaction is stuck if none of its broadcasts is mined after
+/// TX_QUEUE.STUCK_AFTER seconds (60 by default). It is replaced at most
+/// TX_QUEUE.MAX_REBROADCASTS times (3 by default).
+pub async fn confirm(
+    provider: &WalletProvider,
+    mut pending: PendingTx,
+) -> eyre::Result<TransactionReceipt> {
+    let stuck_after = Duration::from_secs_f64(env_or("TX_QUEUE.STUCK_AFTER", 60.0));
+    let max_rebroadcasts: usize = env_or("TX_QUEUE.MAX_REBROADCASTS", 3);
+
+    let start = Instant::now();
+    // Any broadcast of the nonce may be the one mined: all of them report to one channel.
+    let (sender, mut receipts) = mpsc::unbounded_channel();
+    for hash in &pending.hashes {
+        chain_watcher::watch_receipt(*hash, sender.clone());
+    }
+
+    loop {
+        match tokio::time::timeout(stuck_after, receipts.recv()).await {
+            Ok(Some(receipt)) => {
+                metrics::record("tx.confirm", start.elapsed().as_secs_f64(), receipt.status());
+                return Ok(receipt);
+            }
+            Ok(None) => unreachable!("confirm holds a receipt sender"),
+            Err(_) => {
+                if pending.rebroadcasts == max_rebroadcasts {
+                    metrics::record("tx.confirm", start.elapsed().as_secs_f64(), false);
+                    return Err(eyre::eyre!(
+                        "transaction {} not mined after {} rebroadcasts",
+                        pending.tx_hash(),
+                        max_rebroadcasts
+                    ));
+                }
+                if let Some(hash) = rebroadcast(provider, &mut pending).await? {
+                    chain_watcher::watch_receipt(hash, sender.clone());
+                }
+            }
+        }
+    }
+}
+
+/// Wait for the receipts of many transactions at once, in their order.
+pub async fn confirm_all(
+    provider: &WalletProvider,
+    pending: Vec<PendingTx>,
+) -> Vec<eyre::Result<TransactionReceipt>> {
+    let mut receipts: Vec<Option<eyre::Result<TransactionReceipt>>> =
+        pending.iter().map(|_| None).collect();
+
+    let mut confirmations = JoinSet::new();
+    for (i, pending) in pending.into_iter().enumerate() {
+        let provider = provider.clone();
+        confirmations.spawn(async move { (i, confirm(&provider, pending).await) });
+    }
+    while let Some(confirmation) = confirmations.join_next().await {
+        if let Ok((i, receipt)) = confirmation {
+            receipts[i] = Some(receipt);
+        }
+    }
+
+    receipts
+        .into_iter()
+        .map(|receipt| receipt.unwrap_or_else(|| Err(eyre::eyre!("confirmation task failed"))))
+        .collect()
+}
+
+/// Broadcast a transaction and wait for its receipt.
+pub async fn submit(
+    provider: &WalletProvider,
+    request: TransactionRequest,
+) -> eyre::Result<TransactionReceipt> {
+    let pending = send(provider, request).await?;
+    confirm(provider, pending).await
+}
@@ -0,0 +1,11 @@
+"""Shared fixtures of the tests."""
+
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def config_dir() -> Path:
+    """Directory of the agent configurations, whatever the working directory."""
+    return Path(__file__).parent.parent / "config"
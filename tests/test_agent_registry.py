@@ -0,0 +1,21 @@
+from apiary import agent_registry, seller
+
+
+def test_get_cached_agent(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LIGHTHOUSE_TOKEN", "token")
+    monkeypatch.setenv("AGENT_NAME", "seller_naive")
+    monkeypatch.setenv("CONFIG_PATH", "config/seller_naive.json")
+    agent_registry.clear_agents_cache()
+
+    agent, _ = agent_registry.get_cached_agent()
+    assert isinstance(agent, seller.Naive)
+    assert agent_registry.get_cached_agent()[0] is agent
+
+    monkeypatch.setenv("CONFIG_PATH", "config/other_seller_naive.json")
+    assert agent_registry.get_cached_agent()[0] is not agent
+
+    agent_registry.clear_agents_cache()
+    monkeypatch.setenv("CONFIG_PATH", "config/seller_naive.json")
+    assert agent_registry.get_cached_agent()[0] is not agent
+    agent_registry.clear_agents_cache()
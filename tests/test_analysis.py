@@ -0,0 +1,58 @@
+import math
+
+import pytest
+
+from apiary import analysis, negotiation_log
+
+pytest.importorskip("pyarrow")
+
+
+def test_negotiations_and_strategies(tmp_path):
+    log = negotiation_log.NegotiationLog(tmp_path, rotate_rows=2)
+
+    def record(offer_id, round, role, kind, amount, timestamp):
+        agent = f"{role}_kalman" if offer_id == "a" else f"{role}_naive"
+        log.record(
+            offer_id=offer_id,
+            round=round,
+            role=role,
+            agent=agent,
+            kind=kind,
+            amount=amount,
+            timestamp=timestamp,
+        )
+
+    # Buyer opens at 100, seller at 300, they agree at 250 after two seller rounds.
+    record("a", 1, "seller", "offer", 100, 0.0)
+    record("a", 1, "seller", "counteroffer", 300, 0.1)
+    record("a", 1, "buyer", "offer", 300, 0.2)
+    record("a", 1, "buyer", "counteroffer", 250, 0.3)
+    record("a", 2, "seller", "offer", 250, 0.4)
+    record("a", 2, "seller", "accept", 250, 0.5)
+    # Never agreed.
+    record("b", 1, "seller", "offer", 100, 1.0)
+    record("b", 1, "seller", "counteroffer", 200, 1.1)
+    log.close()
+
+    # Small batches, reduced across partitions.
+    negotiations = analysis.negotiations(tmp_path, batch_size=3)
+    assert list(negotiations["offer_id"]) == ["a", "b"]
+    assert list(negotiations["accepted"]) == [True, False]
+    assert negotiations["rounds"][0] == 2
+    assert negotiations["agreed_amount"][0] == 250
+    assert math.isclose(negotiations["time_to_agreement"][0], 0.5)
+    assert math.isclose(negotiations["seller_share"][0], 0.75)
+    assert negotiations["buyer_agent"][1] is None
+
+    summary = {
+        (row["agent"], row["role"]): row for row in analysis.strategies(negotiations)
+    }
+    assert set(summary) == {
+        ("buyer_kalman", "buyer"),
+        ("seller_kalman", "seller"),
+        ("seller_naive", "seller"),
+    }
+    assert summary[("seller_kalman", "seller")]["acceptance_rate"] == 1.0
+    assert math.isclose(summary[("buyer_kalman", "buyer")]["surplus_share"], 0.25)
+    assert summary[("seller_naive", "seller")]["acceptance_rate"] == 0.0
+    assert math.isnan(summary[("seller_naive", "seller")]["convergence_rounds"])
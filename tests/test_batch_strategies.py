@@ -0,0 +1,57 @@
+import numpy as np
+import readwrite as rw
+
+from apiary import batch_strategies, simulator
+
+PAIRS = [
+    ("buyer_naive", "seller_naive"),
+    ("buyer_kalman", "seller_kalman"),
+    ("buyer_poly_time", "seller_poly_time"),
+    ("buyer_exp_time", "seller_exp_time"),
+    ("buyer_kalman", "seller_exp_time"),
+]
+
+
+def test_batch_negotiations_match_simulator(monkeypatch, tmp_path, config_dir):
+    monkeypatch.chdir(tmp_path)
+    tokens = [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}]
+
+    for buyer_name, seller_name in PAIRS:
+        buyer_config = rw.read(str(config_dir / f"{buyer_name}.json"))
+        seller_config = rw.read(str(config_dir / f"{seller_name}.json"))
+
+        expected = simulator.negotiate(
+            simulator.SimulatedAgent(buyer_name, buyer_config, "buyer"),
+            simulator.SimulatedAgent(seller_name, seller_config, "seller"),
+            tokens,
+        )
+
+        result = batch_strategies.negotiate(
+            batch_strategies.build(buyer_name, buyer_config, 3),
+            batch_strategies.build(seller_name, seller_config, 3),
+            100,
+        )
+        assert list(result["outcome"]) == [expected["outcome"]] * 3
+        assert list(result["rounds"]) == [expected["rounds"]] * 3
+        if expected["tokens"] is not None:
+            assert np.allclose(result["agreed"], expected["tokens"][0]["amt"])
+
+
+def test_tit_for_tat_batch():
+    n = 4
+    engine = batch_strategies.TitForTatBatch(
+        n, is_buyer=False, imitation_type="relative", delta=2, x_min=50, x_max=500
+    )
+
+    x_out, accepted = engine.step(np.full(n, 100.0))
+    assert np.all(x_out == 500) and not accepted.any()
+
+    # Halving offers are imitated.
+    engine.step(np.full(n, 200.0))
+    x_out, accepted = engine.step(np.full(n, 400.0), active=np.arange(n) < 2)
+    assert np.allclose(engine.x_out[:2], 125)
+    # Beneficial incoming offers are accepted as they are.
+    assert list(accepted) == [True, True, False, False]
+    assert np.allclose(x_out[:2], 400)
+    assert np.isnan(x_out[2:]).all()
+    assert list(engine.lengths) == [3, 3, 2, 2]
@@ -1,3 +1,7 @@
+import asyncio
+
+import pytest
+
 from apiary import apiars
 
 
@@ -10,3 +14,16 @@ def test_binding():
     assert res == "HelloWorld ERC721"
     res = apiars.bundle.helloworld()
     assert res == "HelloWorld Bundle"
+    res = apiars.redis.helloworld()
+    assert res == "HelloWorld Redis"
+
+
+def test_invalid_uid():
+    with pytest.raises(ValueError):
+        apiars.erc.get_sell_statement("not-a-uid")
+    with pytest.raises(ValueError):
+        asyncio.run(apiars.erc.get_sell_statement_async("not-a-uid"))
+    with pytest.raises(ValueError):
+        apiars.erc.get_buy_statements(["0x" + "00" * 32, "not-a-uid"])
+    with pytest.raises(ValueError):
+        apiars.erc.wait_for_sell_statement("not-a-uid", 1.0)
@@ -0,0 +1,81 @@
+import subprocess
+
+from apiary.image_cache import ImageCache
+
+
+class FakePodman:
+    def __init__(self):
+        self.images = set()
+        self.builds = 0
+
+    def __call__(self, command, **kwargs):
+        args = command.split()
+        tag = args[-1]
+        returncode, stdout = 0, ""
+        match args[1:3]:
+            case ["build", "-t"]:
+                self.builds += 1
+                self.images.add(args[3])
+            case ["image", "exists"]:
+                returncode = 0 if tag in self.images else 1
+            case ["image", "inspect"]:
+                stdout = "100\n"
+            case ["rmi", _]:
+                self.images.discard(tag)
+        return subprocess.CompletedProcess(args, returncode, stdout, "")
+
+
+def get_or_build(cache, dockerfile, build_dir):
+    tag = cache.acquire(dockerfile, build_dir)
+    cache.release(tag)
+    return tag
+
+
+def test_image_cache(tmp_path):
+    podman = FakePodman()
+    index_path = str(tmp_path / "image_cache.json")
+    cache = ImageCache(index_path, max_images=2, run=podman)
+
+    tag = get_or_build(cache, "FROM alpine", str(tmp_path / "job-1"))
+    assert get_or_build(cache, "FROM alpine", str(tmp_path / "job-2")) == tag
+    assert (podman.builds, cache.hits, cache.misses) == (1, 1, 1)
+
+    get_or_build(cache, "FROM ubuntu", str(tmp_path / "job-3"))
+    get_or_build(cache, "FROM alpine", str(tmp_path / "job-4"))
+    get_or_build(cache, "FROM debian", str(tmp_path / "job-5"))
+
+    # FROM ubuntu was the least recently used image.
+    assert cache.evictions == 1
+    assert len(podman.images) == 2 and tag in podman.images
+
+    # The index survives restarts.
+    cache = ImageCache(index_path, max_images=2, run=podman)
+    get_or_build(cache, "FROM alpine", str(tmp_path / "job-6"))
+    assert (podman.builds, cache.hits) == (3, 1)
+
+
+def test_image_cache_max_bytes(tmp_path):
+    podman = FakePodman()
+    cache = ImageCache(
+        str(tmp_path / "image_cache.json"), max_images=10, max_bytes=250, run=podman
+    )
+    for i in range(4):
+        get_or_build(cache, f"FROM alpine:{i}", str(tmp_path / f"job-{i}"))
+
+    assert cache.evictions == 2
+    assert len(podman.images) == 2
+
+
+def test_image_cache_keeps_images_in_use(tmp_path):
+    podman = FakePodman()
+    cache = ImageCache(str(tmp_path / "image_cache.json"), max_images=1, run=podman)
+
+    running = cache.acquire("FROM alpine", str(tmp_path / "job-1"))
+    get_or_build(cache, "FROM ubuntu", str(tmp_path / "job-2"))
+    assert running in podman.images and cache.evictions == 0
+
+    # Evicted once released, with its lock.
+    cache.release(running)
+    get_or_build(cache, "FROM debian", str(tmp_path / "job-3"))
+    assert running not in podman.images and len(podman.images) == 1
+    assert len(cache._key_locks) == 1
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+import pytest
+
+# Dependencies of the analysis, plotting and storage code paths, not of startup.
+LAZY_MODULES = ("matplotlib", "pandas", "pyarrow", "lighthouseweb3", "eth_account")
+
+
+def import_times(statement: str) -> dict[str, float]:
+    """Cumulative import times (seconds) of the modules imported by statement, in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_cli_imports():
+    times = import_times("import apiary.cli")
+
+    assert not [name for name in times if name.split(".")[0] in LAZY_MODULES]
+    # No agent, inference endpoint or logging dependencies before a command runs.
+    assert "apiary.base_agent" not in times
+    assert "fastapi" not in times
+    assert "colorlog" not in times
+
+
+def test_inference_imports():
+    if subprocess.run([sys.executable, "-c", "import apiary.apiars"]).returncode:
+        pytest.skip("apiary.apiars is not built.")
+
+    times = import_times("import apiary.inference")
+
+    assert not [name for name in times if name.split(".")[0] in LAZY_MODULES]
+    assert "apiary.inference" in times
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import pytest
+from apiary.job_scheduler import JobScheduler
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_job_scheduler(tmp_path):
+    queue_path = str(tmp_path / "job_queue.db")
+    release = threading.Event()
+    completed = []
+    running = []
+    max_running = []
+
+    def run_job(payload):
+        with scheduler.limit("run"):
+            running.append(payload["id"])
+            max_running.append(len(running))
+            release.wait()
+            time.sleep(0.01)
+            running.remove(payload["id"])
+        return {"result": payload["id"] * 2}
+
+    scheduler = JobScheduler(
+        run_job,
+        lambda payload, result, checkpoint: completed.append(result["result"]),
+        workers=4,
+        queue_path=queue_path,
+        resource_limits={"run": 2},
+    )
+    scheduler.start()
+    for i in range(6):
+        scheduler.submit(f"job-{i}", {"id": i})
+    scheduler.submit("job-0", {"id": 0})
+
+    # Submission does not wait for the jobs.
+    assert completed == []
+
+    release.set()
+    wait_for(lambda: len(completed) == 6)
+    scheduler.stop()
+
+    assert sorted(completed) == [0, 2, 4, 6, 8, 10]
+    assert max(max_running) <= 2
+
+
+def test_job_scheduler_resumes_pending_jobs(tmp_path):
+    queue_path = str(tmp_path / "job_queue.db")
+    completed = []
+
+    scheduler = JobScheduler(
+        lambda payload: payload, lambda *_: None, workers=1, queue_path=queue_path
+    )
+    scheduler.queue.put("job-0", {"id": 0})
+    scheduler.queue.close()
+
+    scheduler = JobScheduler(
+        lambda payload: payload,
+        lambda payload, *_: completed.append(payload["id"]),
+        workers=1,
+        queue_path=queue_path,
+    )
+    scheduler.start()
+    wait_for(lambda: completed)
+    scheduler.stop()
+
+    assert completed == [0]
+    assert (
+        JobScheduler(
+            lambda payload: payload, lambda *_: None, workers=1, queue_path=queue_path
+        ).queue.pending()
+        == []
+    )
+
+
+def test_job_scheduler_prunes_completed_jobs(monkeypatch, tmp_path):
+    scheduler = JobScheduler(
+        lambda payload: payload,
+        lambda *_: None,
+        workers=1,
+        queue_path=str(tmp_path / "job_queue.db"),
+        retention=60,
+    )
+    scheduler.queue.put("job-0", {"id": 0})
+    scheduler.queue.set_status("job-0", "done")
+    scheduler.queue.put("job-1", {"id": 1})
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    scheduler.start()
+    wait_for(lambda: not scheduler.queue.pending())
+    scheduler.stop()
+
+    # Pruned, job-0 could be submitted again, while job-1 (completed after start) is kept.
+    scheduler = JobScheduler(
+        lambda payload: payload,
+        lambda *_: None,
+        workers=1,
+        queue_path=str(tmp_path / "job_queue.db"),
+    )
+    assert scheduler.queue.put("job-0", {"id": 0})
+    assert not scheduler.queue.put("job-1", {"id": 1})
+
+    with pytest.raises(RuntimeError, match="not running"):
+        scheduler.submit("job-2", {"id": 2})
+
+
+def test_job_scheduler_retries_failed_jobs(tmp_path):
+    queue_path = str(tmp_path / "job_queue.db")
+    runs = []
+    submissions = []
+    published = []
+
+    def run_job(payload):
+        runs.append(payload["id"])
+        if len(runs) == 1:
+            raise OSError("podman failed")
+        return {"result": payload["id"]}
+
+    def on_complete(payload, result, checkpoint):
+        if "sell_uid" not in result:
+            submissions.append(payload["id"])
+            result["sell_uid"] = f"sell-{payload['id']}"
+            checkpoint(result)
+        if len(published) < 1:
+            published.append(None)
+            raise ConnectionError("redis down")
+        published.append(result["sell_uid"])
+
+    scheduler = JobScheduler(
+        run_job, on_complete, workers=1, queue_path=queue_path, backoff=0.01
+    )
+    scheduler.start()
+    scheduler.submit("job-0", {"id": 0})
+    wait_for(lambda: len(published) == 2)
+    scheduler.stop()
+
+    # The failed run is retried, then the failed completion without running or collecting again.
+    assert runs == [0, 0]
+    assert submissions == [0]
+    assert published == [None, "sell-0"]
+
+    # Jobs failing at every attempt fail, and run again if submitted again.
+    scheduler = JobScheduler(
+        lambda payload: payload["missing"],
+        lambda *_: None,
+        workers=1,
+        queue_path=queue_path,
+        max_attempts=2,
+        backoff=0.01,
+    )
+    scheduler.start()
+    scheduler.submit("job-1", {"id": 1})
+    wait_for(lambda: not scheduler.queue.pending())
+    assert scheduler.queue.result("job-1") is None
+    assert scheduler.queue.put("job-1", {"id": 1})
+    assert not scheduler.queue.put("job-0", {"id": 0})
+    scheduler.stop()
+
+
+def test_job_scheduler_resumes_completion(tmp_path):
+    queue_path = str(tmp_path / "job_queue.db")
+    scheduler = JobScheduler(
+        lambda payload: payload, lambda *_: None, workers=1, queue_path=queue_path
+    )
+    scheduler.queue.put("job-0", {"id": 0})
+    # Interrupted once the payment was collected.
+    scheduler.queue.set_result("job-0", {"result": 0, "sell_uid": "sell-0"})
+    scheduler.queue.close()
+
+    published = []
+    scheduler = JobScheduler(
+        lambda payload: pytest.fail("ran again"),
+        lambda payload, result, checkpoint: published.append(result["sell_uid"]),
+        workers=1,
+        queue_path=queue_path,
+    )
+    scheduler.start()
+    wait_for(lambda: published)
+    scheduler.stop()
+    assert published == ["sell-0"]
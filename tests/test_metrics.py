@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+from apiary import metrics, simulator
+
+
+def test_histogram_summary():
+    histogram = metrics.Histogram("test_seconds", "Test.", buckets=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value, stage="build")
+
+    samples = [
+        (name, dict(labels), value) for name, labels, value in histogram.samples()
+    ]
+    assert ("test_seconds_bucket", {"stage": "build", "le": "2"}, 3) in samples
+    assert ("test_seconds_bucket", {"stage": "build", "le": "+Inf"}, 4) in samples
+
+    [row] = metrics.summarize(samples, "test_seconds", "stage")
+    assert row["count"] == 4
+    assert row["mean"] == pytest.approx(1.625)
+    assert 1 < row["p50"] <= 2
+    assert 2 < row["p95"] <= 4
+
+
+def test_timer_and_render():
+    with pytest.raises(ValueError):
+        with metrics.timer("test_stage"):
+            raise ValueError
+
+    samples = metrics.parse(metrics.render())
+    assert ("apiary_stage_errors_total", {"stage": "test_stage"}, 1.0) in samples
+    [row] = [
+        row
+        for row in metrics.summarize(samples, "apiary_stage_seconds", "stage")
+        if row["stage"] == "test_stage"
+    ]
+    assert row["count"] == 1
+    assert not math.isnan(row["p95"])
+
+
+def test_negotiation_metrics(monkeypatch, tmp_path, config_dir):
+    monkeypatch.chdir(tmp_path)
+    buyer = simulator.SimulatedAgent(
+        "buyer_naive", f"{config_dir}/buyer_naive.json", "buyer"
+    )
+    seller = simulator.SimulatedAgent(
+        "seller_naive", f"{config_dir}/seller_naive.json", "seller"
+    )
+    tokens = [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}]
+
+    def counts():
+        return {
+            (name, tuple(sorted(labels.items()))): value
+            for name, labels, value in metrics.parse(metrics.render())
+        }
+
+    before = counts()
+    simulator.negotiate(buyer, seller, tokens)
+    after = counts()
+
+    def delta(name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        return after.get(key, 0) - before.get(key, 0)
+
+    assert delta("apiary_messages_total", tag="offer") == 2
+    assert delta("apiary_negotiation_events_total", kind="accept") == 2
+    assert delta("apiary_stage_seconds_count", stage="infer") == 2
+    assert delta("apiary_negotiation_rounds_count", role="buyer") == 1
+
+
+def test_metrics_endpoint():
+    from fastapi.testclient import TestClient
+
+    from apiary import inference
+
+    response = TestClient(inference.app).get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE apiary_stage_seconds histogram" in response.text
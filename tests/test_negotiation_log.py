@@ -0,0 +1,25 @@
+import pytest
+
+from apiary import negotiation_log
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_negotiation_log(tmp_path):
+    log = negotiation_log.NegotiationLog(tmp_path, flush_interval=60, rotate_rows=3)
+    for round in range(1, 5):
+        log.record(offer_id="a", round=round, kind="offer", amount=float(round))
+
+    log.flush()
+    assert len(list(tmp_path.glob("part-*.parquet"))) == 1
+    assert len(list(tmp_path.glob("segment-*.jsonl"))) == 0
+
+    log.record(offer_id="b", round=1, kind="accept", amount=None)
+    log.flush()
+    assert len(list(tmp_path.glob("segment-*.jsonl"))) == 1
+
+    log.close()
+    table = pq.read_table(tmp_path)
+    assert table.num_rows == 5
+    assert sorted(table.column("offer_id").to_pylist()) == ["a"] * 4 + ["b"]
+    assert table.column("amount").null_count == 1
@@ -0,0 +1,59 @@
+import os
+import pstats
+import threading
+
+from apiary import profiling, simulator
+
+
+def test_message_profiles(monkeypatch, tmp_path, config_dir):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PROFILE.MODE", "message")
+    monkeypatch.setenv("PROFILE.DIR", str(tmp_path / "profiles"))
+
+    buyer = simulator.SimulatedAgent(
+        "buyer_kalman", f"{config_dir}/buyer_kalman.json", "buyer"
+    )
+    seller = simulator.SimulatedAgent(
+        "seller_kalman", f"{config_dir}/seller_kalman.json", "seller"
+    )
+    tokens = [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}]
+    result = simulator.negotiate(buyer, seller, tokens)
+
+    profiles = sorted(os.listdir(tmp_path / "profiles"))
+    # One profile per message of both agents.
+    assert len(profiles) == 2 * result["rounds"]
+    assert all(name.startswith(f"{result['offer_id']}-offer-") for name in profiles)
+
+    stats = pstats.Stats(str(tmp_path / "profiles" / profiles[0]))
+    assert any(function == "_handle_offer" for _, _, function in stats.stats)
+
+
+def test_sampler(monkeypatch, tmp_path):
+    sampler = profiling.Sampler(str(tmp_path))
+    handling = threading.Event()
+    done = threading.Event()
+
+    def handle():
+        with profiling.message({"offerId": "o1", "data": {"_tag": "offer"}}):
+            handling.set()
+            done.wait()
+
+    monkeypatch.setenv("PROFILE.MODE", "sample")
+    thread = threading.Thread(target=handle)
+    thread.start()
+    try:
+        handling.wait()
+        sampler.sample()
+    finally:
+        done.set()
+        thread.join()
+
+    sampler.flush()
+    [file_name] = os.listdir(tmp_path)
+    assert file_name.endswith(".folded")
+    with open(tmp_path / file_name) as f:
+        lines = f.read().splitlines()
+    assert any(
+        line.startswith("offer;o1;") and "test_profiling.py:handle" in line
+        for line in lines
+    )
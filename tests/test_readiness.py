@@ -0,0 +1,75 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from apiary import external_services, inference, utils
+
+
+def test_read_lock_file(tmp_path):
+    lock_file = tmp_path / "inference_endpoint_seller_naive.lock"
+    assert utils.read_lock_file(str(lock_file)) is None
+
+    lock_file.write_text(str(os.getpid()))
+    assert utils.read_lock_file(str(lock_file)) == os.getpid()
+
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    lock_file.write_text(str(process.pid))
+    # Stale lock files are removed.
+    assert utils.read_lock_file(str(lock_file)) is None
+    assert not lock_file.exists()
+
+
+def test_wait_until_ready():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        start = time.monotonic()
+        utils.wait_until_ready(
+            process, lambda: inference._port_open("127.0.0.1", port), "HTTP server", 30
+        )
+        assert time.monotonic() - start < 3
+    finally:
+        process.terminate()
+        process.wait()
+
+    process = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        utils.wait_until_ready(process, lambda: False, "Failing service", 30)
+
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    with pytest.raises(RuntimeError, match="not ready"):
+        utils.wait_until_ready(process, lambda: False, "Slow service", 0.1)
+    assert process.wait(timeout=5) is not None
+
+
+def test_messaging_client_probe_closed(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    closed = []
+    monkeypatch.setattr(
+        external_services,
+        "_subscription_probe",
+        lambda channel: ((lambda: False), lambda: closed.append(channel)),
+    )
+    # A messaging client exiting before subscribing.
+    popen = subprocess.Popen
+    monkeypatch.setattr(
+        subprocess,
+        "Popen",
+        lambda command: popen([sys.executable, "-c", "import sys; sys.exit(1)"]),
+    )
+
+    with pytest.raises(RuntimeError, match="exited"):
+        external_services.start_messaging_client()
+    assert closed == ["initial_offers"]
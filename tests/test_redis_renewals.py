@@ -0,0 +1,76 @@
+from apiary.redis_renewals import RenewalScheduler
+
+PROVISION = {
+    "user": "0x0000000000000000000000000000000000000001",
+    "capacity": 1024,
+    "egress": 1024,
+    "cpus": 1,
+    "server_name": "redis-1",
+    "url": "redis://redis-1:6379",
+}
+
+
+def test_renewal_scheduler(tmp_path):
+    batches = []
+    expired = []
+
+    def renew_batch(leases):
+        batches.append([lease["statement_uid"] for lease in leases])
+        return [
+            (None, "reverted")
+            if lease["statement_uid"] == "lease-3"
+            else (f"new-{lease['statement_uid']}", None)
+            for lease in leases
+        ]
+
+    scheduler = RenewalScheduler(
+        renew_batch,
+        str(tmp_path / "leases.db"),
+        on_expire=expired.append,
+        horizon=100,
+        batch_size=2,
+    )
+    for i in range(1000):
+        scheduler.add(f"lease-{i}", 1000 + i, PROVISION)
+    for i in (4, 1, 3, 900):
+        scheduler.request_renewal(f"lease-{i}", f"buy-{i}", 5000)
+
+    # Paid leases due within the horizon are renewed in batches, in expiration order.
+    assert scheduler.run_once(now=950) == 1
+    assert batches == [["lease-1", "lease-3"]]
+
+    # Failed renewals are retried, unpaid leases expire.
+    batches.clear()
+    assert scheduler.run_once(now=1002.5) == 1
+    assert batches == [["lease-3", "lease-4"]]
+    assert [lease["statement_uid"] for lease in expired] == ["lease-0", "lease-2"]
+
+    renewed = [
+        lease
+        for lease in scheduler.index.due(5000, 2000, renewed=False)
+        if lease["statement_uid"].startswith("new-")
+    ]
+    assert [lease["statement_uid"] for lease in renewed] == [
+        "new-lease-1",
+        "new-lease-4",
+    ]
+    assert all(lease["expiration"] == 5000 for lease in renewed)
+    assert renewed[0]["provision"] == PROVISION
+
+    # A paid lease whose renewal still fails once expired expires.
+    batches.clear()
+    expired.clear()
+    assert scheduler.run_once(now=1003) == 0
+    assert batches == [["lease-3"]]
+    assert [lease["statement_uid"] for lease in expired] == ["lease-3"]
+    assert expired[0]["renewal_uid"] == "buy-3"
+    batches.clear()
+    scheduler.run_once(now=1003)
+    assert batches == []
+
+    plan = scheduler.index._connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM leases "
+        "WHERE status = 'active' AND expiration <= 0 ORDER BY expiration"
+    ).fetchall()
+    assert "leases_by_expiration" in str(plan)
+    scheduler.stop()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+from apiary import scheme_client, simulator
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    async def subscribe(self, offer_id=None):
+        self.calls.append(("subscribe", offer_id))
+        return True
+
+    async def unsubscribe(self, offer_id=None):
+        self.calls.append(("unsubscribe", offer_id))
+        return True
+
+    async def send(self, message):
+        self.calls.append(("send", message["offerId"]))
+        return True
+
+    async def subscribe_send(self, message):
+        self.calls.append(("subscribe_send", message["offerId"]))
+        return True
+
+    async def unsubscribe_send(self, message):
+        self.calls.append(("unsubscribe_send", message["offerId"]))
+        return True
+
+
+def message(tag, offer_id="0", initial=False):
+    return {
+        "pubkey": "0x0",
+        "offerId": offer_id,
+        "initial": initial,
+        "data": {"_tag": tag},
+    }
+
+
+def test_scheme_rules():
+    def on_agent(role, input, output):
+        client = RecordingClient()
+        valid = asyncio.run(scheme_client.on_agent(client, role, input, output))
+        return valid, client.calls
+
+    initial = message("offer", initial=True)
+    assert on_agent("seller", initial, message("offer")) == (
+        True,
+        [("subscribe_send", "0")],
+    )
+    assert on_agent("seller", message("offer"), message("offer")) == (
+        True,
+        [("send", "0")],
+    )
+    assert on_agent("buyer", message("offer"), message("buyAttest")) == (
+        True,
+        [("send", "0")],
+    )
+    assert on_agent("seller", message("buyAttest"), message("sellAttest")) == (
+        True,
+        [("unsubscribe_send", "0")],
+    )
+    assert on_agent("buyer", message("offer"), message("cancel")) == (
+        True,
+        [("unsubscribe_send", "0")],
+    )
+
+    # Invalid responses are not sent.
+    assert on_agent("seller", message("offer"), message("buyAttest")) == (False, [])
+    assert on_agent("buyer", message("offer"), message("offer", offer_id="1")) == (
+        False,
+        [],
+    )
+
+    # Sell attestations published by the seller agent itself conclude its negotiation.
+    client = RecordingClient()
+    asyncio.run(scheme_client.on_message(client, "seller", message("sellAttest")))
+    asyncio.run(scheme_client.on_message(client, "buyer", message("sellAttest")))
+    asyncio.run(scheme_client.on_message(client, "seller", message("offer")))
+    assert client.calls == [("unsubscribe", "0")]
+
+    client = RecordingClient()
+    assert asyncio.run(scheme_client.on_start(client, "seller"))
+    assert asyncio.run(scheme_client.on_start(client, "buyer", initial))
+    assert not asyncio.run(scheme_client.on_start(client, "buyer"))
+    assert client.calls == [("subscribe", None), ("subscribe_send", "0")]
+
+
+async def _negotiate_over_redis(seller):
+    import redis.asyncio as redis
+
+    client = scheme_client.RedisSchemeClient(
+        "seller",
+        seller.agent,
+        seller.states,
+        REDIS_URL,
+        f"initial_offers_{uuid.uuid4()}",
+    )
+    await client.start()
+    runner = asyncio.create_task(client.run())
+
+    offer_id = str(uuid.uuid4())
+    buyer = redis.Redis.from_url(REDIS_URL)
+    pubsub = buyer.pubsub()
+    await pubsub.subscribe(offer_id)
+
+    offer = {
+        "pubkey": "0x0",
+        "offerId": offer_id,
+        "initial": True,
+        "data": {
+            "_tag": "offer",
+            "query": "FROM alpine",
+            "tokens": [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}],
+        },
+    }
+    await buyer.publish(client.default_channel, json.dumps(offer))
+
+    response = None
+    while response is None:
+        response = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0)
+
+    runner.cancel()
+    await client.close()
+    await pubsub.aclose()
+    await buyer.aclose()
+    return json.loads(response["data"])
+
+
+def test_redis_scheme_client(monkeypatch, tmp_path, config_dir):
+    redis = pytest.importorskip("redis")
+    try:
+        redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1).ping()
+    except redis.ConnectionError:
+        pytest.skip(f"No Redis server at {REDIS_URL}.")
+
+    monkeypatch.chdir(tmp_path)
+    seller = simulator.SimulatedAgent(
+        "seller_naive", str(config_dir / "seller_naive.json"), "seller"
+    )
+
+    with simulator.environment(seller.env):
+        response = asyncio.run(asyncio.wait_for(_negotiate_over_redis(seller), 30))
+
+    # The seller subscribes to the offer and counteroffers on its channel.
+    assert response["data"]["_tag"] == "offer"
+    assert not response["initial"]
@@ -0,0 +1,47 @@
+import os
+
+from apiary import simulator
+
+TOKENS = [{"tokenStandard": "ERC20", "address": "0x0", "amt": 100}]
+
+
+def simulated_agents(config_dir, buyer_name, seller_name):
+    return (
+        simulator.SimulatedAgent(
+            buyer_name, str(config_dir / f"{buyer_name}.json"), "buyer"
+        ),
+        simulator.SimulatedAgent(
+            seller_name, str(config_dir / f"{seller_name}.json"), "seller"
+        ),
+    )
+
+
+def test_naive_negotiation(monkeypatch, tmp_path, config_dir):
+    monkeypatch.chdir(tmp_path)
+    buyer, seller = simulated_agents(config_dir, "buyer_naive", "seller_naive")
+
+    result = simulator.negotiate(buyer, seller, TOKENS)
+    assert result["outcome"] == "agreement"
+    assert result["rounds"] == 1
+    assert result["tokens"] == TOKENS
+    # Agents configurations do not leak.
+    assert os.getenv("AGENT_NAME") != "seller_naive"
+
+
+def test_simulated_time(monkeypatch, tmp_path, config_dir):
+    monkeypatch.chdir(tmp_path)
+    buyer, seller = simulated_agents(config_dir, "buyer_kalman", "seller_poly_time")
+
+    # Past t_max, the seller stops negotiating.
+    result = simulator.negotiate(buyer, seller, TOKENS, round_duration=100)
+    assert result["outcome"] == "rejection"
+    assert result["rounds"] == 2
+
+    report = simulator.simulate(
+        *simulated_agents(config_dir, "buyer_kalman", "seller_kalman"),
+        TOKENS,
+        5,
+        seed=0,
+    )
+    assert report["agreements"] == 5
+    assert report["rounds_per_second"] > 0
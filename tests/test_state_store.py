@@ -0,0 +1,77 @@
+import json
+import time
+
+from apiary import shared, state_store
+
+
+def test_in_memory_state_store(monkeypatch):
+    store = state_store.InMemoryStateStore(ttl=60)
+    assert store.load("a") == {}
+
+    store.save("a", {"x_out": 1.0})
+    store.save("b", {"x_out": 2.0})
+    assert store.load("a") == {"x_out": 1.0}
+    assert store.load("b") == {"x_out": 2.0}
+
+    store.delete("a")
+    assert store.load("a") == {}
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert store.load("b") == {}
+    assert len(store) == 0
+
+
+def test_concurrent_kalman_negotiations(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "apiary_output").mkdir()
+    monkeypatch.setenv("LIGHTHOUSE_TOKEN", "token")
+    monkeypatch.setenv("PUBLIC_KEY", "0xseller")
+    monkeypatch.setenv("VALUATION_ESTIMATION", "1000")
+    monkeypatch.setenv("VALUATION_VARIANCE", "20")
+    monkeypatch.setenv("VALUATION_MEASUREMENT_VARIANCE", "10")
+
+    agent = shared.Kalman(is_buyer=False)
+    states = state_store.InMemoryStateStore(ttl=60)
+
+    def offer(offer_id, amt, initial=False):
+        message = {
+            "pubkey": "0xbuyer",
+            "offerId": offer_id,
+            "initial": initial,
+            "data": {
+                "_tag": "offer",
+                "tokens": [{"tokenStandard": "ERC20", "address": "0x0", "amt": amt}],
+            },
+        }
+        return agent.infer(states, message)["data"]["tokens"][0]["amt"]
+
+    first = offer("a", 100, initial=True)
+    offer("b", 500, initial=True)
+    offer("b", 500)
+    assert offer("a", 100) < first
+    # A new negotiation starts again from the configured valuation.
+    assert offer("c", 100, initial=True) == first
+
+
+def test_history():
+    state = {}
+    history = shared.History(state, "x_in_t", 3)
+    for x in range(10_000):
+        history.append(x)
+    assert len(history) == 3
+    assert [history[-3], history[-2], history[-1]] == [9997, 9998, 9999]
+
+    # The history is bounded, JSON serializable state, resized with the capacity.
+    state = json.loads(json.dumps(state))
+    assert len(state["x_in_t"]["values"]) == 3
+    history = shared.History(state, "x_in_t", 2)
+    history.append(10_000)
+    assert [history[-2], history[-1]] == [9999, 10_000]
+
+    # Histories saved as plain lists are converted.
+    state = {"x_in_t": [1, 2, 3, 4]}
+    history = shared.History(state, "x_in_t", 3)
+    history.append(5)
+    assert [history[-3], history[-2], history[-1]] == [3, 4, 5]
+    assert state["x_in_t"]["values"] == [5, 3, 4]
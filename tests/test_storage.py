@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import requests
+
+from apiary import storage
+
+
+def test_multipart_file(tmp_path):
+    file_path = tmp_path / "output.txt"
+    content = b"result\n" * 1000
+    file_path.write_bytes(content)
+
+    body = storage.MultipartFile(str(file_path), chunk_size=64)
+    data = b"".join(body)
+    assert len(data) == len(body)
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {body.content_type}\r\n\r\n".encode() + data
+    )
+    (part,) = message.iter_parts()
+    assert part.get_filename() == "output.txt"
+    assert part.get_content() == content
+
+
+def test_upload_file(tmp_path, monkeypatch):
+    file_path = tmp_path / "output.txt"
+    file_path.write_bytes(b"result")
+    sent = {}
+
+    class Response:
+        text = '{"Name":"output.txt","Hash":"QmResult","Size":"14"}\n'
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            raise ValueError
+
+    def post(url, data, headers):
+        sent["body"] = b"".join(data)
+        sent["length"] = len(data)
+        return Response()
+
+    monkeypatch.setattr(requests, "post", post)
+
+    class Lighthouse:
+        token = "token"
+
+    assert storage.upload_file(Lighthouse(), str(file_path)) == "QmResult"
+    assert sent["length"] == len(sent["body"])
+
+
+class CountingStorage(storage.LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.uploads = 0
+        self.downloads = 0
+
+    def upload(self, file_path):
+        self.uploads += 1
+        return super().upload(file_path)
+
+    def download(self, cid, file_path):
+        self.downloads += 1
+        return super().download(cid, file_path)
+
+
+def test_cached_storage(tmp_path):
+    backend = CountingStorage(str(tmp_path / "backend"))
+    cache = storage.CachedStorage(backend, str(tmp_path / "cache"), max_bytes=150)
+
+    cids = []
+    for i in range(3):
+        file_path = tmp_path / f"job-{i}.Dockerfile"
+        file_path.write_bytes(bytes([i]) * 100)
+        cids.append(cache.upload(str(file_path)))
+    assert cache.upload(str(tmp_path / "job-0.Dockerfile")) == cids[0]
+    assert backend.uploads == 3
+
+    cache.download(cids[0], str(tmp_path / "result-0"))
+    cache.download(cids[0], str(tmp_path / "result-0-again"))
+    assert (tmp_path / "result-0-again").read_bytes() == bytes([0]) * 100
+    assert backend.downloads == 1
+
+    # Only one blob fits in the cache.
+    cache.download(cids[1], str(tmp_path / "result-1"))
+    cache.download(cids[0], str(tmp_path / "result-0"))
+    assert backend.downloads == 3
+    assert (cache.hits, cache.misses) == (2, 6)
+
+    # Blobs larger than the cache are not cached, nor evict the others.
+    file_path = tmp_path / "large-result"
+    file_path.write_bytes(b"x" * 200)
+    large_cid = storage.LocalStorage(backend.root).upload(str(file_path))
+    cache.download(large_cid, str(tmp_path / "large-result-0"))
+    assert (tmp_path / "large-result-0").read_bytes() == b"x" * 200
+    assert os.listdir(tmp_path / "cache" / "blobs") == [cids[0]]
+    assert not os.listdir(tmp_path / "cache" / "partial")
+    assert cache.uncached is backend
+
+    # The least recently used uploads are forgotten.
+    cache = storage.CachedStorage(
+        backend, str(tmp_path / "cache-uploads"), max_bytes=150, max_uploads=2
+    )
+    for i in (0, 1, 2, 1):
+        cache.upload(str(tmp_path / f"job-{i}.Dockerfile"))
+    assert len(os.listdir(tmp_path / "cache-uploads" / "uploads")) == 2
+    cache.upload(str(tmp_path / "job-0.Dockerfile"))
+    assert backend.uploads == 7
+
+
+def test_cached_storage_concurrent_downloads(tmp_path):
+    backend = storage.LocalStorage(str(tmp_path / "backend"))
+    cids = []
+    for i in range(8):
+        file_path = tmp_path / f"job-{i}"
+        file_path.write_bytes(bytes([i]) * 1000)
+        cids.append(backend.upload(str(file_path)))
+    # Blobs are evicted by almost every download.
+    cache = storage.CachedStorage(backend, str(tmp_path / "cache"), max_bytes=2000)
+
+    def download(worker):
+        for j in range(200):
+            i = (worker + j) % len(cids)
+            file_path = tmp_path / f"result-{worker}"
+            cache.download(cids[i], str(file_path))
+            assert file_path.read_bytes() == bytes([i]) * 1000
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(download, range(8)))
+    assert cache.hits + cache.misses == 8 * 200
+    assert cache._size == sum(
+        entry.stat().st_size for entry in os.scandir(tmp_path / "cache" / "blobs")
+    )
@@ -0,0 +1,67 @@
+import dataclasses
+import json
+import os
+
+import pytest
+
+from apiary import strategy_params
+
+
+def test_params_from_env():
+    params = strategy_params.TimeParams.from_env(
+        {"T_MAX": "10", "BETA": "1.9", "K": "0.3", "MIN_USDC": "1", "MAX_USDC": "550"}
+    )
+    assert params.max_usdc == 550 and params.absolute_tolerance == 0.0
+    assert not hasattr(params, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        params.beta = 1.0
+
+    with pytest.raises(
+        strategy_params.ConfigError, match="DELTA is not set.*MIN_USDC="
+    ):
+        strategy_params.TitForTatParams.from_env({"MIN_USDC": "low", "MAX_USDC": "2"})
+    with pytest.raises(
+        strategy_params.ConfigError, match="MIN_USDC must be <= MAX_USDC"
+    ):
+        strategy_params.TitForTatParams.from_env(
+            {"DELTA": "2", "MIN_USDC": "3", "MAX_USDC": "2"}
+        )
+
+
+def test_config_watcher(monkeypatch, tmp_path):
+    config_path = tmp_path / "buyer_kalman.json"
+    config = {
+        "valuation_estimation": 200,
+        "valuation_variance": 50,
+        "valuation_measurement_variance": 12,
+    }
+    config_path.write_text(json.dumps(config))
+    monkeypatch.setenv("VALUATION_ESTIMATION", "200")
+    monkeypatch.setenv("VALUATION_VARIANCE", "50")
+    # Override of the configuration file.
+    monkeypatch.setenv("VALUATION_MEASUREMENT_VARIANCE", "5")
+
+    loaded = []
+    watcher = strategy_params.ConfigWatcher(
+        str(config_path),
+        lambda env: loaded.append(strategy_params.KalmanParams.from_env(env)),
+    )
+
+    def write(config, mtime):
+        config_path.write_text(json.dumps(config))
+        os.utime(config_path, ns=(mtime, mtime))
+
+    assert not watcher.check()
+    write(
+        {**config, "valuation_estimation": 300, "valuation_measurement_variance": 20}, 1
+    )
+    assert watcher.check()
+    assert loaded[-1].valuation_estimation == 300
+    assert loaded[-1].valuation_measurement_variance == 5
+    assert os.environ["VALUATION_ESTIMATION"] == "300"
+
+    # Invalid configurations are not applied.
+    write({**config, "valuation_variance": -1}, 2)
+    assert not watcher.check()
+    assert len(loaded) == 1
+    assert os.environ["VALUATION_VARIANCE"] == "50"
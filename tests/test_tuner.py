@@ -0,0 +1,65 @@
+import pytest
+import readwrite as rw
+
+from apiary import tuner
+
+
+def test_sample_candidates():
+    space = {"delta": (1, 2), "k": (0.1, 0.9)}
+    candidates = tuner.sample_candidates(space, "grid", 0, 3, {"delta"}, seed=0)
+    # Rounded integers do not produce duplicates.
+    assert len(candidates) == 6
+    assert {candidate["delta"] for candidate in candidates} == {1, 2}
+
+    candidates = tuner.sample_candidates(space, "random", 10, 0, set(), seed=0)
+    assert len(candidates) == 10
+    assert all(0.1 <= candidate["k"] <= 0.9 for candidate in candidates)
+
+
+def test_check_params(config_dir):
+    config = rw.read(str(config_dir / "seller_tit_for_tat.json"))
+    tuner.check_params("seller_tit_for_tat", config, ["delta", "M"])
+    # k is not read by TitForTat, typos are not parameters.
+    with pytest.raises(ValueError, match="k is not a parameter"):
+        tuner.check_params("seller_tit_for_tat", {**config, "k": 0.1}, ["k"])
+    with pytest.raises(ValueError, match="not a parameter"):
+        tuner.check_params("seller_tit_for_tat", config, ["detla"])
+    # The estimation of a Kalman buyer is its initial offer, that of a seller is tuned.
+    config = rw.read(str(config_dir / "buyer_kalman.json"))
+    with pytest.raises(ValueError, match="replaced by its initial offer"):
+        tuner.check_params("buyer_kalman", config, ["valuation_estimation"])
+    tuner.check_params("buyer_kalman", config, ["valuation_variance"])
+    config = rw.read(str(config_dir / "seller_kalman.json"))
+    tuner.check_params("seller_kalman", config, ["valuation_estimation"])
+
+
+def test_tune_checkpoint(tmp_path, config_dir):
+    config = rw.read(str(config_dir / "seller_poly_time.json"))
+    candidates = tuner.sample_candidates(
+        {"beta": (0.5, 10), "t_max": (5, 40)}, "grid", 0, 3, {"t_max"}, seed=0
+    )
+    opponents = tuner.load_opponents(["buyer_naive", "buyer_kalman"], str(config_dir))
+    checkpoint_path = str(tmp_path / "tune.jsonl")
+
+    def tune(candidates):
+        return tuner.tune(
+            "seller_poly_time",
+            config,
+            candidates,
+            opponents,
+            amount=100,
+            valuation=60,
+            checkpoint_path=checkpoint_path,
+            n_negotiations=10,
+            workers=2,
+            chunk_size=4,
+        )
+
+    results = tune(candidates[:5])
+    assert len(results) == 5
+    assert results[0]["score"] >= results[-1]["score"]
+
+    # Scored candidates are resumed from the checkpoint.
+    results = tune(candidates)
+    assert len(results) == len(candidates) == 9
+    assert len(tuner.load_checkpoint(checkpoint_path)) == 9